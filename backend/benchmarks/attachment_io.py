@@ -0,0 +1,100 @@
+"""
+Concurrent upload throughput and event-loop latency, writing attachments inline vs on the pool.
+
+"inline" is how the services used to store uploads: shutil.copyfileobj inside the async
+handler, on the event loop. "pool" is src/attachments/storage.AttachmentIO. Each run
+saves --uploads files of --size-mb at once, from spooled temporary files as Starlette
+hands them over. Meanwhile a probe task sleeps 1 ms at a time and records how late it
+wakes up, which is the latency every other request on that worker would see.
+
+Run from the backend directory:
+
+    python -m benchmarks.attachment_io --uploads 16 --size-mb 20 --workers 8
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from src.config import settings
+from src.attachments.storage import AttachmentIO
+
+
+def make_uploads(count: int, size: int) -> list[UploadFile]:
+    block = os.urandom(1024 * 1024)
+    uploads = []
+    for i in range(count):
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        for _ in range(size // len(block)):
+            spooled.write(block)
+        spooled.seek(0)
+        uploads.append(UploadFile(spooled, filename=f"scan{i}.pdf"))
+    return uploads
+
+
+async def save_inline(uploads: list[UploadFile], directory: Path):
+    async def save(upload: UploadFile):
+        with (directory / upload.filename).open("wb") as buffer:
+            shutil.copyfileobj(upload.file, buffer)
+
+    await asyncio.gather(*(save(upload) for upload in uploads))
+
+
+async def run(mode: str, args, directory: Path) -> dict:
+    uploads = make_uploads(args.uploads, args.size_mb * 1024 * 1024)
+    attachment_io = AttachmentIO(args.workers, settings.ATTACHMENT_IO_CHUNK_BYTES)
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    prober = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    if mode == "inline":
+        await save_inline(uploads, directory)
+    else:
+        await asyncio.gather(*(attachment_io.save(upload, directory / upload.filename) for upload in uploads))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    for upload in uploads:
+        upload.file.close()
+
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "mb_per_s": args.uploads * args.size_mb / elapsed,
+        "p50": statistics.median(lags_ms),
+        "p99": lags_ms[int(len(lags_ms) * 0.99) - 1] if len(lags_ms) > 1 else lags_ms[-1],
+        "max": lags_ms[-1],
+        "probes": len(lags_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=16, help="uploads saved at the same time")
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=settings.ATTACHMENT_IO_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    print(f"{args.uploads} uploads x {args.size_mb} MB, pool of {args.workers}\n")
+    print(f"{'mode':<8}{'MB/s':>9}{'loop lag p50 ms':>17}{'p99 ms':>9}{'max ms':>9}{'probes':>8}")
+    for mode in ("inline", "pool"):
+        with tempfile.TemporaryDirectory() as directory:
+            result = asyncio.run(run(mode, args, Path(directory)))
+        print(f"{mode:<8}{result['mb_per_s']:>9.0f}{result['p50']:>17.2f}{result['p99']:>9.2f}{result['max']:>9.1f}{result['probes']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+bcrypt verification latency on this machine for each cost level.
+
+Prints the median time to verify one hash per cost, and the cost that startup
+calibration would pick for the configured (or given) target.
+
+Run from the backend directory:
+
+    python -m benchmarks.bcrypt_cost --min-cost 8 --max-cost 14 --repeat 5
+"""
+import argparse
+
+from src.config import settings
+from src.auth.service import calibrate_bcrypt_cost, time_bcrypt_verify
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-cost", type=int, default=8)
+    parser.add_argument("--max-cost", type=int, default=settings.BCRYPT_MAX_COST)
+    parser.add_argument("--repeat", type=int, default=5, help="verifications per cost; the median is reported")
+    parser.add_argument("--target-ms", type=float, default=settings.BCRYPT_TARGET_VERIFY_MS)
+    args = parser.parse_args()
+
+    print(f"{'cost':>4}  {'verify ms':>10}  {'logins/s/core':>13}")
+    for cost in range(args.min_cost, args.max_cost + 1):
+        seconds = time_bcrypt_verify(cost, repeat=args.repeat)
+        print(f"{cost:>4}  {seconds * 1000:>10.1f}  {1 / seconds:>13.1f}")
+
+    chosen = calibrate_bcrypt_cost(args.target_ms / 1000, max(args.min_cost, settings.BCRYPT_MIN_COST), args.max_cost)
+    print(f"\ncalibration picks cost {chosen} for a {args.target_ms:.0f} ms target (floor {settings.BCRYPT_MIN_COST})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+Scenario-based load testing against a synthetic school.
+
+    python -m benchmarks.loadtest --help
+
+`generator` builds a school of any size with bulk inserts, `scenarios` scripts the
+traffic peaks of a school day and `runner` drives them with concurrent clients and
+reports throughput and p50/p95/p99 latency per scenario.
+"""
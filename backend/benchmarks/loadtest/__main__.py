@@ -0,0 +1,113 @@
+"""
+Generate a synthetic school and run the load-test scenarios against it.
+
+Run from the backend directory. By default everything happens in a scratch directory:
+a fresh SQLite school is generated and the scenarios call the ASGI app in-process.
+
+    python -m benchmarks.loadtest --classes 100 --students-per-class 30 --concurrency 50
+
+To measure a real server, generate into a database, start uvicorn on it, then point
+the scenarios at it (the server must share DATABASE_URL and JWT_SECRET):
+
+    python -m benchmarks.loadtest --database-url sqlite:///./load.db --generate-only
+    DATABASE_URL=sqlite:///./load.db RECOVERY_CODE_LOOKUP_SECRET=loadtest uvicorn src.main:app --workers 4
+    python -m benchmarks.loadtest --database-url sqlite:///./load.db --skip-generate --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCENARIO_NAMES = ("morning_check_in", "dashboard_storm", "deadline_submissions", "homeroom_attendance")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    size = parser.add_argument_group("school size")
+    size.add_argument("--classes", type=int, default=100)
+    size.add_argument("--students-per-class", type=int, default=30)
+    size.add_argument("--subjects", type=int, default=8)
+    size.add_argument("--tasks-per-course", type=int, default=10)
+    size.add_argument("--submission-rate", type=float, default=0.8)
+    size.add_argument("--attendance-years", type=float, default=1.0)
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--scenario", action="append", choices=SCENARIO_NAMES, help="repeatable; default: all, in order")
+    run.add_argument("--concurrency", type=int, default=50, help="simultaneous simulated users")
+    run.add_argument("--database-url", help="default: a fresh SQLite file in a scratch directory")
+    run.add_argument("--base-url", help="send requests to a running server instead of the in-process app")
+    run.add_argument("--skip-generate", action="store_true", help="reuse the school already in --database-url")
+    run.add_argument("--generate-only", action="store_true")
+    run.add_argument("--json", type=Path, help="also write the results here, for comparing runs")
+    return parser.parse_args()
+
+
+async def run_scenarios(args, school) -> list[dict]:
+    import httpx
+    from benchmarks.loadtest.runner import run_scenario
+    from benchmarks.loadtest.scenarios import SCENARIOS
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120)
+    else:
+        from src.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://loadtest", timeout=120)
+
+    summaries = []
+    async with client:
+        for name in args.scenario or SCENARIO_NAMES:
+            journeys = SCENARIOS[name](school)
+            result = await run_scenario(name, journeys, client, args.concurrency)
+            summaries.append(result.summary())
+            print(f"  {name}: {result.requests} requests in {result.seconds:.1f}s", file=sys.stderr)
+    return summaries
+
+
+def main():
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="taskwise-loadtest-"))
+    database_url = args.database_url or f"sqlite:///{workdir / 'school.db'}"
+    # Settings are read at import time, so the database has to be chosen before `src` is imported.
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("DATABASE_REPLICA_URLS", "[]")
+
+    from src.database import engine
+    from benchmarks.loadtest.generator import SchoolSize, generate_school
+    from benchmarks.loadtest.runner import format_report
+    from benchmarks.loadtest.scenarios import School
+
+    if not args.skip_generate:
+        size = SchoolSize(
+            classes=args.classes, students_per_class=args.students_per_class, subjects=args.subjects,
+            tasks_per_course=args.tasks_per_course, submission_rate=args.submission_rate,
+            attendance_years=args.attendance_years,
+        )
+        started = time.perf_counter()
+        counts = generate_school(engine, size)
+        print(f"Generated {database_url} in {time.perf_counter() - started:.1f}s: {counts}", file=sys.stderr)
+    if args.generate_only:
+        return
+
+    school = School.load(engine)
+    if not args.base_url:
+        # Uploads land in ./uploads; keep them in the scratch directory.
+        os.chdir(workdir)
+        # Per-request SQL logs and check-in notifications would drown the report.
+        logging.getLogger("taskwise.sql").setLevel(logging.ERROR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summaries = asyncio.run(run_scenarios(args, school))
+
+    print(format_report(summaries))
+    if args.json:
+        args.json.write_text(json.dumps(summaries, indent=2))
+
+
+if __name__ == "__main__":
+    main()
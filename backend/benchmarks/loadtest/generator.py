@@ -0,0 +1,191 @@
+"""
+A synthetic school, scaled by parameters and written with bulk (executemany) inserts.
+
+Every user's password is `password`; every teacher has one unused recovery code,
+`RC-<roll_number>`. Each class has a homeroom teacher who is the homeroom teacher of
+all of the class's courses, while each course is taught by a subject teacher. The last
+task of every course is open (deadline tomorrow, no submissions) for the submission
+scenario, and attendance history stops yesterday so today's can still be marked.
+"""
+import json
+import math
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+from src.database import Base
+from src.migrations import run_migrations
+from src.auth.models import User, UserRole
+from src.auth.service import get_password_hash
+from src.courses.models import Course, student_course_association, teacher_course_association
+from src.announcements.models import CourseAnnouncement, SchoolAnnouncement
+from src.tasks.models import Task, Submission, TaskStatus, Grade
+from src.attendance.models import Attendance, AttendanceStatusEnum, RecoveryCode
+from src.attendance.service_teacher import recovery_code_lookup_key
+from src.schedules.models import Schedule, DayOfWeek
+from src.geofence.models import Geofence
+
+PASSWORD = "password"
+COURSES_PER_TEACHER = 6
+PERIODS_PER_DAY = 6
+BATCH_SIZE = 10_000
+
+# The seed data's school building, as [lon, lat] pairs.
+SCHOOL_POLYGON = [[
+    [80.01522632938645, 13.028739115673496],
+    [80.01606586072745, 13.028668560312445],
+    [80.01670959082917, 13.028595391768622],
+    [80.016631806777, 13.027576256229123],
+    [80.01578422880975, 13.02749002149124],
+    [80.01510831220294, 13.027774857329424],
+]]
+CHECK_IN_LOCATION = {"latitude": 13.0281, "longitude": 80.0159}  # inside SCHOOL_POLYGON
+
+
+@dataclass
+class SchoolSize:
+    classes: int = 100
+    students_per_class: int = 30
+    subjects: int = 8
+    tasks_per_course: int = 10
+    announcements_per_course: int = 3
+    submission_rate: float = 0.8  # share of students who submitted each closed task
+    attendance_years: float = 1.0
+    seed: int = 0
+
+    @property
+    def teachers(self) -> int:
+        return max(self.subjects, math.ceil(self.classes * self.subjects / COURSES_PER_TEACHER))
+
+
+def class_name(index: int) -> str:
+    return f"{index // 26 + 1}-{string.ascii_uppercase[index % 26]}"
+
+
+def school_days(years: float, end: date) -> list[date]:
+    days = (end - timedelta(days=offset) for offset in range(1, int(365 * years) + 1))
+    return sorted(day for day in days if day.weekday() < 5)
+
+
+def _insert(conn, table, rows) -> int:
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+    return len(rows)
+
+
+def generate_school(engine, size: SchoolSize) -> dict[str, int]:
+    """Creates the schema on `engine` and fills it; returns the row count per table."""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    rng = random.Random(size.seed)
+    now = datetime.now()
+    password_hash = get_password_hash(PASSWORD)
+
+    classes = [class_name(i) for i in range(size.classes)]
+    teachers = [f"teacher{i}" for i in range(size.teachers)]
+    students = {cls: [f"student{c}-{n}" for n in range(size.students_per_class)] for c, cls in enumerate(classes)}
+    homeroom = {cls: teachers[c % len(teachers)] for c, cls in enumerate(classes)}
+
+    # executemany takes its columns from the first row, so every row spells out `classroom`.
+    users = [
+        {"roll_number": "principal", "password": password_hash, "role": UserRole.PRINCIPAL, "name": "Principal", "classroom": None},
+        {"roll_number": "admin", "password": password_hash, "role": UserRole.ADMIN, "name": "Admin", "classroom": None},
+    ]
+    users += [
+        {"roll_number": t, "password": password_hash, "role": UserRole.TEACHER, "name": t.title(), "classroom": None}
+        for t in teachers
+    ]
+    users += [
+        {"roll_number": s, "password": password_hash, "role": UserRole.STUDENT, "name": s.title(), "classroom": cls}
+        for cls, roster in students.items() for s in roster
+    ]
+
+    courses, enrolments, teaching, schedules = [], [], [], []
+    tasks, submissions, announcements = [], [], []
+    for c, cls in enumerate(classes):
+        class_courses = []
+        for subject in range(size.subjects):
+            course_id = f"SUB{subject}-{cls}"
+            teacher = teachers[(c * size.subjects + subject) // COURSES_PER_TEACHER % len(teachers)]
+            class_courses.append(course_id)
+            courses.append({
+                "id": course_id, "name": f"Subject {subject}", "class_name": cls,
+                "accent_color": "#3498DB", "accent_image": f"subject{subject}.png", "homeroom_teacher_id": homeroom[cls],
+            })
+            teaching.append({"teacher_roll_number": teacher, "course_id": course_id})
+            enrolments += [{"student_roll_number": s, "course_id": course_id} for s in students[cls]]
+
+            for a in range(size.announcements_per_course):
+                announcements.append({
+                    "id": f"ANC-{len(announcements):07d}", "title": f"Announcement {a}", "description": "Synthetic announcement.",
+                    "created_at": now - timedelta(days=a + 1), "course_id": course_id, "author_id": teacher,
+                })
+            for t in range(size.tasks_per_course):
+                is_open = t == size.tasks_per_course - 1
+                task_id = f"TSK-{len(tasks):07d}"
+                deadline = now + timedelta(days=1) if is_open else now - timedelta(days=size.tasks_per_course - t)
+                tasks.append({
+                    "id": task_id, "title": f"Task {t}", "description": "Synthetic task.",
+                    "created_at": deadline - timedelta(days=7), "deadline": deadline,
+                    "course_id": course_id, "author_id": teacher,
+                })
+                if is_open:
+                    continue
+                for s in students[cls]:
+                    if rng.random() < size.submission_rate:
+                        approved = rng.random() < 0.5
+                        submissions.append({
+                            "task_id": task_id, "student_id": s, "submitted_at": deadline - timedelta(hours=rng.randint(1, 72)),
+                            "status": TaskStatus.APPROVED if approved else TaskStatus.SUBMITTED,
+                            "grade": rng.choice(list(Grade)) if approved else None,
+                        })
+
+        for day in (DayOfWeek.MONDAY, DayOfWeek.TUESDAY, DayOfWeek.WEDNESDAY, DayOfWeek.THURSDAY, DayOfWeek.FRIDAY):
+            rng.shuffle(class_courses)
+            schedules += [
+                {"class_id": cls, "day_of_week": day, "period": period + 1, "course_id": class_courses[period % len(class_courses)]}
+                for period in range(PERIODS_PER_DAY)
+            ]
+
+    attendance = [
+        {
+            "student_roll_number": s, "date": day, "class_code": cls,
+            "status": AttendanceStatusEnum.PRESENT if rng.random() < 0.92 else AttendanceStatusEnum.ABSENT,
+        }
+        for day in school_days(size.attendance_years, date.today())
+        for cls, roster in students.items() for s in roster
+    ]
+
+    # bcrypt releases the GIL, so the per-teacher codes hash in parallel.
+    with ThreadPoolExecutor() as pool:
+        code_hashes = list(pool.map(get_password_hash, (f"RC-{t}" for t in teachers)))
+    recovery_codes = [
+        {"user_roll_number": t, "code_hash": h, "lookup_key": recovery_code_lookup_key(t, f"RC-{t}"), "is_used": False}
+        for t, h in zip(teachers, code_hashes)
+    ]
+
+    school_announcements = [
+        {"id": f"SCH-ANC-{i:05d}", "title": f"School news {i}", "description": "Synthetic school announcement.",
+         "created_at": now - timedelta(days=i), "author_id": "principal"}
+        for i in range(20)
+    ]
+
+    counts = {}
+    with engine.begin() as conn:
+        counts["users"] = _insert(conn, User.__table__, users)
+        counts["courses"] = _insert(conn, Course.__table__, courses)
+        counts["student_course_association"] = _insert(conn, student_course_association, enrolments)
+        counts["teacher_course_association"] = _insert(conn, teacher_course_association, teaching)
+        counts["schedules"] = _insert(conn, Schedule.__table__, schedules)
+        counts["course_announcements"] = _insert(conn, CourseAnnouncement.__table__, announcements)
+        counts["school_announcements"] = _insert(conn, SchoolAnnouncement.__table__, school_announcements)
+        counts["tasks"] = _insert(conn, Task.__table__, tasks)
+        counts["submissions"] = _insert(conn, Submission.__table__, submissions)
+        counts["attendance"] = _insert(conn, Attendance.__table__, attendance)
+        counts["recovery_codes"] = _insert(conn, RecoveryCode.__table__, recovery_codes)
+        conn.execute(insert(Geofence.__table__), {"name": "School", "polygon": json.dumps(SCHOOL_POLYGON)})
+    return counts
@@ -0,0 +1,86 @@
+"""Drives scenario journeys with a fixed number of concurrent clients and summarises their latency."""
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    seconds: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.latencies)
+        return {
+            "scenario": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "throughput_rps": round(self.requests / self.seconds, 1) if self.seconds else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+class Recorder:
+    """Wraps an httpx.AsyncClient; every request made through it is timed into one ScenarioResult."""
+
+    def __init__(self, client, result: ScenarioResult):
+        self.client = client
+        self.result = result
+
+    async def request(self, method: str, url: str, token: str | None = None, **kwargs):
+        if token:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Authorization": f"Bearer {token}"}
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.result.latencies.append(time.perf_counter() - started)
+        self.result.statuses[response.status_code] = self.result.statuses.get(response.status_code, 0) + 1
+        if response.status_code >= 400:
+            self.result.errors += 1
+        return response
+
+
+async def run_scenario(name: str, journeys: list, client, concurrency: int) -> ScenarioResult:
+    """Runs every journey (an `async def journey(recorder)`), at most `concurrency` at a time."""
+    result = ScenarioResult(name)
+    recorder = Recorder(client, result)
+    pending = iter(journeys)
+
+    async def worker():
+        for journey in pending:
+            await journey(recorder)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(journeys)) or 1)))
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def format_report(summaries: list[dict]) -> str:
+    header = f"{'scenario':<24}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for s in summaries:
+        lines.append(
+            f"{s['scenario']:<24}{s['requests']:>10}{s['errors']:>8}{s['throughput_rps']:>10.1f}"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,124 @@
+"""
+The traffic peaks of a school day, as lists of per-user journeys.
+
+Scenarios change the data (check-ins, submissions, attendance), so run them once
+against a freshly generated school; a second run mostly measures 4xx responses.
+"""
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.auth.models import User, UserRole
+from src.auth.service import create_access_token
+from src.courses.models import Course
+from src.tasks.models import Task
+from benchmarks.loadtest.generator import PASSWORD, CHECK_IN_LOCATION
+
+API = "/v1/api"
+TOKEN_LIFETIME = timedelta(hours=2)
+
+
+@dataclass
+class School:
+    """The generated school as the scenarios need it, read back from the database."""
+    teachers: list[str] = field(default_factory=list)
+    students: dict[str, list[str]] = field(default_factory=dict)  # class -> roll numbers
+    courses: dict[str, list[str]] = field(default_factory=dict)  # class -> course ids
+    homeroom: dict[str, str] = field(default_factory=dict)  # class -> teacher
+    open_task: dict[str, str] = field(default_factory=dict)  # course -> task id with the latest deadline
+
+    @classmethod
+    def load(cls, engine) -> "School":
+        school = cls(students=defaultdict(list), courses=defaultdict(list))
+        with Session(engine) as db:
+            for roll_number, role, classroom in db.execute(select(User.roll_number, User.role, User.classroom)):
+                if role == UserRole.TEACHER:
+                    school.teachers.append(roll_number)
+                elif role == UserRole.STUDENT:
+                    school.students[classroom].append(roll_number)
+            for course_id, class_name, homeroom in db.execute(select(Course.id, Course.class_name, Course.homeroom_teacher_id)):
+                school.courses[class_name].append(course_id)
+                school.homeroom[class_name] = homeroom
+            for course_id, task_id in db.execute(select(Task.course_id, Task.id).order_by(Task.deadline)):
+                school.open_task[course_id] = task_id
+        return school
+
+
+def token_for(roll_number: str, role: UserRole) -> str:
+    # Signed like /login's tokens, without paying for a bcrypt check per simulated user.
+    return create_access_token({"sub": roll_number, "role": role.value}, expires_delta=TOKEN_LIFETIME)
+
+
+def morning_check_in(school: School) -> list:
+    """Every teacher logs in, loads their status and checks in with a recovery code."""
+    def journey_for(teacher):
+        async def journey(recorder):
+            response = await recorder.request("POST", f"{API}/login", data={"username": teacher, "password": PASSWORD})
+            token = response.json().get("access_token")
+            await recorder.request("GET", f"{API}/attendance/teacher/status", token=token)
+            await recorder.request("POST", f"{API}/attendance/teacher/recovery-check-in", token=token, json={
+                "code": f"RC-{teacher}", "location": CHECK_IN_LOCATION, "reason": "Load test",
+            })
+        return journey
+    return [journey_for(teacher) for teacher in school.teachers]
+
+
+def dashboard_storm(school: School, courses_per_student: int = 2) -> list:
+    """Every student opens the app: courses, schedule, school news and a few course dashboards."""
+    rng = random.Random(0)
+
+    def journey_for(student, courses):
+        async def journey(recorder):
+            token = token_for(student, UserRole.STUDENT)
+            for path in ("/me/courses", "/me/schedule", "/me/school-announcements"):
+                await recorder.request("GET", f"{API}{path}", token=token)
+            for course_id in courses:
+                await recorder.request("GET", f"{API}/me/{course_id}/dashboard", token=token)
+        return journey
+
+    return [
+        journey_for(student, rng.sample(school.courses[cls], min(courses_per_student, len(school.courses[cls]))))
+        for cls, roster in school.students.items() for student in roster
+    ]
+
+
+def deadline_submissions(school: School, file_size: int = 64 * 1024) -> list:
+    """Every student uploads to the open task of their class's first course in the last minute."""
+    payload = b"x" * file_size
+
+    def journey_for(student, course_id, task_id):
+        async def journey(recorder):
+            await recorder.request(
+                "POST", f"{API}/{course_id}/tasks/{task_id}/upload", token=token_for(student, UserRole.STUDENT),
+                files=[("files", ("answer.txt", payload, "text/plain"))],
+            )
+        return journey
+
+    journeys = []
+    for cls, roster in school.students.items():
+        course_id = sorted(school.courses[cls])[0]
+        journeys += [journey_for(student, course_id, school.open_task[course_id]) for student in roster]
+    return journeys
+
+
+def homeroom_attendance(school: School) -> list:
+    """Every homeroom teacher marks today's attendance for their whole class."""
+    def journey_for(cls, teacher, roster):
+        async def journey(recorder):
+            await recorder.request("POST", f"{API}/{cls}/attendance", token=token_for(teacher, UserRole.TEACHER), json={
+                "attendance_data": [{"student_roll_number": s, "status": "PRESENT"} for s in roster],
+            })
+        return journey
+    return [journey_for(cls, school.homeroom[cls], roster) for cls, roster in school.students.items()]
+
+
+SCENARIOS = {
+    "morning_check_in": morning_check_in,
+    "dashboard_storm": dashboard_storm,
+    "deadline_submissions": deadline_submissions,
+    "homeroom_attendance": homeroom_attendance,
+}
@@ -0,0 +1,126 @@
+"""
+Concurrent read/write throughput of SQLite, before and after the production profile.
+
+Readers repeatedly fetch one student's attendance history while writers insert
+attendance rows, each in its own transaction, all against a fresh database file.
+
+Run from the backend directory:
+
+    python -m benchmarks.sqlite_profile --readers 8 --writers 4 --seconds 5
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+
+from src.database import Base, create_db_engine
+from src.auth.models import User
+from src.attendance.models import Attendance, AttendanceStatusEnum
+
+STUDENTS = [f"student_{i}" for i in range(200)]
+
+
+def build_engine(db_path: Path, production: bool):
+    url = f"sqlite:///{db_path}"
+    if not production:
+        # The engine as it was originally configured in src/database.py.
+        return create_engine(url, connect_args={"check_same_thread": False})
+    return create_db_engine(url)
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(bind=engine, tables=[User.__table__, Attendance.__table__])
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Attendance.__table__), [
+            {
+                "student_roll_number": random.choice(STUDENTS),
+                "date": start + timedelta(days=i % 365),
+                "status": AttendanceStatusEnum.PRESENT.name,
+                "class_code": "10-A",
+            }
+            for i in range(rows)
+        ])
+
+
+def run(production: bool, readers: int, writers: int, seconds: float, rows: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(Path(tmp) / "bench.db", production)
+        seed(engine, rows)
+
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def reader():
+            done = 0
+            while not stop.is_set():
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(
+                            select(Attendance.__table__).where(Attendance.student_roll_number == random.choice(STUDENTS))
+                        ).fetchall()
+                    done += 1
+                except OperationalError:
+                    with lock:
+                        counts["locked"] += 1
+            with lock:
+                counts["reads"] += done
+
+        def writer():
+            done = 0
+            while not stop.is_set():
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(Attendance.__table__), {
+                            "student_roll_number": random.choice(STUDENTS),
+                            "date": date.today(),
+                            "status": AttendanceStatusEnum.PRESENT.name,
+                            "class_code": "10-A",
+                        })
+                    done += 1
+                except OperationalError:
+                    with lock:
+                        counts["locked"] += 1
+            with lock:
+                counts["writes"] += done
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return {
+        "reads_per_sec": counts["reads"] / seconds,
+        "writes_per_sec": counts["writes"] / seconds,
+        "locked_errors": counts["locked"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=50_000, help="attendance rows seeded before the run")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'locked':>10}")
+    for label, production in (("default", False), ("production", True)):
+        result = run(production, args.readers, args.writers, args.seconds, args.rows)
+        print(f"{label:<12}{result['reads_per_sec']:>12.0f}{result['writes_per_sec']:>12.0f}{result['locked_errors']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, DateTime, Text, Integer
+from sqlalchemy import Column, String, ForeignKey, DateTime, Text, Integer, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src.attachments.models import BlobAttachment
 from sqlalchemy.dialects.postgresql import UUID
 
 
 class SchoolAnnouncement(Base):
     __tablename__ = "school_announcements"
+    __table_args__ = (
+        Index("ix_school_announcements_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=lambda: f"SCH-ANC-{uuid.uuid4().hex[:6].upper()}")
     title = Column(String, index=True)
     description = Column(Text)
@@ -16,16 +20,18 @@ class SchoolAnnouncement(Base):
     attachments = relationship("SchoolAnnouncementAttachment", back_populates="announcement")
 
 
-class SchoolAnnouncementAttachment(Base):
+class SchoolAnnouncementAttachment(BlobAttachment, Base):
     __tablename__ = "school_announcement_attachments"
     id = Column(Integer, primary_key=True, index=True)
     announcement_id = Column(String, ForeignKey("school_announcements.id"))
-    file_path = Column(String)
     announcement = relationship("SchoolAnnouncement", back_populates="attachments")
 
 
 class CourseAnnouncement(Base):
     __tablename__ = "course_announcements"
+    __table_args__ = (
+        Index("ix_course_announcements_course_id_created_at_id", "course_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=lambda: f"ANC-{uuid.uuid4().hex[:6].upper()}")
     title = Column(String, index=True)
     description = Column(Text)
@@ -38,9 +44,8 @@ class CourseAnnouncement(Base):
     attachments = relationship("CourseAnnouncementAttachment", back_populates="announcement")
 
 
-class CourseAnnouncementAttachment(Base):
+class CourseAnnouncementAttachment(BlobAttachment, Base):
     __tablename__ = "course_announcement_attachments"
     id = Column(Integer, primary_key=True, index=True)
     announcement_id = Column(String, ForeignKey("course_announcements.id"))
-    file_path = Column(String)
     announcement = relationship("CourseAnnouncement", back_populates="attachments")
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, Form, UploadFile, File, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional, Union
 import json
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.auth.dependencies import get_current_user, get_current_teacher, get_current_principal
 from src.dependencies import get_uploads_dir
 from pathlib import Path
 from src.auth.models import User
 from src.users import schemas
 from src.announcements import service
+from src.pagination import PageParams, page_params
+from src.attachments.ingest import StreamedForm, multipart_openapi, streamed_form
 
 router = APIRouter()
 
@@ -19,96 +21,112 @@ def format_announcement(announcement):
         "time": announcement.created_at,
         "title": announcement.title,
         "description": announcement.description,
-        "attachements": [Path(att.file_path).name for att in announcement.attachments]
+        "attachements": [att.name for att in announcement.attachments]
     }
 
-@router.get("/me/school-announcements", response_model=List[schemas.Announcement])
-async def get_school_announcements(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    announcements = service.get_school_announcements(db)
-    return [format_announcement(ann) for ann in announcements]
+@router.get("/me/school-announcements", response_model=Union[List[schemas.Announcement], schemas.AnnouncementPage])
+async def get_school_announcements(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    page: PageParams | None = Depends(page_params),
+):
+    if page is None:
+        announcements = await service.get_school_announcements(db)
+        return [format_announcement(ann) for ann in announcements]
+    announcements, next_cursor = await service.get_school_announcements_page(db, page)
+    return {"announcements": [format_announcement(ann) for ann in announcements], "next_cursor": next_cursor}
 
 @router.get("/school-announcements/{announcement_id}", response_model=schemas.Announcement)
-async def get_school_announcement(announcement_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    announcement = service.get_school_announcement(db, announcement_id)
+async def get_school_announcement(announcement_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    announcement = await service.get_school_announcement(db, announcement_id)
     return format_announcement(announcement)
 
-@router.post("/school-announcements/create")
+@router.post("/school-announcements/create", openapi_extra=multipart_openapi(required=("title", "description")))
 async def create_school_announcement(
-    title: str = Form(...),
-    description: str = Form(...),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_principal),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    announcement = service.create_school_announcement(db, title, description, current_user, files, uploads_dir)
+    files = form.files_for("files")
+    announcement = await service.create_school_announcement(db, form.get("title"), form.get("description"), current_user, files, uploads_dir)
     return {
         "message": "School-wide announcement created successfully.",
         "announcement_id": announcement.id,
         "uploaded_files": [file.filename for file in files] if files else []
     }
 
-@router.put("/school-announcements/{announcement_id}/update")
+@router.put(
+    "/school-announcements/{announcement_id}/update",
+    openapi_extra=multipart_openapi(required=("title", "description"), optional=("attachments_to_keep",)),
+)
 async def update_school_announcement(
     announcement_id: str,
-    title: str = Form(...),
-    description: str = Form(...),
-    attachments_to_keep: Optional[str] = Form("[]"),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_principal),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    attachments_to_keep_list = json.loads(attachments_to_keep)
-    announcement = service.update_school_announcement(db, announcement_id, title, description, attachments_to_keep_list, files, uploads_dir)
+    attachments_to_keep_list = json.loads(form.get("attachments_to_keep", "[]"))
+    files = form.files_for("files")
+    announcement = await service.update_school_announcement(
+        db, announcement_id, form.get("title"), form.get("description"), attachments_to_keep_list, files, uploads_dir
+    )
     
     return {
         "message": "School-wide announcement updated successfully.",
         "announcement_id": announcement.id,
-        "current_attachments": [Path(att.file_path).name for att in announcement.attachments]
+        "current_attachments": [att.name for att in announcement.attachments]
     }
 
 @router.delete("/school-announcements/{announcement_id}/delete")
-async def delete_school_announcement(announcement_id: str, current_user: User = Depends(get_current_principal), db: Session = Depends(get_db)):
-    service.delete_school_announcement(db, announcement_id)
+async def delete_school_announcement(
+    announcement_id: str,
+    current_user: User = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
+):
+    await service.delete_school_announcement(db, announcement_id, uploads_dir)
     return {"message": "School-wide announcement deleted successfully.", "announcement_id": announcement_id}
 
-@router.post("/{course_id}/announcements/create")
+@router.post("/{course_id}/announcements/create", openapi_extra=multipart_openapi(required=("title", "description")))
 async def create_course_announcement(
     course_id: str,
-    title: str = Form(...),
-    description: str = Form(...),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    announcement = service.create_course_announcement(db, course_id, title, description, current_user, files, uploads_dir)
+    files = form.files_for("files")
+    announcement = await service.create_course_announcement(db, course_id, form.get("title"), form.get("description"), current_user, files, uploads_dir)
     return {
         "message": "Announcement created successfully.",
         "announcement_id": announcement.id,
         "uploaded_files": [file.filename for file in files] if files else []
     }
 
-@router.put("/{course_id}/announcements/{announcement_id}/update")
+@router.put(
+    "/{course_id}/announcements/{announcement_id}/update",
+    openapi_extra=multipart_openapi(required=("title", "description"), optional=("attachments_to_keep",)),
+)
 async def update_course_announcement(
     course_id: str,
     announcement_id: str,
-    title: str = Form(...),
-    description: str = Form(...),
-    attachments_to_keep: Optional[str] = Form("[]"),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    attachments_to_keep_list = json.loads(attachments_to_keep)
-    announcement = service.update_course_announcement(db, announcement_id, title, description, attachments_to_keep_list, files, uploads_dir)
+    attachments_to_keep_list = json.loads(form.get("attachments_to_keep", "[]"))
+    files = form.files_for("files")
+    announcement = await service.update_course_announcement(
+        db, announcement_id, form.get("title"), form.get("description"), attachments_to_keep_list, files, uploads_dir
+    )
     
     return {
         "message": "Announcement updated successfully.",
         "announcement_id": announcement.id,
-        "current_attachments": [Path(att.file_path).name for att in announcement.attachments]
+        "current_attachments": [att.name for att in announcement.attachments]
     }
 
 @router.delete("/{course_id}/announcements/{announcement_id}/delete")
@@ -116,9 +134,10 @@ async def delete_course_announcement(
     course_id: str,
     announcement_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    service.delete_course_announcement(db, announcement_id)
+    await service.delete_course_announcement(db, announcement_id, uploads_dir)
     return {"message": "Announcement deleted successfully.", "announcement_id": announcement_id}
 
 @router.get("/{course_id}/announcements/{announcement_id}", response_model=schemas.Announcement)
@@ -126,9 +145,9 @@ async def get_course_announcement(
     course_id: str,
     announcement_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    announcement = service.get_course_announcement(db, announcement_id)
+    announcement = await service.get_course_announcement(db, announcement_id)
     if announcement.course_id != course_id:
         raise CourseNotFound(course_id=course_id)
     return format_announcement(announcement)
@@ -1,141 +1,149 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.announcements import models
 from src.auth.models import User
 from typing import List, Optional
-from fastapi import UploadFile
-import shutil
 from pathlib import Path
 from src.exceptions import AnnouncementNotFound
-
-def get_school_announcements(db: Session):
-    return db.query(models.SchoolAnnouncement).all()
-
-def get_school_announcement(db: Session, announcement_id: str):
-    announcement = db.query(models.SchoolAnnouncement).filter(models.SchoolAnnouncement.id == announcement_id).first()
+from src.attachments import blobs
+from src.attachments.storage import Upload
+from src.pagination import PageParams, encode_cursor, feed_key, newest_first, split_page
+
+# Everything format_announcement() touches, loaded up front so no lazy IO happens on the async session.
+SCHOOL_ANNOUNCEMENT_LOAD_OPTIONS = (
+    selectinload(models.SchoolAnnouncement.author),
+    selectinload(models.SchoolAnnouncement.attachments),
+)
+
+COURSE_ANNOUNCEMENT_LOAD_OPTIONS = (
+    selectinload(models.CourseAnnouncement.author),
+    selectinload(models.CourseAnnouncement.attachments),
+)
+
+async def get_school_announcements(db: AsyncSession):
+    result = await db.execute(select(models.SchoolAnnouncement).options(*SCHOOL_ANNOUNCEMENT_LOAD_OPTIONS))
+    return result.scalars().all()
+
+async def get_school_announcements_page(db: AsyncSession, page: PageParams):
+    """Newest first; returns the announcements and the cursor of the next page (None on the last)."""
+    after = page.cursor.get("after") if page.cursor else None
+    statement = newest_first(
+        select(models.SchoolAnnouncement).options(*SCHOOL_ANNOUNCEMENT_LOAD_OPTIONS), models.SchoolAnnouncement, after
+    )
+    result = await db.execute(statement.limit(page.limit + 1))
+    announcements, has_more = split_page(result.scalars().all(), page.limit)
+    return announcements, encode_cursor({"after": feed_key(announcements[-1])}) if has_more else None
+
+async def get_school_announcement(db: AsyncSession, announcement_id: str):
+    result = await db.execute(
+        select(models.SchoolAnnouncement)
+        .options(*SCHOOL_ANNOUNCEMENT_LOAD_OPTIONS)
+        .filter(models.SchoolAnnouncement.id == announcement_id)
+        .execution_options(populate_existing=True)
+    )
+    announcement = result.scalars().first()
     if not announcement:
         raise AnnouncementNotFound(announcement_id=announcement_id)
     return announcement
 
-def create_school_announcement(db: Session, title: str, description: str, author: User, files: Optional[List[UploadFile]], uploads_dir: Path):
+async def create_school_announcement(db: AsyncSession, title: str, description: str, author: User, files: Optional[List[Upload]], uploads_dir: Path):
     announcement = models.SchoolAnnouncement(title=title, description=description, author_id=author.roll_number)
     db.add(announcement)
-    db.commit()
-    db.refresh(announcement)
+    await db.commit()
 
     if files:
-        announcement_attachments_dir = uploads_dir / "school_announcements" / str(announcement.id)
-        announcement_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = announcement_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.SchoolAnnouncementAttachment(announcement_id=announcement.id, file_path=str(file_path))
-            db.add(attachment)
-        db.commit()
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.SchoolAnnouncementAttachment(announcement_id=announcement.id, file_name=file.filename, blob_sha256=sha256))
+        await db.commit()
 
-    return announcement
+    return await get_school_announcement(db, announcement.id)
 
-def update_school_announcement(db: Session, announcement_id: str, title: str, description: str, attachments_to_keep: List[str], files: Optional[List[UploadFile]], uploads_dir: Path):
-    announcement = get_school_announcement(db, announcement_id)
+async def update_school_announcement(db: AsyncSession, announcement_id: str, title: str, description: str, attachments_to_keep: List[str], files: Optional[List[Upload]], uploads_dir: Path):
+    announcement = await get_school_announcement(db, announcement_id)
 
     announcement.title = title
     announcement.description = description
 
     # Handle attachments
     # This is a simplified logic. A real app would need more robust handling of file names and paths.
-    current_attachments = {attachment.file_path for attachment in announcement.attachments}
     attachments_to_keep_set = set(attachments_to_keep)
-    
-    for attachment in announcement.attachments:
-        if attachment.file_path not in attachments_to_keep_set:
-            db.delete(attachment)
-            Path(attachment.file_path).unlink(missing_ok=True)
 
     if files:
-        announcement_attachments_dir = uploads_dir / "school_announcements" / str(announcement.id)
-        announcement_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = announcement_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.SchoolAnnouncementAttachment(announcement_id=announcement.id, file_path=str(file_path))
-            db.add(attachment)
-    
-    db.commit()
-    db.refresh(announcement)
-    return announcement
-
-def delete_school_announcement(db: Session, announcement_id: str):
-    announcement = get_school_announcement(db, announcement_id)
-    for attachment in announcement.attachments:
-        Path(attachment.file_path).unlink(missing_ok=True)
-        db.delete(attachment)
-    db.delete(announcement)
-    db.commit()
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.SchoolAnnouncementAttachment(announcement_id=announcement.id, file_name=file.filename, blob_sha256=sha256))
+
+    removed = [attachment for attachment in announcement.attachments if attachment.name not in attachments_to_keep_set]
+    released = await blobs.release(db, uploads_dir, removed)
+
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
+    return await get_school_announcement(db, announcement_id)
+
+async def delete_school_announcement(db: AsyncSession, announcement_id: str, uploads_dir: Path):
+    announcement = await get_school_announcement(db, announcement_id)
+    released = await blobs.release(db, uploads_dir, announcement.attachments)
+    await db.delete(announcement)
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
     return True
 
 
-def get_course_announcements(db: Session, course_id: str):
-    return db.query(models.CourseAnnouncement).filter(models.CourseAnnouncement.course_id == course_id).all()
-
-def get_course_announcement(db: Session, announcement_id: str):
-    announcement = db.query(models.CourseAnnouncement).filter(models.CourseAnnouncement.id == announcement_id).first()
+async def get_course_announcements(db: AsyncSession, course_id: str):
+    result = await db.execute(
+        select(models.CourseAnnouncement)
+        .options(*COURSE_ANNOUNCEMENT_LOAD_OPTIONS)
+        .filter(models.CourseAnnouncement.course_id == course_id)
+    )
+    return result.scalars().all()
+
+async def get_course_announcement(db: AsyncSession, announcement_id: str):
+    result = await db.execute(
+        select(models.CourseAnnouncement)
+        .options(*COURSE_ANNOUNCEMENT_LOAD_OPTIONS)
+        .filter(models.CourseAnnouncement.id == announcement_id)
+        .execution_options(populate_existing=True)
+    )
+    announcement = result.scalars().first()
     if not announcement:
         raise AnnouncementNotFound(announcement_id=announcement_id)
     return announcement
 
-def create_course_announcement(db: Session, course_id: str, title: str, description: str, author: User, files: Optional[List[UploadFile]], uploads_dir: Path):
+async def create_course_announcement(db: AsyncSession, course_id: str, title: str, description: str, author: User, files: Optional[List[Upload]], uploads_dir: Path):
     announcement = models.CourseAnnouncement(course_id=course_id, title=title, description=description, author_id=author.roll_number)
     db.add(announcement)
-    db.commit()
-    db.refresh(announcement)
+    await db.commit()
 
     if files:
-        announcement_attachments_dir = uploads_dir / "courses" / course_id / "announcements" / str(announcement.id)
-        announcement_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = announcement_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.CourseAnnouncementAttachment(announcement_id=announcement.id, file_path=str(file_path))
-            db.add(attachment)
-        db.commit()
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.CourseAnnouncementAttachment(announcement_id=announcement.id, file_name=file.filename, blob_sha256=sha256))
+        await db.commit()
 
-    return announcement
+    return await get_course_announcement(db, announcement.id)
 
-def update_course_announcement(db: Session, announcement_id: str, title: str, description: str, attachments_to_keep: List[str], files: Optional[List[UploadFile]], uploads_dir: Path):
-    announcement = get_course_announcement(db, announcement_id)
+async def update_course_announcement(db: AsyncSession, announcement_id: str, title: str, description: str, attachments_to_keep: List[str], files: Optional[List[Upload]], uploads_dir: Path):
+    announcement = await get_course_announcement(db, announcement_id)
 
     announcement.title = title
     announcement.description = description
 
-    current_attachments = {attachment.file_path for attachment in announcement.attachments}
     attachments_to_keep_set = set(attachments_to_keep)
-    
-    for attachment in announcement.attachments:
-        if attachment.file_path not in attachments_to_keep_set:
-            db.delete(attachment)
-            Path(attachment.file_path).unlink(missing_ok=True)
 
     if files:
-        announcement_attachments_dir = uploads_dir / "courses" / announcement.course_id / "announcements" / str(announcement.id)
-        announcement_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = announcement_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.CourseAnnouncementAttachment(announcement_id=announcement.id, file_path=str(file_path))
-            db.add(attachment)
-    
-    db.commit()
-    db.refresh(announcement)
-    return announcement
-
-def delete_course_announcement(db: Session, announcement_id: str):
-    announcement = get_course_announcement(db, announcement_id)
-    for attachment in announcement.attachments:
-        Path(attachment.file_path).unlink(missing_ok=True)
-        db.delete(attachment)
-    db.delete(announcement)
-    db.commit()
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.CourseAnnouncementAttachment(announcement_id=announcement.id, file_name=file.filename, blob_sha256=sha256))
+
+    removed = [attachment for attachment in announcement.attachments if attachment.name not in attachments_to_keep_set]
+    released = await blobs.release(db, uploads_dir, removed)
+
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
+    return await get_course_announcement(db, announcement_id)
+
+async def delete_course_announcement(db: AsyncSession, announcement_id: str, uploads_dir: Path):
+    announcement = await get_course_announcement(db, announcement_id)
+    released = await blobs.release(db, uploads_dir, announcement.attachments)
+    await db.delete(announcement)
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
     return True
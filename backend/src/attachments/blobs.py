@@ -0,0 +1,149 @@
+"""
+Content-addressed attachment storage: each distinct file content is stored once, under its SHA-256.
+
+Attachments used to be written to a directory per task, submission or announcement. The
+same worksheet attached to three sections, or a submission re-uploaded unchanged after a
+rejection, was stored again every time. Now an attachment row keeps the name the file was
+uploaded under (`file_name`, which downloads are served as) and points at a blob
+(`blob_sha256`). The content is written once, to `<uploads>/blobs/<sha256[:2]>/<sha256>`.
+
+`blobs.ref_count` is the number of attachment rows pointing at a blob. `store()` takes
+references and writes only the content that is not stored yet. `release()` deletes attachment
+rows, drops their references and deletes the row of a blob once its last reference is gone.
+Both work in the caller's transaction, so references commit together with the attachment
+rows. Counts only change through `ref_count = ref_count + n` (an upsert for new content),
+never read-modify-write.
+
+Files are deleted only after that transaction has committed, by `discard()`, so a rollback
+loses nothing. `discard()` first claims each released blob with an empty row. If a concurrent
+`store()` has stored the content again in the meantime, the claim conflicts with its row (or
+waits for it to commit) and the file is kept. Otherwise the store's upsert waits for the
+claim and then finds the file gone, so it writes the content again.
+
+Attachments from before the blob store have no blob. They keep their own `file_path` (and
+their file) until they are removed.
+"""
+import asyncio
+import collections
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.attachments.models import Blob, BlobAttachment
+from src.attachments.storage import StagedUpload, Upload, attachment_io
+from src.metrics.registry import Counter
+
+BLOB_DIR_NAME = "blobs"
+
+ATTACHMENT_BLOB_STORES = Counter(
+    "attachment_blob_stores_total", "Attachment files stored, by whether their content was new to the blob store.", ("result",)
+)
+
+
+def blob_path(uploads_dir: Path, sha256: str) -> Path:
+    return uploads_dir / BLOB_DIR_NAME / sha256[:2] / sha256
+
+
+def attachment_path(uploads_dir: Path, attachment: BlobAttachment) -> Path:
+    """Where an attachment's content is on disk."""
+    if attachment.blob_sha256 is None:
+        return Path(attachment.file_path)
+    return blob_path(uploads_dir, attachment.blob_sha256)
+
+
+def _hash(source: BinaryIO) -> tuple[str, int]:
+    digest, size = hashlib.sha256(), 0
+    while chunk := source.read(attachment_io.chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    source.seek(0)
+    return digest.hexdigest(), size
+
+
+def _missing(paths: list[Path]) -> list[bool]:
+    return [not path.is_file() for path in paths]
+
+
+def _insert(db: AsyncSession):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(Blob)
+
+
+async def store(db: AsyncSession, uploads_dir: Path, files: Iterable[Upload]) -> list[str]:
+    """Take a reference to each file's content, writing only new content; returns the SHA-256s in order."""
+    files = list(files)
+    hashes = []
+    for file in files:
+        if isinstance(file, StagedUpload):
+            sha256, size = file.sha256, file.size
+        else:
+            sha256, size = await attachment_io.run("hash", _hash, file.file)
+        hashes.append((sha256, size))
+
+    references = collections.Counter(sha256 for sha256, _ in hashes)
+    sizes = dict(hashes)
+    now = datetime.now()
+    # In a fixed order, so two requests storing the same files cannot deadlock on PostgreSQL.
+    for sha256 in sorted(references):
+        statement = _insert(db).values(sha256=sha256, size=sizes[sha256], ref_count=references[sha256], created_at=now)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + references[sha256]},
+        ))
+
+    first_file = {}
+    for file, (sha256, _) in zip(files, hashes):
+        first_file.setdefault(sha256, file)
+    targets = [blob_path(uploads_dir, sha256) for sha256 in first_file]
+    missing = await attachment_io.run("stat", _missing, targets)
+    writes = [attachment_io.save(file, target) for file, target, absent in zip(first_file.values(), targets, missing) if absent]
+    await asyncio.gather(*writes)
+
+    ATTACHMENT_BLOB_STORES.inc(len(writes), result="stored")
+    ATTACHMENT_BLOB_STORES.inc(len(files) - len(writes), result="deduplicated")
+    return [sha256 for sha256, _ in hashes]
+
+
+@dataclass
+class Released:
+    """What release() freed; hand it to discard() once the transaction has committed."""
+    blobs: list[str] = field(default_factory=list)
+    legacy_files: list[Path] = field(default_factory=list)
+
+
+async def release(db: AsyncSession, uploads_dir: Path, attachments: Iterable[BlobAttachment]) -> Released:
+    """Delete `attachments` and drop their references; blobs left unreferenced are deleted, their files are not."""
+    attachments = list(attachments)
+    for attachment in attachments:
+        await db.delete(attachment)
+    # The attachment rows go first: a blob cannot be deleted while one still points at it.
+    await db.flush()
+    references = collections.Counter(attachment.blob_sha256 for attachment in attachments if attachment.blob_sha256)
+    released = Released(legacy_files=[
+        Path(attachment.file_path) for attachment in attachments if attachment.blob_sha256 is None and attachment.file_path
+    ])
+    if references:
+        for sha256 in sorted(references):
+            await db.execute(update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count - references[sha256]))
+        result = await db.execute(delete(Blob).where(Blob.sha256.in_(references), Blob.ref_count <= 0).returning(Blob.sha256))
+        released.blobs = sorted(result.scalars().all())
+    return released
+
+
+async def discard(db: AsyncSession, uploads_dir: Path, released: Released):
+    """Delete the files of a committed release(), except content stored again since; commits."""
+    claimed = []
+    now = datetime.now()
+    for sha256 in released.blobs:
+        statement = _insert(db).values(sha256=sha256, size=0, ref_count=0, created_at=now)
+        result = await db.execute(statement.on_conflict_do_nothing(index_elements=[Blob.sha256]).returning(Blob.sha256))
+        claimed.extend(result.scalars().all())
+    await attachment_io.unlink(*(blob_path(uploads_dir, sha256) for sha256 in claimed), *released.legacy_files)
+    if claimed:
+        await db.execute(delete(Blob).where(Blob.sha256.in_(claimed), Blob.ref_count == 0))
+    await db.commit()
@@ -0,0 +1,310 @@
+"""
+Multipart uploads streamed straight into the uploads directory, hashed and size-checked as they arrive.
+
+Starlette's form parsing spools every file to a temporary file first, and the services then
+copied it into place: each byte was written twice. Endpoints that take attachments depend
+on `streamed_form` instead. It feeds the request body through python-multipart as it is
+received and writes each file part to `<uploads>/.incoming/<random>.part` on the
+attachment pool (src/attachments/storage.py), updating its SHA-256 on the way. Storing
+the file is then a rename into its final place, on the same filesystem.
+
+Limits are enforced while the body streams in, so an oversized upload is refused with a 413
+as soon as it crosses one, without reading the rest: UPLOAD_MAX_REQUEST_BYTES for the
+whole body (also checked against Content-Length up front), UPLOAD_MAX_FILE_BYTES per file,
+UPLOAD_MAX_FILES files and UPLOAD_MAX_FIELD_BYTES per text field. Staged files that are not
+stored by the end of the request are deleted.
+
+Requests without files may still send their fields urlencoded (or send no body at all),
+as FastAPI's Form() accepted.
+"""
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator
+from urllib.parse import parse_qsl
+
+from fastapi import Depends, HTTPException, Request, status
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from src.config import settings
+from src.dependencies import get_uploads_dir
+from src.attachments.storage import attachment_io
+
+STAGING_DIR_NAME = ".incoming"
+_REQUIRED = object()
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+class MalformedUpload(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+@dataclass(frozen=True)
+class UploadLimits:
+    max_request_bytes: int
+    max_file_bytes: int
+    max_files: int
+    max_field_bytes: int
+
+    @classmethod
+    def from_settings(cls) -> "UploadLimits":
+        return cls(
+            settings.UPLOAD_MAX_REQUEST_BYTES, settings.UPLOAD_MAX_FILE_BYTES, settings.UPLOAD_MAX_FILES, settings.UPLOAD_MAX_FIELD_BYTES,
+        )
+
+
+class IncomingFile:
+    """An uploaded file, already on disk at `staged_path`; `sha256` is set once it is complete. A storage.StagedUpload."""
+
+    def __init__(self, field_name: str, filename: str, content_type: str | None, staged_path: Path):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.staged_path = staged_path
+        self.size = 0
+        self.sha256: str | None = None
+        self._digest = hashlib.sha256()
+        self._out = None
+
+    # The methods below run on the attachment pool, one at a time per file.
+    def _write(self, data: bytes):
+        if self._out is None:
+            self.staged_path.parent.mkdir(parents=True, exist_ok=True)
+            self._out = self.staged_path.open("wb")
+        self._out.write(data)
+        self._digest.update(data)
+
+    def _finish(self):
+        self._write(b"")
+        self._out.close()
+        self.sha256 = self._digest.hexdigest()
+
+    def _discard(self):
+        if self._out is not None:
+            self._out.close()
+        self.staged_path.unlink(missing_ok=True)
+
+
+class StreamedForm:
+    def __init__(self):
+        self.fields: dict[str, list[str]] = {}
+        self.files: list[IncomingFile] = []
+
+    def get(self, name: str, default=_REQUIRED) -> str:
+        """The value of text field `name`; a missing required field is a 422, like FastAPI's Form(...)."""
+        values = self.fields.get(name)
+        if values:
+            return values[-1]
+        if default is _REQUIRED:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=[{"type": "missing", "loc": ["body", name], "msg": "Field required", "input": None}],
+            )
+        return default
+
+    def files_for(self, name: str, required: bool = False) -> list[IncomingFile]:
+        files = [file for file in self.files if file.field_name == name]
+        if required and not files:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=[{"type": "missing", "loc": ["body", name], "msg": "Field required", "input": None}],
+            )
+        return files
+
+    async def discard(self):
+        """Delete the staged files that were not stored."""
+        if self.files:
+            await attachment_io.run("unlink", lambda: [file._discard() for file in self.files])
+
+
+def safe_filename(filename: str) -> str:
+    name = PurePosixPath(filename.replace("\\", "/")).name
+    if name in ("", ".", ".."):
+        raise MalformedUpload(f"Invalid file name: {filename!r}")
+    return name
+
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+class _Ingest:
+    """python-multipart callbacks. They run synchronously inside parser.write(); file data is queued for the pool."""
+
+    def __init__(self, form: StreamedForm, staging_dir: Path, limits: UploadLimits):
+        self.form = form
+        self.staging_dir = staging_dir
+        self.limits = limits
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._field: tuple[str, bytearray] | None = None
+        self._file: IncomingFile | None = None
+        self._skipping = False
+        self._pending: list[tuple[IncomingFile, bytes | None]] = []  # None finishes the file
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._field, self._file, self._skipping = None, None, False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name, self._header_value = b"", b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MalformedUpload('The Content-Disposition header field "name" must be provided.')
+        name = _decode(options[b"name"])
+        if b"filename" not in options:
+            self._field = (name, bytearray())
+        elif not options[b"filename"]:
+            # An empty file input: browsers send a part with filename="" and no data.
+            self._skipping = True
+        else:
+            if len(self.form.files) >= self.limits.max_files:
+                raise UploadTooLarge(f"Too many files. At most {self.limits.max_files} can be uploaded at once.")
+            content_type = self._headers.get(b"content-type")
+            self._file = IncomingFile(
+                name, safe_filename(_decode(options[b"filename"])), _decode(content_type) if content_type else None,
+                self.staging_dir / f"{uuid.uuid4().hex}.part",
+            )
+            self.form.files.append(self._file)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._skipping:
+            return
+        chunk = data[start:end]
+        if self._file is not None:
+            self._file.size += len(chunk)
+            if self._file.size > self.limits.max_file_bytes:
+                raise UploadTooLarge(f"File '{self._file.filename}' is larger than {self.limits.max_file_bytes} bytes.")
+            self._pending.append((self._file, chunk))
+        else:
+            value = self._field[1]
+            value += chunk
+            if len(value) > self.limits.max_field_bytes:
+                raise UploadTooLarge(f"Field '{self._field[0]}' is larger than {self.limits.max_field_bytes} bytes.")
+
+    def on_part_end(self):
+        if self._file is not None:
+            self._pending.append((self._file, None))
+        elif self._field is not None:
+            name, value = self._field
+            self.form.fields.setdefault(name, []).append(_decode(bytes(value)))
+
+    def flush(self) -> list[tuple[IncomingFile, bytes | None]]:
+        pending, self._pending = self._pending, []
+        return pending
+
+
+def _write_pending(pending: list[tuple[IncomingFile, bytes | None]]):
+    for file, data in pending:
+        if data is None:
+            file._finish()
+        else:
+            file._write(data)
+
+
+async def _read_body(request: Request, limits: UploadLimits) -> bytes:
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limits.max_request_bytes:
+            raise UploadTooLarge(f"Request body is larger than {limits.max_request_bytes} bytes.")
+    return bytes(body)
+
+
+async def ingest_multipart(request: Request, staging_dir: Path, limits: UploadLimits) -> StreamedForm:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limits.max_request_bytes:
+        raise UploadTooLarge(f"Request body is larger than {limits.max_request_bytes} bytes.")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+
+    form = StreamedForm()
+    if content_type in (b"", b"application/x-www-form-urlencoded"):
+        for name, value in parse_qsl(_decode(await _read_body(request, limits)), keep_blank_values=True):
+            if len(value.encode()) > limits.max_field_bytes:
+                raise UploadTooLarge(f"Field '{name}' is larger than {limits.max_field_bytes} bytes.")
+            form.fields.setdefault(name, []).append(value)
+        return form
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise MalformedUpload("Expected a multipart/form-data body.")
+
+    ingest = _Ingest(form, staging_dir, limits)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": ingest.on_part_begin,
+        "on_part_data": ingest.on_part_data,
+        "on_part_end": ingest.on_part_end,
+        "on_header_field": ingest.on_header_field,
+        "on_header_value": ingest.on_header_value,
+        "on_header_end": ingest.on_header_end,
+        "on_headers_finished": ingest.on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limits.max_request_bytes:
+                raise UploadTooLarge(f"Request body is larger than {limits.max_request_bytes} bytes.")
+            try:
+                parser.write(chunk)
+            except MultipartParseError as exc:
+                raise MalformedUpload(f"Malformed multipart body: {exc}")
+            # Waiting for the write before reading on gives backpressure: the body is read
+            # no faster than the disk takes it.
+            if pending := ingest.flush():
+                await attachment_io.run("write", _write_pending, pending)
+        parser.finalize()
+        if any(file.sha256 is None for file in form.files):
+            raise MalformedUpload("Incomplete multipart body.")
+    except BaseException:
+        await form.discard()
+        raise
+    return form
+
+
+async def streamed_form(request: Request, uploads_dir: Path = Depends(get_uploads_dir)) -> AsyncIterator[StreamedForm]:
+    """Dependency: the request's multipart body, its files staged in the uploads directory."""
+    form = await ingest_multipart(request, uploads_dir / STAGING_DIR_NAME, UploadLimits.from_settings())
+    try:
+        yield form
+    finally:
+        await form.discard()
+
+
+def multipart_openapi(required: tuple[str, ...] = (), optional: tuple[str, ...] = (), files_required: bool = False) -> dict:
+    """openapi_extra documenting a streamed_form body: text fields plus a `files` array."""
+    properties = {name: {"type": "string"} for name in (*required, *optional)}
+    properties["files"] = {"type": "array", "items": {"type": "string", "format": "binary"}}
+    schema = {"type": "object", "properties": properties, "required": [*required, *(["files"] if files_required else [])]}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
+
+def purge_stale_uploads(uploads_dir: Path, max_age_seconds: float = 24 * 3600) -> int:
+    """Delete staged files left behind by a worker that died mid-upload; returns how many."""
+    staging_dir = uploads_dir / STAGING_DIR_NAME
+    if not staging_dir.is_dir():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    stale = [path for path in staging_dir.glob("*.part") if path.stat().st_mtime < cutoff]
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return len(stale)
@@ -0,0 +1,30 @@
+from pathlib import PurePath
+
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import declared_attr
+
+from src.database import Base
+
+
+class Blob(Base):
+    """One stored file content, shared by every attachment with the same SHA-256; see src/attachments/blobs.py."""
+    __tablename__ = "blobs"
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime)
+
+
+class BlobAttachment:
+    """Columns of the attachment tables: the file's name as uploaded and the blob holding its content."""
+    # Attachments stored before the blob store have no blob and keep their own file here.
+    file_path = Column(String)
+    file_name = Column(String)
+
+    @declared_attr
+    def blob_sha256(cls):
+        return Column(String(64), ForeignKey("blobs.sha256"), index=True)
+
+    @property
+    def name(self) -> str:
+        return self.file_name or PurePath(self.file_path).name
@@ -2,57 +2,74 @@ import os
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.auth.dependencies import get_current_user
 from src.auth.models import User, UserRole
-from src.database import get_db
-from src.tasks.models import Submission
+from src.database import get_async_db
+from src.tasks.models import Submission, TaskAttachment
+from src.announcements.models import SchoolAnnouncementAttachment, CourseAnnouncementAttachment
 from src.dependencies import get_uploads_dir
 from src.tasks import service as tasks_service
+from src.attachments import blobs
 
 router = APIRouter(
     tags=["attachments"],
     responses={404: {"description": "Not found"}},
 )
 
+async def serve_attachment(db: AsyncSession, uploads_dir: Path, owner_column, owner_id: str, file_name: str, legacy_path: Path):
+    """The attachment `file_name` of an owner, from the blob store; files stored before it are served from `legacy_path`."""
+    model = owner_column.class_
+    result = await db.execute(
+        select(model).filter(owner_column == owner_id, model.file_name == file_name, model.blob_sha256.is_not(None)).limit(1)
+    )
+    attachment = result.scalars().first()
+    if attachment is not None:
+        file_path = blobs.attachment_path(uploads_dir, attachment)
+        if file_path.is_file():
+            return FileResponse(file_path, filename=attachment.name, content_disposition_type="inline")
+    if not legacy_path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return FileResponse(legacy_path)
+
 @router.get("/school-announcements/{announcement_id}/attachments/{file_name}")
 async def download_school_announcement_attachment(
-    announcement_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir)
+    announcement_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    file_path = uploads_dir / "school_announcements" / announcement_id / file_name
-    if not file_path.is_file():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    return FileResponse(file_path)
+    legacy_path = uploads_dir / "school_announcements" / announcement_id / file_name
+    return await serve_attachment(db, uploads_dir, SchoolAnnouncementAttachment.announcement_id, announcement_id, file_name, legacy_path)
 
 @router.get("/courses/{course_id}/announcements/{announcement_id}/attachments/{file_name}")
 async def download_course_announcement_attachment(
-    course_id: str, announcement_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir)
+    course_id: str, announcement_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    file_path = uploads_dir / "courses" / course_id / "announcements" / announcement_id / file_name
-    if not file_path.is_file():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    return FileResponse(file_path)
+    legacy_path = uploads_dir / "courses" / course_id / "announcements" / announcement_id / file_name
+    return await serve_attachment(db, uploads_dir, CourseAnnouncementAttachment.announcement_id, announcement_id, file_name, legacy_path)
 
 @router.get("/courses/{course_id}/tasks/{task_id}/attachments/{file_name}")
 async def download_task_attachment(
-    course_id: str, task_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir)
+    course_id: str, task_id: str, file_name: str, current_user: User = Depends(get_current_user), uploads_dir: Path = Depends(get_uploads_dir),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    file_path = uploads_dir / "courses" / course_id / "tasks" / task_id / "attachments" / file_name
-    if not file_path.is_file():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-    return FileResponse(file_path)
+    legacy_path = uploads_dir / "courses" / course_id / "tasks" / task_id / "attachments" / file_name
+    return await serve_attachment(db, uploads_dir, TaskAttachment.task_id, task_id, file_name, legacy_path)
 
 @router.get("/courses/{course_id}/tasks/{task_id}/submission/download")
 async def download_own_task_submission(
-    course_id: str, task_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    course_id: str, task_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    return tasks_service.download_own_submission(db, task_id, current_user)
+    return await tasks_service.download_own_submission(db, task_id, current_user, uploads_dir)
 
 @router.get("/courses/{course_id}/tasks/{task_id}/submissions/{student_roll_number}/download")
 async def download_student_task_submission(
-    course_id: str, task_id: str, student_roll_number: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    course_id: str, task_id: str, student_roll_number: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
     if current_user.role != UserRole.TEACHER:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    return tasks_service.download_submission(db, task_id, student_roll_number)
+    return await tasks_service.download_submission(db, task_id, student_roll_number, uploads_dir)
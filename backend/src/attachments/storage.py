@@ -0,0 +1,105 @@
+"""
+Attachment file I/O on a bounded thread pool, so uploads never hit the disk from the event loop.
+
+Every service that stores or deletes attachment files (tasks, submissions, announcements,
+course icons) goes through `attachment_io`. A save copies the upload's spooled file to
+its destination ATTACHMENT_IO_CHUNK_BYTES at a time on one of ATTACHMENT_IO_MAX_CONCURRENCY
+threads. The event loop only awaits the result, so other requests keep being served while
+a large scan is written, and a burst of uploads queues for the pool instead of for the
+disk. Deletes run on the same pool.
+
+Files that src/attachments/ingest.py already streamed into the uploads directory
+(`StagedUpload`s) are renamed into place instead of copied. Services take either kind as
+an `Upload`.
+"""
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Protocol, Union, runtime_checkable
+
+from fastapi import UploadFile
+
+from src.config import settings
+from src.metrics.registry import Gauge, Histogram
+
+ATTACHMENT_IO_IN_FLIGHT = Gauge("attachment_io_in_flight", "Attachment file operations queued or running.")
+ATTACHMENT_IO_DURATION = Histogram(
+    "attachment_io_seconds", "Time from queueing an attachment write, rename or delete to its completion.", ("op",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+@runtime_checkable
+class StagedUpload(Protocol):
+    """An upload already on disk in the uploads directory, as an ingest.IncomingFile is."""
+
+    filename: str
+    content_type: str | None
+    staged_path: Path
+    size: int
+    sha256: str | None
+
+
+# What the attachment services take: a spooled UploadFile or a file streamed in by ingest.
+Upload = Union[UploadFile, StagedUpload]
+
+
+class AttachmentIO:
+    def __init__(self, max_workers: int, chunk_size: int):
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attachment-io")
+
+    async def run(self, op: str, fn, *args):
+        """Run `fn(*args)` on the pool and await its result; `op` labels the timing metric."""
+        queued_at = time.perf_counter()
+        ATTACHMENT_IO_IN_FLIGHT.inc()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            ATTACHMENT_IO_IN_FLIGHT.dec()
+            ATTACHMENT_IO_DURATION.observe(time.perf_counter() - queued_at, op=op)
+
+    def _copy(self, source: BinaryIO, destination: Path) -> int:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name and renamed, so nobody reads a half-written file.
+        partial = destination.with_name(f"{destination.name}.{uuid.uuid4().hex}.part")
+        written = 0
+        try:
+            with partial.open("wb") as out:
+                while chunk := source.read(self.chunk_size):
+                    out.write(chunk)
+                    written += len(chunk)
+            os.replace(partial, destination)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return written
+
+    @staticmethod
+    def _move(source: Path, destination: Path):
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, destination)
+
+    @staticmethod
+    def _unlink(paths: tuple[Path, ...]):
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    async def save(self, upload: Upload, destination: Path) -> Path:
+        """Write `upload` to `destination`, creating its directory."""
+        if isinstance(upload, StagedUpload):
+            await self.run("rename", self._move, upload.staged_path, destination)
+        else:
+            await self.run("write", self._copy, upload.file, destination)
+        return destination
+
+    async def unlink(self, *paths):
+        """Delete files, ignoring ones that are already gone."""
+        if paths:
+            await self.run("unlink", self._unlink, tuple(Path(path) for path in paths))
+
+
+attachment_io = AttachmentIO(settings.ATTACHMENT_IO_MAX_CONCURRENCY, settings.ATTACHMENT_IO_CHUNK_BYTES)
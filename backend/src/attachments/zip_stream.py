@@ -0,0 +1,73 @@
+"""
+ZIP archives written as a stream, for downloads that bundle several attachments.
+
+zipfile can write to a file object that cannot seek: it then puts each member's CRC and
+sizes in a data descriptor after the member's data instead of going back to patch its
+local header. `stream_zip` writes into such an object, a small buffer, and hands the
+bytes over as soon as they are produced, reading every attachment CHUNK_SIZE bytes at a
+time. A download therefore holds about one chunk plus the compressor's window in memory,
+however large the submission is.
+
+Formats that are already compressed (images, PDFs, archives, office documents, media)
+are stored as they are: deflating them again costs CPU and saves next to nothing.
+"""
+import io
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+STORED_SUFFIXES = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".pdf",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp",
+    ".mp3", ".m4a", ".mp4", ".mov", ".webm",
+})
+
+
+class _Sink(io.RawIOBase):
+    """A write-only, unseekable buffer that is emptied with `drain()`."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def compress_type_for(path: Path) -> int:
+    return zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+
+
+def stream_zip(files: Iterable[tuple[Path, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `files`, given as (path on disk, name in the archive) pairs.
+    Paths that are not regular files are skipped.
+
+    This is a plain (blocking) generator: StreamingResponse runs it in the threadpool.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for path, name in files:
+            if not path.is_file():
+                continue
+            info = zipfile.ZipInfo.from_file(path, name, strict_timestamps=False)
+            info.compress_type = compress_type_for(path)
+            with open(path, "rb") as source, archive.open(info, "w") as member:
+                while chunk := source.read(chunk_size):
+                    member.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Date, Enum as SQLAlchemyEnum, LargeBinary, Boolean
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Date, Enum as SQLAlchemyEnum, LargeBinary, Boolean, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 import enum
@@ -11,15 +11,23 @@ class AttendanceStatusEnum(str, enum.Enum):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        Index("ix_attendance_class_code_date", "class_code", "date"),
+        Index("ix_attendance_student_roll_number_date", "student_roll_number", "date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     student_roll_number = Column(String, ForeignKey("users.roll_number"))
     date = Column(Date)
-    status = Column(SQLAlchemyEnum(AttendanceStatusEnum))
+    status = Column(SQLAlchemyEnum(AttendanceStatusEnum, native_enum=False))
     class_code = Column(String) # e.g., "10-A"
 
 
 class TeacherAttendance(Base):
     __tablename__ = "teacher_attendance"
+    __table_args__ = (
+        # A teacher checks in at most once a day.
+        Index("ix_teacher_attendance_teacher_roll_number_date", "teacher_roll_number", "date", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     teacher_roll_number = Column(String, ForeignKey("users.roll_number"))
     date = Column(Date, index=True)
@@ -45,9 +53,15 @@ class WebAuthnCredential(Base):
 
 class RecoveryCode(Base):
     __tablename__ = "recovery_codes"
+    __table_args__ = (
+        Index("ix_recovery_codes_user_roll_number_lookup_key", "user_roll_number", "lookup_key"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_roll_number = Column(String, ForeignKey("users.roll_number"))
     code_hash = Column(String, unique=True) # Store hash, not plaintext
+    # HMAC prefix of the code (see service_teacher.recovery_code_lookup_key), so a check-in
+    # bcrypt-verifies one candidate instead of every unused code. NULL for codes created before it existed.
+    lookup_key = Column(String(16), nullable=True)
     is_used = Column(Boolean, default=False)
     reason = Column(String, nullable=True) # Reason for using the recovery code
 
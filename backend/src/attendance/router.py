@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_async_db
 from src.auth.dependencies import get_current_user, get_current_teacher
 from src.auth.models import User
 from src.attendance import schemas, service
@@ -13,12 +13,12 @@ async def mark_class_attendance(
     class_code: str,
     attendance_data: schemas.AttendanceData,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Mark Class Attendance
     """
-    success, result = service.mark_class_attendance(db, class_code, attendance_data, current_user)
+    success, result = await service.mark_class_attendance(db, class_code, attendance_data, current_user)
     
     if not success:
         raise HTTPException(status_code=400, detail=result)
@@ -28,12 +28,12 @@ async def mark_class_attendance(
 @router.get("/me/attendance-history", response_model=schemas.AttendanceHistory)
 async def get_student_attendance_history(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get Student Attendance History
     """
-    history = service.get_student_attendance_history(db, current_user)
+    history = await service.get_student_attendance_history(db, current_user)
     return {"history": history}
 
 @router.get("/{class_code}/attendance-history", response_model=schemas.ClassAttendanceHistory)
@@ -41,10 +41,10 @@ async def get_class_attendance_history(
     class_code: str,
     attendance_date: date,
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get Class Attendance History for a specific date
     """
-    records = service.get_class_attendance_history(db, class_code, attendance_date)
+    records = await service.get_class_attendance_history(db, class_code, attendance_date)
     return {"records": records}
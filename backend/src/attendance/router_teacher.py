@@ -16,7 +16,7 @@ from src.database import get_db
 from src.auth.dependencies import get_current_teacher
 from src.auth.models import User
 from src.attendance import service_teacher, schemas
-from src.attendance.models import WebAuthnCredential, TeacherDevice, RecoveryCode
+from src.attendance.models import WebAuthnCredential, TeacherDevice
 
 router = APIRouter(prefix="/attendance/teacher", tags=["teacher-attendance"])
 
@@ -107,12 +107,7 @@ def verify_registration(
     )
     db.add(new_device)
 
-    from src.auth.service import pwd_context
-    new_recovery_code = RecoveryCode(
-        user_roll_number=current_user.roll_number,
-        code_hash=pwd_context.hash(credential_data.recovery_code)
-    )
-    db.add(new_recovery_code)
+    db.add(service_teacher.create_recovery_code(current_user, credential_data.recovery_code))
 
     db.commit()
     return {"message": "Device registered successfully."}
@@ -1,11 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.attendance import models, schemas
 from src.auth.models import User, UserRole
 from src.courses.models import Course
 from datetime import date
 from typing import Tuple, List
 
-def mark_class_attendance(db: Session, class_code: str, attendance_data: schemas.AttendanceData, teacher: User) -> Tuple[bool, List[str] | str]:
+async def mark_class_attendance(db: AsyncSession, class_code: str, attendance_data: schemas.AttendanceData, teacher: User) -> Tuple[bool, List[str] | str]:
     
     errors = []
 
@@ -14,7 +16,10 @@ def mark_class_attendance(db: Session, class_code: str, attendance_data: schemas
         return False, ["Only teachers can mark attendance."]
 
     # 2. Find the course associated with the class_code
-    course = db.query(Course).filter(Course.class_name == class_code).first()
+    result = await db.execute(
+        select(Course).options(selectinload(Course.students)).filter(Course.class_name == class_code)
+    )
+    course = result.scalars().first()
     if not course:
         return False, [f"Class with code {class_code} not found."]
 
@@ -24,7 +29,8 @@ def mark_class_attendance(db: Session, class_code: str, attendance_data: schemas
 
     # 4. Check if attendance has already been marked for this day
     today = date.today()
-    existing_attendance = db.query(models.Attendance).filter_by(class_code=class_code, date=today).first()
+    result = await db.execute(select(models.Attendance.id).filter_by(class_code=class_code, date=today).limit(1))
+    existing_attendance = result.first()
     if existing_attendance:
         return False, [f"Attendance for {class_code} has already been marked today."]
 
@@ -48,12 +54,14 @@ def mark_class_attendance(db: Session, class_code: str, attendance_data: schemas
 
     # 6. If no errors, add all records and commit
     db.add_all(records_to_add)
-    db.commit()
-    
+    await db.commit()
+
     return True, f"Attendance for class {class_code} on {today.isoformat()} has been successfully recorded."
 
-def get_student_attendance_history(db: Session, student: User):
-    return db.query(models.Attendance).filter(models.Attendance.student_roll_number == student.roll_number).all()
+async def get_student_attendance_history(db: AsyncSession, student: User):
+    result = await db.execute(select(models.Attendance).filter(models.Attendance.student_roll_number == student.roll_number))
+    return result.scalars().all()
 
-def get_class_attendance_history(db: Session, class_code: str, attendance_date: date):
-    return db.query(models.Attendance).filter_by(class_code=class_code, date=attendance_date).all()
+async def get_class_attendance_history(db: AsyncSession, class_code: str, attendance_date: date):
+    result = await db.execute(select(models.Attendance).filter_by(class_code=class_code, date=attendance_date))
+    return result.scalars().all()
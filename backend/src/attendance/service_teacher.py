@@ -1,10 +1,12 @@
 import base64
+import hashlib
+import hmac
 import webauthn
 from datetime import date, datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import extract
 from fastapi import HTTPException, status
 
+from src.config import settings
 from src.auth.models import User
 from src.attendance.models import TeacherAttendance, WebAuthnCredential, RecoveryCode
 from webauthn.helpers.structs import RegistrationCredential, AuthenticationCredential
@@ -79,20 +81,50 @@ def check_out_teacher(db: Session, user: User, lat: float, lon: float, method: s
 
 
 # --- Recovery Code ---
-def verify_recovery_code(db: Session, user: User, code: str, lat: float, lon: float, reason: str):
-    # This requires a password hashing library, e.g., passlib from your auth service
-    from src.auth.service import pwd_context
+def recovery_code_lookup_key(roll_number: str, code: str) -> str:
+    """A keyed 64-bit prefix that narrows a check-in attempt to (almost always) one stored code."""
+    if not settings.RECOVERY_CODE_LOOKUP_SECRET:
+        raise RuntimeError("RECOVERY_CODE_LOOKUP_SECRET is not set")
+    secret = settings.RECOVERY_CODE_LOOKUP_SECRET.encode()
+    return hmac.new(secret, f"{roll_number}:{code}".encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def create_recovery_code(user: User, code: str) -> RecoveryCode:
+    from src.auth.password_pool import password_pool
+
+    return RecoveryCode(
+        user_roll_number=user.roll_number,
+        code_hash=password_pool.hash_sync(code),
+        lookup_key=recovery_code_lookup_key(user.roll_number, code),
+    )
+
+
+def find_recovery_code(db: Session, user: User, code: str) -> RecoveryCode | None:
+    """The user's unused recovery code matching `code`, at one bcrypt check per attempt."""
+    from src.auth.password_pool import password_pool
 
+    lookup_key = recovery_code_lookup_key(user.roll_number, code)
+    candidates = db.query(RecoveryCode).filter_by(user_roll_number=user.roll_number, lookup_key=lookup_key, is_used=False).all()
+    for recovery_code in candidates:
+        if password_pool.verify_sync(code, recovery_code.code_hash):
+            return recovery_code
+
+    # Codes registered before lookup keys existed can only be found by trying each one.
+    # A match gets its key filled in (committed with the caller's check-in), so this
+    # scan shrinks to nothing as teachers use or re-register their codes.
+    legacy = db.query(RecoveryCode).filter_by(user_roll_number=user.roll_number, lookup_key=None, is_used=False).all()
+    for recovery_code in legacy:
+        if password_pool.verify_sync(code, recovery_code.code_hash):
+            recovery_code.lookup_key = lookup_key
+            return recovery_code
+    return None
+
+
+def verify_recovery_code(db: Session, user: User, code: str, lat: float, lon: float, reason: str):
     if not is_within_geofence(db, lat, lon):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not within the school premises.")
 
-    codes = db.query(RecoveryCode).filter_by(user_roll_number=user.roll_number, is_used=False).all()
-
-    valid_code = None
-    for recovery_code in codes:
-        if pwd_context.verify(code, recovery_code.code_hash):
-            valid_code = recovery_code
-            break
+    valid_code = find_recovery_code(db, user, code)
 
     if not valid_code:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or used recovery code.")
@@ -112,19 +144,10 @@ def verify_recovery_code(db: Session, user: User, code: str, lat: float, lon: fl
 
 def verify_recovery_code_for_checkout(db: Session, user: User, code: str, lat: float, lon: float,
                                       reason: str | None = None):
-    # This requires a password hashing library, e.g., passlib from your auth service
-    from src.auth.service import pwd_context
-
     if not is_within_geofence(db, lat, lon):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not within the school premises.")
 
-    codes = db.query(RecoveryCode).filter_by(user_roll_number=user.roll_number, is_used=False).all()
-
-    valid_code = None
-    for recovery_code in codes:
-        if pwd_context.verify(code, recovery_code.code_hash):
-            valid_code = recovery_code
-            break
+    valid_code = find_recovery_code(db, user, code)
 
     if not valid_code:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or used recovery code.")
@@ -172,10 +195,13 @@ def get_teacher_attendance_status(db: Session, user: User):
 
 
 def get_teacher_attendance_history(db: Session, user: User, year: int, month: int):
+    # A date range instead of extract() keeps the filter portable and index-friendly.
+    month_start = date(year, month, 1)
+    next_month_start = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
     records = db.query(TeacherAttendance).filter(
         TeacherAttendance.teacher_roll_number == user.roll_number,
-        extract('year', TeacherAttendance.date) == year,
-        extract('month', TeacherAttendance.date) == month
+        TeacherAttendance.date >= month_start,
+        TeacherAttendance.date < next_month_start
     ).all()
 
     for record in records:
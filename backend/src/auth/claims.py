@@ -0,0 +1,127 @@
+"""
+Authorization claims carried in the access token.
+
+At login the token gets the user's homeroom classes and courses and their course
+memberships, stamped with `ver` (the claims layout) and `cv` (the user's
+`claims_version`). Authorization dependencies read them from the token, not from
+the database.
+
+Any change to a course's students, teachers or homeroom teacher made through the ORM
+bumps `users.claims_version` for every user it affects, in the same flush. Those users
+leave the identity cache once that commits (not before, or a concurrent request could
+cache the old row again). get_current_user then refuses tokens whose `cv` is behind, so
+those users have to get a new token; a token ahead of a stale cached row makes it re-read
+the user. Bulk SQL that bypasses the ORM must call bump_claims_version() itself.
+"""
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.auth.models import User, UserRole
+from src.auth.identity_cache import identity_cache
+from src.courses.models import Course, student_course_association, teacher_course_association
+
+CLAIMS_LAYOUT_VERSION = 1
+
+
+@dataclass
+class TokenClaims:
+    claims_version: int
+    homeroom_classes: list[str] = field(default_factory=list)
+    homeroom_courses: list[str] = field(default_factory=list)
+    courses: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "TokenClaims | None":
+        """None for tokens without claims (or an older layout); callers then fall back to the database."""
+        if payload.get("ver") != CLAIMS_LAYOUT_VERSION:
+            return None
+        return cls(
+            claims_version=payload["cv"],
+            homeroom_classes=payload.get("homeroom_classes", []),
+            homeroom_courses=payload.get("homeroom_courses", []),
+            courses=payload.get("courses", []),
+        )
+
+
+async def build_token_claims(db: AsyncSession, user: User) -> dict:
+    """The claims to embed in `user`'s next access token."""
+    claims = {"ver": CLAIMS_LAYOUT_VERSION, "cv": user.claims_version or 0}
+
+    if user.role == UserRole.STUDENT:
+        association, roll_number_column = student_course_association, student_course_association.c.student_roll_number
+    elif user.role == UserRole.TEACHER:
+        association, roll_number_column = teacher_course_association, teacher_course_association.c.teacher_roll_number
+        result = await db.execute(
+            select(Course.id, Course.class_name).filter(Course.homeroom_teacher_id == user.roll_number).order_by(Course.id)
+        )
+        homeroom = result.all()
+        claims["homeroom_courses"] = [course_id for course_id, _ in homeroom]
+        claims["homeroom_classes"] = sorted({class_name for _, class_name in homeroom if class_name})
+    else:
+        return claims
+
+    result = await db.execute(select(association.c.course_id).filter(roll_number_column == user.roll_number))
+    claims["courses"] = sorted(result.scalars().all())
+    return claims
+
+
+def bump_claims_version(session: Session, roll_numbers):
+    """
+    Invalidate the tokens of these users, in `session`'s transaction (an AsyncSession passes
+    its `sync_session`); they must be re-issued to pass get_current_user once it commits.
+    """
+    roll_numbers = set(roll_numbers)
+    if not roll_numbers:
+        return
+    users = User.__table__
+    session.connection().execute(
+        update(users).where(users.c.roll_number.in_(roll_numbers)).values(claims_version=users.c.claims_version + 1)
+    )
+    session.info.setdefault("claims_bumped", set()).update(roll_numbers)
+
+
+def _roll_numbers(values) -> set[str]:
+    return {value.roll_number if isinstance(value, User) else value for value in values if value is not None}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_membership_changes(session, flush_context, instances):
+    affected = session.info.setdefault("claims_changed", set())
+    deleted = set(session.deleted)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        state = inspect(obj)
+        if isinstance(obj, Course):
+            for attr in ("students", "teachers", "homeroom_teacher", "homeroom_teacher_id"):
+                history = state.attrs[attr].history
+                affected |= _roll_numbers((*history.added, *history.deleted))
+                if obj in deleted:
+                    affected |= _roll_numbers(history.unchanged)
+        elif isinstance(obj, User):
+            for attr in ("student_courses", "teacher_courses"):
+                history = state.attrs[attr].history
+                if history.added or history.deleted:
+                    affected.add(obj.roll_number)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_claims(session, flush_context):
+    affected = session.info.pop("claims_changed", None)
+    if affected:
+        bump_claims_version(session, affected)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_bumped_users(session):
+    for roll_number in session.info.pop("claims_bumped", ()):
+        identity_cache.invalidate(roll_number)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_bumped_users(session, previous_transaction):
+    if previous_transaction.nested:
+        return  # a savepoint: bumps made before it may still commit
+    session.info.pop("claims_bumped", None)
+    session.info.pop("claims_changed", None)
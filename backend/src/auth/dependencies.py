@@ -1,18 +1,30 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config import settings
-from src.database import get_db
+from src.database import AsyncSessionLocal, get_async_db, reads_from_replica
 from src.auth import service as auth_service, schemas, models
 from src.auth.models import User
-from src.courses.models import Course
+from src.auth.identity_cache import identity_cache
+from src.auth.claims import TokenClaims
+from src.auth.membership_index import membership_index
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/api/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+
+async def _read_user_from_primary(db: AsyncSession, roll_number: str) -> User | None:
+    """The user's row as the primary has it now, past the identity cache and any replica lag."""
+    if reads_from_replica(db):
+        async with AsyncSessionLocal() as primary:
+            return await auth_service.get_user(primary, roll_number=roll_number)
+    result = await db.execute(select(User).filter(User.roll_number == roll_number).execution_options(populate_existing=True))
+    return result.scalars().first()
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,13 +36,35 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         if roll_number is None:
             raise credentials_exception
         token_data = schemas.TokenData(roll_number=roll_number)
-    except JWTError:
+        claims = TokenClaims.from_payload(payload)
+    except (JWTError, KeyError):
         raise credentials_exception
-    user = auth_service.get_user(db, roll_number=token_data.roll_number)
+    user = identity_cache.get(token_data.roll_number)
     if user is None:
-        raise credentials_exception
+        user = await auth_service.get_user(db, roll_number=token_data.roll_number)
+        if user is None:
+            raise credentials_exception
+        identity_cache.put(user)
+    if claims is not None and claims.claims_version > user.claims_version:
+        # A token issued after a change this process has not seen yet: the cached row is behind.
+        identity_cache.invalidate(token_data.roll_number)
+        user = await _read_user_from_primary(db, token_data.roll_number)
+        if user is None:
+            raise credentials_exception
+        identity_cache.put(user)
+    if claims is not None and claims.claims_version < user.claims_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Your courses have changed, please sign in again",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+        )
+    request.state.token_claims = claims
     return user
 
+def get_token_claims(request: Request) -> TokenClaims | None:
+    """The verified claims of the current access token, or None for tokens issued without them."""
+    return getattr(request.state, "token_claims", None)
+
 async def get_current_teacher(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.role == models.UserRole.TEACHER:
         raise HTTPException(
@@ -39,10 +73,15 @@ async def get_current_teacher(current_user: User = Depends(get_current_user)) ->
         )
     return current_user
 
-async def get_current_homeroom_teacher(current_user: User = Depends(get_current_teacher), db: Session = Depends(get_db)) -> User:
+async def get_current_homeroom_teacher(request: Request, current_user: User = Depends(get_current_teacher), db: AsyncSession = Depends(get_async_db)) -> User:
     # a teacher can be a homeroom teacher of multiple classes
-    homeroom_classes = db.query(Course).filter(Course.homeroom_teacher_id == current_user.roll_number).all()
-    if not homeroom_classes:
+    claims = get_token_claims(request)
+    if claims is not None:
+        is_homeroom_teacher = bool(claims.homeroom_courses)
+    else:
+        await membership_index.ensure_fresh(db)
+        is_homeroom_teacher = membership_index.is_homeroom_teacher(current_user.roll_number)
+    if not is_homeroom_teacher:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user is not a homeroom teacher"
@@ -57,18 +96,28 @@ async def get_current_principal(current_user: User = Depends(get_current_user))
         )
     return current_user
 
-async def get_current_student_or_homeroom_teacher(student_roll_number: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.role == models.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user is not an admin"
+        )
+    return current_user
+
+async def get_current_student_or_homeroom_teacher(request: Request, student_roll_number: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)) -> User:
     if current_user.role == models.UserRole.STUDENT and current_user.roll_number == student_roll_number:
         return current_user
 
     if current_user.role == models.UserRole.TEACHER:
-        homeroom_classes = db.query(Course).filter(Course.homeroom_teacher_id == current_user.roll_number).all()
-        if homeroom_classes:
-            # Check if the requested student is in one of the homeroom teacher's classes
-            for course in homeroom_classes:
-                for student in course.students:
-                    if student.roll_number == student_roll_number:
-                        return current_user
+        # Check if the requested student is in one of the homeroom teacher's classes
+        await membership_index.ensure_fresh(db)
+        claims = get_token_claims(request)
+        if claims is not None:
+            is_homeroom_teacher = not membership_index.student_courses(student_roll_number).isdisjoint(claims.homeroom_courses)
+        else:
+            is_homeroom_teacher = membership_index.is_homeroom_teacher_of_student(current_user.roll_number, student_roll_number)
+        if is_homeroom_teacher:
+            return current_user
 
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
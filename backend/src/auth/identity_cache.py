@@ -0,0 +1,105 @@
+"""
+In-process cache of authenticated users, so get_current_user can skip the users query.
+
+Entries are column snapshots keyed by roll_number and expire after
+IDENTITY_CACHE_TTL_SECONDS. The least recently used entry is evicted beyond
+IDENTITY_CACHE_MAX_SIZE. Each hit returns a fresh, detached User built from the
+snapshot, never a shared instance. Relationships are not loaded on it, and it must not
+be added to a session.
+
+Any change to a user made through the ORM in this process invalidates that user's entry:
+unit-of-work updates and deletes (profile edits) and bulk UPDATE/DELETE statements
+(the admin panel). Other workers only see the change once their entry expires, so the
+TTL bounds how long a role change or a deleted account can go unnoticed.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.auth.models import User
+from src.metrics.registry import Counter
+
+IDENTITY_CACHE_REQUESTS = Counter("identity_cache_requests_total", "get_current_user identity cache lookups.", ("result",))
+IDENTITY_CACHE_EVICTIONS = Counter("identity_cache_evictions_total", "Identity cache entries dropped for space.")
+
+SNAPSHOT_COLUMNS = tuple(column.key for column in User.__table__.columns if column.key != "password")
+
+
+class IdentityCache:
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # Invalidations can arrive from threadpool sessions (sync routers, the seed script).
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, roll_number: str) -> User | None:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(roll_number)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(roll_number)
+                snapshot = entry[1]
+            else:
+                if entry is not None:
+                    del self._entries[roll_number]
+                snapshot = None
+        if snapshot is None:
+            self.misses += 1
+            IDENTITY_CACHE_REQUESTS.inc(result="miss")
+            return None
+        self.hits += 1
+        IDENTITY_CACHE_REQUESTS.inc(result="hit")
+        return User(**snapshot)
+
+    def put(self, user: User):
+        if not self.enabled:
+            return
+        snapshot = {key: getattr(user, key) for key in SNAPSHOT_COLUMNS}
+        with self._lock:
+            self._entries[user.roll_number] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user.roll_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                IDENTITY_CACHE_EVICTIONS.inc()
+
+    def invalidate(self, roll_number: str):
+        with self._lock:
+            self._entries.pop(roll_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+identity_cache = IdentityCache(settings.IDENTITY_CACHE_TTL_SECONDS, settings.IDENTITY_CACHE_MAX_SIZE)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, user):
+    identity_cache.invalidate(user.roll_number)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_user_change(orm_execute_state):
+    # Bulk statements (e.g. the admin panel's update(User).where(...)) do not say which rows they hit.
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is User for mapper in orm_execute_state.all_mappers
+    ):
+        identity_cache.clear()
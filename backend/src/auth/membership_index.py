@@ -0,0 +1,271 @@
+"""
+In-memory index of who belongs to which course, for O(1) authorization checks.
+
+It holds student -> courses, teacher -> courses, homeroom teacher -> courses/classes and
+the reverse course -> students/teachers maps. It is loaded at startup and kept current
+incrementally: enrollment, teaching and homeroom changes made through the ORM are
+collected at flush time and applied when their transaction commits (a rollback discards
+them). Bulk statements against `courses` or the enrollment tables, such as the admin
+panel's, cannot be replayed, so they mark the index stale instead.
+
+A stale index, or one older than MEMBERSHIP_INDEX_MAX_AGE_SECONDS, is rebuilt from the
+database the next time an async request calls ensure_fresh(). Like the identity cache,
+that age bounds how long another worker's change can go unseen. One request rebuilds it
+while the others that find it stale wait for that rebuild, and the rebuild always reads
+the primary, even from a GET request whose session reads a lagging replica.
+check_consistency() compares the index with the database.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database import AsyncSessionLocal, reads_from_replica
+from src.auth.models import User
+from src.courses.models import Course, student_course_association, teacher_course_association
+from src.metrics.registry import Counter
+
+MEMBERSHIP_INDEX_RELOADS = Counter("membership_index_reloads_total", "Membership index rebuilds from the database.", ("reason",))
+
+_MEMBERSHIP_TABLES = {Course.__tablename__, student_course_association.name, teacher_course_association.name}
+
+
+@dataclass
+class _Snapshot:
+    course_students: dict[str, set[str]] = field(default_factory=dict)
+    course_teachers: dict[str, set[str]] = field(default_factory=dict)
+    student_courses: dict[str, set[str]] = field(default_factory=dict)
+    teacher_courses: dict[str, set[str]] = field(default_factory=dict)
+    homeroom_courses: dict[str, set[str]] = field(default_factory=dict)
+    course_homeroom: dict[str, str | None] = field(default_factory=dict)
+    course_class: dict[str, str | None] = field(default_factory=dict)
+
+    @classmethod
+    def from_database(cls, session: Session) -> "_Snapshot":
+        snapshot = cls()
+        for course_id, class_name, homeroom_teacher_id in session.execute(
+            select(Course.id, Course.class_name, Course.homeroom_teacher_id)
+        ):
+            snapshot.set_course(course_id, class_name, homeroom_teacher_id)
+        association = student_course_association.c
+        for course_id, roll_number in session.execute(select(association.course_id, association.student_roll_number)):
+            snapshot.add_member(snapshot.course_students, snapshot.student_courses, course_id, roll_number)
+        association = teacher_course_association.c
+        for course_id, roll_number in session.execute(select(association.course_id, association.teacher_roll_number)):
+            snapshot.add_member(snapshot.course_teachers, snapshot.teacher_courses, course_id, roll_number)
+        return snapshot
+
+    @staticmethod
+    def add_member(by_course, by_user, course_id, roll_number):
+        by_course.setdefault(course_id, set()).add(roll_number)
+        by_user.setdefault(roll_number, set()).add(course_id)
+
+    @staticmethod
+    def remove_member(by_course, by_user, course_id, roll_number):
+        by_course.get(course_id, set()).discard(roll_number)
+        by_user.get(roll_number, set()).discard(course_id)
+
+    def set_course(self, course_id, class_name, homeroom_teacher_id):
+        previous = self.course_homeroom.get(course_id)
+        if previous is not None:
+            self.homeroom_courses.get(previous, set()).discard(course_id)
+        if homeroom_teacher_id is not None:
+            self.homeroom_courses.setdefault(homeroom_teacher_id, set()).add(course_id)
+        self.course_homeroom[course_id] = homeroom_teacher_id
+        self.course_class[course_id] = class_name
+
+    def drop_course(self, course_id):
+        self.set_course(course_id, None, None)
+        self.course_homeroom.pop(course_id)
+        self.course_class.pop(course_id)
+        for roll_number in self.course_students.pop(course_id, set()):
+            self.student_courses.get(roll_number, set()).discard(course_id)
+        for roll_number in self.course_teachers.pop(course_id, set()):
+            self.teacher_courses.get(roll_number, set()).discard(course_id)
+
+    def drop_user(self, roll_number):
+        self.homeroom_courses.pop(roll_number, None)
+        for course_id in self.student_courses.pop(roll_number, set()):
+            self.course_students.get(course_id, set()).discard(roll_number)
+        for course_id in self.teacher_courses.pop(roll_number, set()):
+            self.course_teachers.get(course_id, set()).discard(roll_number)
+
+    def apply(self, change):
+        operation, course_id, *args = change
+        if operation == "drop_user":
+            self.drop_user(course_id)
+        elif operation == "set_course":
+            self.set_course(course_id, *args)
+        elif operation == "drop_course":
+            self.drop_course(course_id)
+        else:
+            maps = (self.course_students, self.student_courses) if operation.endswith("student") else (self.course_teachers, self.teacher_courses)
+            if operation.startswith("add"):
+                self.add_member(*maps, course_id, *args)
+            else:
+                self.remove_member(*maps, course_id, *args)
+
+
+class MembershipIndex:
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: _Snapshot | None = None
+        self._loaded_at = 0.0
+        self._stale = True
+        # Changes are applied from whichever thread commits (sync routers run in the threadpool).
+        self._lock = threading.Lock()
+        # Single-flight rebuilds in ensure_fresh(); an asyncio lock belongs to one event loop.
+        self._reload_loop = None
+        self._reload_lock: asyncio.Lock | None = None
+
+    def load(self, session: Session):
+        snapshot = _Snapshot.from_database(session)
+        with self._lock:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+            self._stale = False
+
+    def invalidate(self):
+        """Force a rebuild on the next ensure_fresh(); until then readers keep the current snapshot."""
+        self._stale = True
+
+    @property
+    def is_fresh(self) -> bool:
+        return not self._stale and time.monotonic() - self._loaded_at < self.max_age_seconds
+
+    def _reload_guard(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._reload_loop is not loop:
+            self._reload_loop, self._reload_lock = loop, asyncio.Lock()
+        return self._reload_lock
+
+    async def ensure_fresh(self, db: AsyncSession):
+        """Rebuild the index if it is missing, stale or too old: from `db`, or the primary if `db` reads a replica."""
+        if self.is_fresh:
+            return
+        async with self._reload_guard():
+            if self.is_fresh:
+                # Rebuilt by the request we waited for.
+                return
+            MEMBERSHIP_INDEX_RELOADS.inc(reason="invalidated" if self._stale else "expired")
+            if reads_from_replica(db):
+                async with AsyncSessionLocal() as primary:
+                    await primary.run_sync(self.load)
+            else:
+                await db.run_sync(self.load)
+
+    def apply(self, changes):
+        with self._lock:
+            if self._snapshot is not None:
+                for change in changes:
+                    self._snapshot.apply(change)
+
+    def _get(self, mapping: str, key) -> set[str]:
+        # The live set: only for single C-level operations (membership, isdisjoint), which
+        # the GIL keeps atomic with respect to a concurrent apply().
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("membership index is not loaded; await membership_index.ensure_fresh(db) first")
+        return getattr(snapshot, mapping).get(key, set())
+
+    # --- Queries (all O(1) or O(size of the answer)) ---
+    def student_courses(self, roll_number: str) -> frozenset[str]:
+        return frozenset(self._get("student_courses", roll_number))
+
+    def teacher_courses(self, roll_number: str) -> frozenset[str]:
+        return frozenset(self._get("teacher_courses", roll_number))
+
+    def course_students(self, course_id: str) -> frozenset[str]:
+        return frozenset(self._get("course_students", course_id))
+
+    def homeroom_courses(self, roll_number: str) -> frozenset[str]:
+        return frozenset(self._get("homeroom_courses", roll_number))
+
+    def homeroom_classes(self, roll_number: str) -> set[str]:
+        with self._lock:
+            course_class = self._snapshot.course_class if self._snapshot is not None else {}
+            return {course_class[course_id] for course_id in self.homeroom_courses(roll_number) if course_class.get(course_id)}
+
+    def is_student_of(self, course_id: str, roll_number: str) -> bool:
+        return roll_number in self._get("course_students", course_id)
+
+    def is_teacher_of(self, course_id: str, roll_number: str) -> bool:
+        return roll_number in self._get("course_teachers", course_id)
+
+    def is_homeroom_teacher(self, roll_number: str) -> bool:
+        return bool(self._get("homeroom_courses", roll_number))
+
+    def is_homeroom_teacher_of_student(self, teacher_roll_number: str, student_roll_number: str) -> bool:
+        return not self._get("homeroom_courses", teacher_roll_number).isdisjoint(self._get("student_courses", student_roll_number))
+
+    def check_consistency(self, session: Session) -> list[str]:
+        """Differences between the index and the database, one line each; empty when they agree."""
+        actual = _Snapshot.from_database(session)
+        indexed = self._snapshot
+        if indexed is None:
+            return ["index is not loaded"]
+        problems = []
+        for name in actual.__dataclass_fields__:
+            expected, found = getattr(actual, name), getattr(indexed, name)
+            for key in sorted(expected.keys() | found.keys(), key=str):
+                # Empty sets left behind by removals are the same as missing keys.
+                if (expected.get(key) or None) != (found.get(key) or None):
+                    problems.append(f"{name}[{key!r}]: database has {expected.get(key)!r}, index has {found.get(key)!r}")
+        return problems
+
+
+membership_index = MembershipIndex(settings.MEMBERSHIP_INDEX_MAX_AGE_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_membership_changes(session, flush_context):
+    changes = session.info.setdefault("membership_changes", [])
+    for obj in (*session.new, *session.dirty):
+        state = inspect(obj)
+        if isinstance(obj, Course):
+            if obj in session.new or any(
+                state.attrs[attr].history.has_changes() for attr in ("class_name", "homeroom_teacher", "homeroom_teacher_id")
+            ):
+                changes.append(("set_course", obj.id, obj.class_name, obj.homeroom_teacher_id))
+            for attr, kind in (("students", "student"), ("teachers", "teacher")):
+                history = state.attrs[attr].history
+                changes.extend(("add_" + kind, obj.id, user.roll_number) for user in history.added)
+                changes.extend(("remove_" + kind, obj.id, user.roll_number) for user in history.deleted)
+        elif isinstance(obj, User):
+            for attr, kind in (("student_courses", "student"), ("teacher_courses", "teacher")):
+                history = state.attrs[attr].history
+                changes.extend(("add_" + kind, course.id, obj.roll_number) for course in history.added)
+                changes.extend(("remove_" + kind, course.id, obj.roll_number) for course in history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, Course):
+            changes.append(("drop_course", obj.id))
+        elif isinstance(obj, User):
+            changes.append(("drop_user", obj.roll_number))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_stale_on_bulk_change(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in _MEMBERSHIP_TABLES:
+            orm_execute_state.session.info["membership_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_membership_changes(session):
+    changes = session.info.pop("membership_changes", None)
+    if session.info.pop("membership_stale", False):
+        membership_index.invalidate()
+    elif changes:
+        membership_index.apply(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_membership_changes(session, previous_transaction):
+    session.info.pop("membership_changes", None)
+    session.info.pop("membership_stale", None)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum as SQLAlchemyEnum
 from sqlalchemy.orm import relationship
 from src.database import Base
 from src.courses.models import student_course_association, teacher_course_association
@@ -15,7 +15,7 @@ class User(Base):
 
     roll_number = Column(String, primary_key=True, index=True)
     password = Column(String)
-    role = Column(SQLAlchemyEnum(UserRole))
+    role = Column(SQLAlchemyEnum(UserRole, native_enum=False))
     name = Column(String)
     classroom = Column(String, nullable=True) # e.g. 10-A
     email = Column(String, nullable=True)
@@ -23,7 +23,21 @@ class User(Base):
     phone_mother = Column(String, nullable=True)
     phone_father = Column(String, nullable=True)
     home_address = Column(String, nullable=True)
+    # Bumped whenever the user's courses or homeroom classes change; see src/auth/claims.py
+    claims_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     student_courses = relationship("Course", secondary=student_course_association, back_populates="students")
     teacher_courses = relationship("Course", secondary=teacher_course_association, back_populates="teachers")
     submissions = relationship("Submission", back_populates="student")
+
+class RefreshToken(Base):
+    """One issued refresh token; see src/auth/refresh_tokens.py. The token itself is never stored."""
+    __tablename__ = "refresh_tokens"
+
+    token_hash = Column(String(64), primary_key=True)  # SHA-256 hex digest of the token
+    family_id = Column(String(32), nullable=False, index=True)  # shared by every rotation of one login
+    roll_number = Column(String, ForeignKey("users.roll_number", ondelete="CASCADE"), nullable=False, index=True)
+    password_stamp = Column(String(16), nullable=False)  # changing the password retires the token
+    expires_at = Column(DateTime, nullable=False)
+    rotated_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
@@ -0,0 +1,93 @@
+"""
+A bounded worker pool for bcrypt, so password checks never run on the event loop.
+
+bcrypt releases the GIL, so BCRYPT_MAX_CONCURRENCY threads hash in parallel. Beyond that,
+up to BCRYPT_MAX_QUEUE jobs wait their turn. Past that the pool refuses new work with a 503,
+so a login storm costs some users a retry instead of stalling every other request.
+Async callers await the result; sync callers (threadpool routers) block on it. A job's slot
+is released when its future is done, which includes an awaiting request being cancelled
+while the job is still queued.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from src.config import settings
+from src.auth import service as auth_service
+from src.metrics.registry import Counter, Gauge, Histogram
+
+BCRYPT_QUEUE_DEPTH = Gauge("bcrypt_pool_queue_depth", "bcrypt jobs waiting for a worker.")
+BCRYPT_IN_FLIGHT = Gauge("bcrypt_pool_in_flight", "bcrypt jobs being hashed right now.")
+BCRYPT_QUEUE_WAIT = Histogram(
+    "bcrypt_pool_wait_seconds", "Time a bcrypt job waited for a worker.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+BCRYPT_REJECTED = Counter("bcrypt_pool_rejected_total", "bcrypt jobs refused because the queue was full.")
+
+
+class PasswordPoolBusy(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins at once, please try again in a moment",
+            headers={"Retry-After": "1"},
+        )
+
+
+class PasswordPool:
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Jobs queued or running."""
+        return self._pending
+
+    def _run(self, queued_at: float, fn, args):
+        BCRYPT_QUEUE_DEPTH.dec()
+        BCRYPT_QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+        BCRYPT_IN_FLIGHT.inc()
+        try:
+            return fn(*args)
+        finally:
+            BCRYPT_IN_FLIGHT.dec()
+
+    def _release(self, future: Future):
+        if future.cancelled():
+            # Cancelled while queued (the awaiting request went away): _run never started.
+            BCRYPT_QUEUE_DEPTH.dec()
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                BCRYPT_REJECTED.inc()
+                raise PasswordPoolBusy()
+            self._pending += 1
+        BCRYPT_QUEUE_DEPTH.inc()
+        future = self._executor.submit(self._run, time.perf_counter(), fn, args)
+        future.add_done_callback(self._release)
+        return future
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self.submit(auth_service.verify_password, plain_password, hashed_password))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(auth_service.get_password_hash, password))
+
+    def verify_sync(self, plain_password: str, hashed_password: str) -> bool:
+        return self.submit(auth_service.verify_password, plain_password, hashed_password).result()
+
+    def hash_sync(self, password: str) -> str:
+        return self.submit(auth_service.get_password_hash, password).result()
+
+
+password_pool = PasswordPool(settings.BCRYPT_MAX_CONCURRENCY, settings.BCRYPT_MAX_QUEUE)
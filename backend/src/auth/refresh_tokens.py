@@ -0,0 +1,139 @@
+"""
+Rotating refresh tokens, so clients renew access tokens without another bcrypt login.
+
+/login issues an opaque refresh token next to the access token. /refresh spends it for
+a new access token and a new refresh token. Each refresh token is single use, and all the
+tokens descended from one login share a `family_id`. Only the SHA-256 of a token is kept
+in `refresh_tokens`.
+
+Presenting a refresh token that was already rotated means two parties hold it, so the
+whole family is revoked and both have to sign in again. The exception is a second
+rotation within REFRESH_TOKEN_REUSE_GRACE_SECONDS: that is taken to be another tab that
+loaded the same token, and it gets its own successor. /logout revokes the family. A
+password change retires every refresh token issued before it (`password_stamp`); a
+rehash of the same password at login carries them over.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.auth.models import RefreshToken, User
+from src.metrics.registry import Counter
+
+REFRESH_TOKEN_ROTATIONS = Counter(
+    "refresh_token_rotations_total", "/refresh outcomes (rotated, concurrent, reused, invalid).", ("result",)
+)
+
+
+class InvalidRefreshToken(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Your session has expired, please sign in again",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def password_stamp(user: User) -> str:
+    return hashlib.sha256((user.password or "").encode()).hexdigest()[:16]
+
+
+async def issue_refresh_token(db: AsyncSession, user: User, family_id: str | None = None) -> str:
+    """Add a new refresh token for `user` to the session (the caller commits) and return it."""
+    now = _now()
+    if family_id is None:
+        family_id = secrets.token_hex(16)
+        # A new login is a good moment to drop this user's dead tokens and keep the table small.
+        await db.execute(delete(RefreshToken).where(RefreshToken.roll_number == user.roll_number, RefreshToken.expires_at <= now))
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_token(token),
+        family_id=family_id,
+        roll_number=user.roll_number,
+        password_stamp=password_stamp(user),
+        expires_at=now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def restamp_refresh_tokens(db: AsyncSession, user: User, previous_stamp: str):
+    """Keep `user`'s refresh tokens valid when the same password is rehashed (e.g. at a higher bcrypt cost)."""
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.roll_number == user.roll_number, RefreshToken.password_stamp == previous_stamp)
+        .values(password_stamp=password_stamp(user))
+    )
+
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=_now())
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> tuple[User, str]:
+    """Spend `token`; returns its user and their next refresh token, committed."""
+    token_hash = hash_token(token)
+    now = _now()
+    # Claiming the token with a conditional UPDATE makes rotation race-free: of two
+    # concurrent requests, exactly one sees rowcount == 1.
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+    )
+    row = (await db.execute(select(RefreshToken).filter(RefreshToken.token_hash == token_hash))).scalars().first()
+    if row is None or row.revoked_at is not None or row.expires_at <= now:
+        await db.rollback()
+        REFRESH_TOKEN_ROTATIONS.inc(result="invalid")
+        raise InvalidRefreshToken()
+
+    if claimed.rowcount != 1:
+        if now - row.rotated_at > timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS):
+            await revoke_family(db, row.family_id)
+            await db.commit()
+            REFRESH_TOKEN_ROTATIONS.inc(result="reused")
+            raise InvalidRefreshToken()
+        result = "concurrent"
+    else:
+        result = "rotated"
+
+    user = (await db.execute(select(User).filter(User.roll_number == row.roll_number))).scalars().first()
+    if user is None or password_stamp(user) != row.password_stamp:
+        await revoke_family(db, row.family_id)
+        await db.commit()
+        REFRESH_TOKEN_ROTATIONS.inc(result="invalid")
+        raise InvalidRefreshToken()
+
+    new_token = await issue_refresh_token(db, user, family_id=row.family_id)
+    await db.commit()
+    REFRESH_TOKEN_ROTATIONS.inc(result=result)
+    return user, new_token
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    """Log out: revoke the family `token` belongs to. Unknown tokens are ignored."""
+    row = (await db.execute(select(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)))).scalars().first()
+    if row is not None:
+        await revoke_family(db, row.family_id)
+        await db.commit()
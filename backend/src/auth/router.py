@@ -1,35 +1,29 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.database import get_async_db
 from src.auth import service as auth_service, schemas, constants
+from src.auth.claims import build_token_claims
+from src.auth.models import User
+from src.auth.password_pool import password_pool
+from src.auth.refresh_tokens import (
+    issue_refresh_token, rotate_refresh_token, revoke_refresh_token, restamp_refresh_tokens, password_stamp,
+)
 from src.users.schemas import User as UserSchema
-from src.auth.models import UserRole
-from src.courses.models import Course
 
 router = APIRouter()
 
-@router.post("/login", response_model=schemas.LoginResponse)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth_service.get_user(db, roll_number=form_data.username)
-    if not user or not auth_service.verify_password(form_data.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect roll number or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+async def _login_response(db: AsyncSession, user: User, refresh_token: str) -> schemas.LoginResponse:
+    claims = await build_token_claims(db, user)
     access_token_expires = timedelta(minutes=constants.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth_service.create_access_token(
-        data={"sub": user.roll_number, "role": user.role.value}, expires_delta=access_token_expires
+        data={"sub": user.roll_number, "role": user.role.value, **claims}, expires_delta=access_token_expires
     )
 
-    homeroom_class = None
-    if user.role == UserRole.TEACHER:
-        classroom = db.query(Course).filter(Course.homeroom_teacher_id == user.roll_number).first()
-        if classroom:
-            homeroom_class = classroom.class_name
+    homeroom_classes = claims.get("homeroom_classes")
+    homeroom_class = homeroom_classes[0] if homeroom_classes else None
 
     user_details = UserSchema(
         name=user.name,
@@ -37,4 +31,32 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         role=user.role,
         homeroom_class=homeroom_class
     )
-    return schemas.LoginResponse(access_token=access_token, token_type="bearer", user=user_details)
+    return schemas.LoginResponse(access_token=access_token, token_type="bearer", refresh_token=refresh_token, user=user_details)
+
+@router.post("/login", response_model=schemas.LoginResponse)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await auth_service.get_user(db, roll_number=form_data.username)
+    if not user or not await password_pool.verify(form_data.password, user.password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect roll number or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if auth_service.needs_rehash(user.password):
+        # The password is known to be right, so this is the moment to move it to the current bcrypt cost.
+        previous_stamp = password_stamp(user)
+        user.password = await password_pool.hash(form_data.password)
+        await restamp_refresh_tokens(db, user, previous_stamp)
+    refresh_token = await issue_refresh_token(db, user)
+    await db.commit()
+    return await _login_response(db, user, refresh_token)
+
+@router.post("/refresh", response_model=schemas.LoginResponse)
+async def refresh_access_token(body: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    # No password check: the refresh token is the credential, so this never touches bcrypt.
+    user, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+    return await _login_response(db, user, refresh_token)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    await revoke_refresh_token(db, body.refresh_token)
@@ -4,8 +4,12 @@ from src.users.schemas import User
 class LoginResponse(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
     user: User
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class TokenData(BaseModel):
     roll_number: str | None = None
 
@@ -1,22 +1,70 @@
+import logging
+import time
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt
 from passlib.context import CryptContext
 
 from src.config import settings
 from src.auth import models, schemas
+from src.metrics.registry import BCRYPT_VERIFY_DURATION
+
+logger = logging.getLogger("taskwise.auth")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_user(db: Session, roll_number: str):
-    return db.query(models.User).filter(models.User.roll_number == roll_number).first()
+async def get_user(db: AsyncSession, roll_number: str):
+    result = await db.execute(select(models.User).filter(models.User.roll_number == roll_number))
+    return result.scalars().first()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        BCRYPT_VERIFY_DURATION.observe(time.perf_counter() - started)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def needs_rehash(hashed_password) -> bool:
+    """True for hashes below the current bcrypt cost; they are upgraded on the next successful login."""
+    return pwd_context.needs_update(hashed_password)
+
+def time_bcrypt_verify(cost: int, repeat: int = 3) -> float:
+    """Median seconds to verify a bcrypt hash of the given cost on this machine."""
+    hashed = pwd_context.hash("calibration", rounds=cost)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pwd_context.verify("calibration", hashed)
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2]
+
+def calibrate_bcrypt_cost(target_seconds: float, min_cost: int, max_cost: int) -> int:
+    """The highest cost in [min_cost, max_cost] whose verification stays within target_seconds."""
+    cost = min_cost
+    # Each step doubles the work, so this stops after about 2 x target_seconds of hashing.
+    while cost < max_cost and time_bcrypt_verify(cost + 1) <= target_seconds:
+        cost += 1
+    return cost
+
+def set_bcrypt_cost(cost: int):
+    # min_rounds makes needs_update() flag cheaper hashes. Costlier ones (from a faster
+    # worker) are left alone, so workers that calibrate differently never rehash back and forth.
+    pwd_context.update(bcrypt__default_rounds=cost, bcrypt__min_rounds=cost)
+
+def configure_bcrypt_cost() -> int:
+    """Pick the bcrypt cost for new hashes: BCRYPT_COST if set, otherwise calibrated to BCRYPT_TARGET_VERIFY_MS."""
+    if settings.BCRYPT_COST is not None:
+        cost = settings.BCRYPT_COST
+    else:
+        cost = calibrate_bcrypt_cost(settings.BCRYPT_TARGET_VERIFY_MS / 1000, settings.BCRYPT_MIN_COST, settings.BCRYPT_MAX_COST)
+    set_bcrypt_cost(cost)
+    logger.info("bcrypt cost set to %d", cost, extra={"bcrypt_cost": cost})
+    return cost
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
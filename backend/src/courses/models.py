@@ -1,11 +1,13 @@
-from sqlalchemy import Column, String, ForeignKey, Table
+from sqlalchemy import Column, String, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 
 student_course_association = Table(
     'student_course_association', Base.metadata,
     Column('student_roll_number', String, ForeignKey('users.roll_number'), primary_key=True),
-    Column('course_id', String, ForeignKey('courses.id'), primary_key=True)
+    Column('course_id', String, ForeignKey('courses.id'), primary_key=True),
+    # The primary key leads with the student; rosters look up by course.
+    Index('ix_student_course_association_course_id_student_roll_number', 'course_id', 'student_roll_number'),
 )
 
 teacher_course_association = Table(
@@ -19,10 +21,10 @@ class Course(Base):
 
     id = Column(String, primary_key=True, index=True)
     name = Column(String, index=True)
-    class_name = Column(String)
+    class_name = Column(String, index=True)
     accent_color = Column(String)
     accent_image = Column(String, nullable=True)
-    homeroom_teacher_id = Column(String, ForeignKey("users.roll_number"))
+    homeroom_teacher_id = Column(String, ForeignKey("users.roll_number"), index=True)
 
     tasks = relationship("Task", back_populates="course")
     announcements = relationship("CourseAnnouncement", back_populates="course")
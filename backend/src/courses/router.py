@@ -1,53 +1,70 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Union
+from src.database import get_async_db
 from src.auth.dependencies import get_current_user
 from src.auth.models import User
 from src.users import schemas
 from src.courses import service
 from src.courses import schemas as course_schemas
+from src.pagination import PageParams, page_params
 
 router = APIRouter()
 
 @router.get("/courses/{course_id}")
-async def get_course(course_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_course(course_id: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Retrieves details for a specific course.
     """
-    course = service.get_course(db, course_id=course_id, user=current_user)
+    course = await service.get_course(db, course_id=course_id, user=current_user)
     return course
 
 @router.put("/me/{course_id}/accent_image")
-async def update_course_accent_image(course_id: str, accent_image: UploadFile = File(...), current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_course_accent_image(course_id: str, accent_image: UploadFile = File(...), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Updates the accent_image for a specific course.
     """
-    service.update_course_accent_image(db, course_id=course_id, accent_image=accent_image, user=current_user)
+    await service.update_course_accent_image(db, course_id=course_id, accent_image=accent_image, user=current_user)
     return {"message": "Course accent_image updated successfully"}
 
-@router.get("/me/{course_id}/dashboard", response_model=schemas.CourseDashboard)
-async def get_course_dashboard(course_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/me/{course_id}/dashboard", response_model=Union[schemas.CourseDashboard, schemas.CourseDashboardPage])
+async def get_course_dashboard(
+    course_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    page: PageParams | None = Depends(page_params),
+):
     """
-    Retrieves all the announcements and tasks for a specific course.
+    Retrieves the announcements and tasks for a specific course, newest first.
+    With `limit`/`cursor`, returns up to `limit` of each and a `next_cursor`.
     """
-    dashboard = service.get_course_dashboard(db, course_id=course_id, user=current_user)
+    dashboard = await service.get_course_dashboard(db, course_id=course_id, user=current_user, page=page)
     return dashboard
 
 @router.get("/me/{course_id}/search", response_model=schemas.CourseDashboard)
-async def search_in_course(course_id: str, q: str = Query(..., min_length=1), current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def search_in_course(course_id: str, q: str = Query(..., min_length=1), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Searches for announcements and tasks within a specific course.
     """
-    results = service.search_in_course(db, course_id=course_id, query=q, user=current_user)
+    results = await service.search_in_course(db, course_id=course_id, query=q, user=current_user)
     return results
 
-@router.get("/{course_id}/students", response_model=schemas.StudentList)
-async def list_students_in_class(course_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/{course_id}/students", response_model=Union[schemas.StudentList, schemas.StudentPage])
+async def list_students_in_class(
+    course_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    page: PageParams | None = Depends(page_params),
+):
     """
     Retrieves a list of all students enrolled in a specific course.
     """
-    students = service.list_students_in_class(db, course_id=course_id, user=current_user)
-    
+    next_cursor = None
+    if page is None:
+        students = await service.list_students_in_class(db, course_id=course_id, user=current_user)
+    else:
+        students, next_cursor = await service.get_roster_page(db, course_id, page)
+
     formatted_students = [
         {
             "name": student.name,
@@ -56,4 +73,6 @@ async def list_students_in_class(course_id: str, current_user: User = Depends(ge
         } for student in students
     ]
     
-    return {"students": formatted_students}
+    if page is None:
+        return {"students": formatted_students}
+    return {"students": formatted_students, "next_cursor": next_cursor}
@@ -1,21 +1,37 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from src.courses import models as course_models
 from src.auth.models import User, UserRole
+from src.auth.membership_index import membership_index
 from src.announcements.models import CourseAnnouncement
+from src.announcements.service import COURSE_ANNOUNCEMENT_LOAD_OPTIONS
 from src.tasks.models import Task
+from src.tasks.service import task_load_options
 from src.announcements.router import format_announcement
-from src.tasks.router import format_task
+from src.tasks.router import format_tasks
 from src.exceptions import CourseNotFound, NotACourseTeacher
 from fastapi import UploadFile
-import shutil
 from pathlib import Path
 from src.courses import schemas as course_schemas
+from src.attachments.storage import attachment_io
+from src.pagination import PageParams, InvalidCursor, encode_cursor, feed_key, newest_first, split_page
 
-def get_course(db: Session, course_id: str, user: User) -> dict:
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
+async def _get_course(db: AsyncSession, course_id: str, *options):
+    result = await db.execute(
+        select(course_models.Course).options(*options).filter(course_models.Course.id == course_id)
+    )
+    course = result.scalars().first()
     if not course:
         raise CourseNotFound(course_id=course_id)
+    return course
+
+async def get_course(db: AsyncSession, course_id: str, user: User) -> dict:
+    course = await _get_course(
+        db, course_id,
+        selectinload(course_models.Course.students),
+        selectinload(course_models.Course.homeroom_teacher),
+    )
 
     if user.role == UserRole.TEACHER:
         return {
@@ -36,68 +52,115 @@ def get_course(db: Session, course_id: str, user: User) -> dict:
             "accent_image": course.accent_image,
         }
 
-def update_course_accent_image(db: Session, course_id: str, accent_image: UploadFile, user: User):
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
-    if not course:
-        raise CourseNotFound(course_id=course_id)
+async def update_course_accent_image(db: AsyncSession, course_id: str, accent_image: UploadFile, user: User):
+    course = await _get_course(db, course_id)
 
-    if user not in course.teachers:
+    await membership_index.ensure_fresh(db)
+    if not membership_index.is_teacher_of(course_id, user.roll_number):
         raise NotACourseTeacher(course_id=course_id)
 
     upload_dir = Path(f"uploads/courses/{course_id}")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    accent_image_path = upload_dir / "icon.png"
-    with open(accent_image_path, "wb") as buffer:
-        shutil.copyfileobj(accent_image.file, buffer)
+    await attachment_io.save(accent_image, upload_dir / "icon.png")
 
     course.accent_image = f"v1/api/{course_id}/icon.png"
-    db.commit()
+    await db.commit()
+
+async def get_course_dashboard(db: AsyncSession, course_id: str, user: User, page: PageParams | None = None):
+    if page is not None:
+        return await _get_course_dashboard_page(db, course_id, user, page)
+
+    course = await _get_course(
+        db, course_id,
+        selectinload(course_models.Course.announcements).options(*COURSE_ANNOUNCEMENT_LOAD_OPTIONS),
+        selectinload(course_models.Course.tasks).options(*task_load_options(user, with_submissions=False)),
+    )
 
-def get_course_dashboard(db: Session, course_id: str, user: User):
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
-    if not course:
-        raise CourseNotFound(course_id=course_id)
-    
     return {
         "announcements": [format_announcement(ann) for ann in course.announcements],
-        "tasks": [format_task(task, user, db) for task in course.tasks]
+        "tasks": await format_tasks(course.tasks, user, db, with_submissions=False)
     }
 
-def search_in_course(db: Session, course_id: str, query: str, user: User):
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
-    if not course:
-        raise CourseNotFound(course_id=course_id)
-        
-    announcements = db.query(CourseAnnouncement).filter(
-        CourseAnnouncement.course_id == course_id,
-        or_(
-            CourseAnnouncement.title.ilike(f"%{query}%"),
-            CourseAnnouncement.description.ilike(f"%{query}%")
+async def _get_course_dashboard_page(db: AsyncSession, course_id: str, user: User, page: PageParams):
+    """
+    Pages announcements and tasks side by side, newest first, up to `limit` of each.
+
+    The cursor keeps one position per list: a missing entry means "from the start" and
+    null means that list is exhausted, so a short list stops while the other continues.
+    """
+    await _get_course(db, course_id)
+    position = page.cursor or {}
+    next_position = {}
+
+    async def fetch(model, options, name):
+        if name in position and position[name] is None:
+            next_position[name] = None
+            return []
+        statement = newest_first(select(model).options(*options).filter(model.course_id == course_id), model, position.get(name))
+        rows, has_more = split_page((await db.execute(statement.limit(page.limit + 1))).scalars().all(), page.limit)
+        next_position[name] = feed_key(rows[-1]) if has_more else None
+        return rows
+
+    announcements = await fetch(CourseAnnouncement, COURSE_ANNOUNCEMENT_LOAD_OPTIONS, "announcements")
+    tasks = await fetch(Task, task_load_options(user, with_submissions=False), "tasks")
+
+    return {
+        "announcements": [format_announcement(ann) for ann in announcements],
+        "tasks": await format_tasks(tasks, user, db, with_submissions=False),
+        "next_cursor": encode_cursor(next_position) if any(next_position.values()) else None,
+    }
+
+async def search_in_course(db: AsyncSession, course_id: str, query: str, user: User):
+    await _get_course(db, course_id)
+
+    result = await db.execute(
+        select(CourseAnnouncement).options(*COURSE_ANNOUNCEMENT_LOAD_OPTIONS).filter(
+            CourseAnnouncement.course_id == course_id,
+            or_(
+                CourseAnnouncement.title.icontains(query, autoescape=True),
+                CourseAnnouncement.description.icontains(query, autoescape=True)
+            )
         )
-    ).all()
+    )
+    announcements = result.scalars().all()
 
-    tasks = db.query(Task).filter(
-        Task.course_id == course_id,
-        or_(
-            Task.title.ilike(f"%{query}%"),
-            Task.description.ilike(f"%{query}%")
+    result = await db.execute(
+        select(Task).options(*task_load_options(user, with_submissions=False)).filter(
+            Task.course_id == course_id,
+            or_(
+                Task.title.icontains(query, autoescape=True),
+                Task.description.icontains(query, autoescape=True)
+            )
         )
-    ).all()
-    
+    )
+    tasks = result.scalars().all()
+
     return {
         "announcements": [format_announcement(ann) for ann in announcements],
-        "tasks": [format_task(task, user, db) for task in tasks]
+        "tasks": await format_tasks(tasks, user, db, with_submissions=False)
     }
 
-def list_students_in_class(db: Session, course_id: str, user: User):
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
-    if not course:
-        raise CourseNotFound(course_id=course_id)
+async def list_students_in_class(db: AsyncSession, course_id: str, user: User):
+    course = await _get_course(db, course_id, selectinload(course_models.Course.students))
     return course.students
 
-def get_students_count_in_class(db: Session, course_id: str):
-    course = db.query(course_models.Course).filter(course_models.Course.id == course_id).first()
-    if not course:
-        raise CourseNotFound(course_id=course_id)
+async def get_roster_page(db: AsyncSession, course_id: str, page: PageParams) -> tuple[list[User], str | None]:
+    """One page of a course's students ordered by roll number, and the cursor of the next page."""
+    await _get_course(db, course_id)
+    after = page.cursor.get("after") if page.cursor else None
+    if after is not None and not isinstance(after, str):
+        raise InvalidCursor()
+    association = course_models.student_course_association.c
+    statement = (
+        select(User)
+        .join(course_models.student_course_association, association.student_roll_number == User.roll_number)
+        .filter(association.course_id == course_id)
+        .order_by(association.student_roll_number)
+    )
+    if after is not None:
+        statement = statement.filter(association.student_roll_number > after)
+    students, has_more = split_page((await db.execute(statement.limit(page.limit + 1))).scalars().all(), page.limit)
+    return students, encode_cursor({"after": students[-1].roll_number}) if has_more else None
+
+async def get_students_count_in_class(db: AsyncSession, course_id: str):
+    course = await _get_course(db, course_id, selectinload(course_models.Course.students))
     return len(course.students)
@@ -1,35 +1,230 @@
-from sqlalchemy import create_engine
+import itertools
+import time
+
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url, URL
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 
-DATABASE_URL = "sqlite:///./school.db"
+from src.config import settings
+from src.metrics.registry import DB_POOL_CHECKOUT_WAIT
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+DATABASE_URL = settings.DATABASE_URL
+
+
+def to_async_url(url: str) -> str:
+    """The async-driver URL for the same database as a sync DATABASE_URL."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    elif parsed.get_backend_name() == "postgresql" and parsed.get_driver_name() != "psycopg":
+        # psycopg 3 speaks both sync and async; psycopg2 URLs fall back to asyncpg.
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+
+def sqlite_pragmas() -> dict:
+    """The PRAGMA statements of the SQLite production profile, in the order they are applied."""
+    if not settings.SQLITE_PRODUCTION_PROFILE:
+        return {}
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def configure_sqlite_engine(engine, pragmas: dict | None = None):
+    """Run the given PRAGMAs on every new DBAPI connection of a sync or async engine."""
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
+class _CheckoutTimer:
+    """Pool mixin that reports how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_CheckoutTimer, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def engine_options(url: str | URL, is_async: bool = False) -> dict:
+    """create_engine() keyword arguments for the backend named by the URL."""
+    url = make_url(url)
+    options = {"poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool, **pool_options()}
+
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    # PostgreSQL: drop dead connections before use and cap every statement server-side.
+    statement_timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"server_settings": {"statement_timeout": statement_timeout}}
+    else:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+    return options
+
+
+def create_db_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        configure_sqlite_engine(engine)
+    return engine
+
+
+class SessionRouter:
+    """
+    Picks the session factory for a request: GET/HEAD requests read from a replica,
+    everything else goes to the primary. A client that wrote within the last
+    `sticky_seconds` keeps reading from the primary, so it sees its own writes
+    even while the replicas lag behind.
+    """
+    READ_METHODS = frozenset({"GET", "HEAD"})
+
+    def __init__(self, primary, replicas=(), sticky_seconds: float = 0.0, last_write: dict | None = None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self._replica_cycle = itertools.cycle(self.replicas)
+        # Shared between the sync and async routers so a write on either path counts.
+        self._last_write: dict[str, float] = {} if last_write is None else last_write
+
+    @staticmethod
+    def client_key(request: Request) -> str:
+        # The token's subject identifies the user without a database lookup, and stays the
+        # same when the client swaps its access token through /refresh.
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                subject = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG]).get("sub")
+            except JWTError:
+                subject = None
+            if subject:
+                return f"user:{subject}"
+        return f"addr:{request.client.host if request.client else ''}"
+
+    def is_sticky(self, request: Request) -> bool:
+        last_write = self._last_write.get(self.client_key(request))
+        return last_write is not None and time.monotonic() - last_write < self.sticky_seconds
+
+    def record_write(self, request: Request):
+        now = time.monotonic()
+        if len(self._last_write) > 10_000:
+            for key, at in list(self._last_write.items()):
+                if now - at >= self.sticky_seconds:
+                    self._last_write.pop(key, None)
+        self._last_write[self.client_key(request)] = now
+
+    def for_request(self, request: Request):
+        if request.method not in self.READ_METHODS:
+            self.record_write(request)
+            return self.primary
+        if not self.replicas or self.is_sticky(request):
+            return self.primary
+        return next(self._replica_cycle)
+
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+recent_writes: dict[str, float] = {}
+
+replica_engines = [create_db_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+session_router = SessionRouter(
+    SessionLocal,
+    [sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines],
+    settings.READ_YOUR_WRITES_SECONDS,
+    recent_writes,
+)
+
 Base = declarative_base()
 
-# This sync dependency is used by all your API routers
-def get_db():
-    db = SessionLocal()
+# This sync dependency is kept for the sync `def` routers (teacher attendance, geofence),
+# which FastAPI already runs in a threadpool. The seed script uses SessionLocal directly.
+def get_db(request: Request):
+    db = session_router.for_request(request)()
     try:
         yield db
     finally:
         db.close()
+        if request.method not in SessionRouter.READ_METHODS:
+            session_router.record_write(request)
+
+# --- START: ASYNCHRONOUS SETUP (API routers and the Admin Panel) ---
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
-# --- START: NEW ASYNCHRONOUS SETUP (for the Admin Panel) ---
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
-# The async connection string for the SAME database file
-ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./school.db"
+def create_async_db_engine(url: str):
+    async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+    if async_engine.dialect.name == "sqlite":
+        configure_sqlite_engine(async_engine)
+    return async_engine
 
-async_engine = create_async_engine(ASYNC_DATABASE_URL)
-AsyncSessionLocal = sessionmaker(
+
+# The async connection string for the SAME database
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
     bind=async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
-# This new async dependency will be used ONLY by the admin panel
-async def get_async_db():
-    async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+async_replica_engines = [create_async_db_engine(to_async_url(url)) for url in settings.DATABASE_REPLICA_URLS]
+async_session_router = SessionRouter(
+    AsyncSessionLocal,
+    [async_sessionmaker(bind=replica, class_=AsyncSession, expire_on_commit=False) for replica in async_replica_engines],
+    settings.READ_YOUR_WRITES_SECONDS,
+    recent_writes,
+)
+
+def reads_from_replica(session: AsyncSession) -> bool:
+    """Whether `session` was routed to a read replica (a GET/HEAD request's session)."""
+    bind = session.get_bind()
+    return any(bind is replica.sync_engine for replica in async_replica_engines)
+
+# This async dependency is used by the `async def` API routers and the admin panel.
+# Sessions never lazy-load: services must request relationships up front with
+# selectinload()/joinedload() options.
+async def get_async_db(request: Request):
+    async with async_session_router.for_request(request)() as session:
+        yield session
+    if request.method not in SessionRouter.READ_METHODS:
+        # Restart the read-your-writes window once the write has committed.
+        async_session_router.record_write(request)
@@ -35,6 +35,13 @@ class SubmissionAlreadyExists(HTTPException):
             detail={"message": "You have already submitted this task", "task_id": task_id},
         )
 
+class SubmissionChanged(HTTPException):
+    def __init__(self, task_id: str):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "The submission was changed by another request; reload it and try again", "task_id": task_id},
+        )
+
 class NotACourseTeacher(HTTPException):
     def __init__(self, course_id: str):
         super().__init__(
@@ -3,6 +3,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
+from src.config import settings
 from src.database import engine, Base, SessionLocal, get_db, get_async_db
 from src.auth.router import router as auth_router
 from src.users.router import router as users_router
@@ -14,7 +15,15 @@ from src.attendance.router_teacher import router as teacher_attendance_router
 from src.attachments.router import router as attachments_router
 from src.assets.router import router as assets_router
 from src.geofence.router import router as geofence_router
+from src.metrics.router import router as metrics_router
 from src.seed import seed_data
+from src.migrations import run_migrations
+from src.dependencies import get_uploads_dir
+from src.attachments.ingest import purge_stale_uploads
+from src.tasks.archives import purge_stale_archive_parts
+from src.tasks import counters as task_counters
+from src.query_stats import QueryStatsMiddleware
+from src.metrics.middleware import MetricsMiddleware
 from src.exceptions import TaskNotFound, CourseNotFound, AnnouncementNotFound, NotAuthorized, SubmissionAlreadyExists
 
 # --- START: Added imports for Admin Panel ---
@@ -34,14 +43,18 @@ from src.admin_schemas import (
     UserAdminCreate, UserAdminUpdate, CourseAdmin, SchoolAnnouncementAdmin,
     CourseAnnouncementAdmin, TaskAdmin, SubmissionAdminUpdate, AttendanceAdmin, ScheduleAdmin
 )
-from src.auth.service import get_password_hash
+from src.auth.membership_index import membership_index
+from src.auth import service as auth_service
 # --- END: Added imports for Admin Panel ---
 
 
 # --- START: Admin Panel Configuration ---
 # 1. Define a password hasher for the admin panel to use when creating/updating users
+# crudadmin calls this synchronously from its async handlers, so it cannot await the pool.
+# It hashes directly instead: waiting on the pool would also hold the event loop while
+# queued behind sign-ins, and a full queue would refuse the admin's save with a 503.
 def hash_password(password: str) -> str:
-    return get_password_hash(password)
+    return auth_service.get_password_hash(password)
 
 
 # 2. Create the PasswordTransformer to securely handle user passwords in the admin form
@@ -125,13 +138,33 @@ admin.add_view(
 # for the admin panel's async initialization to work properly.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Recovery-code lookup keys are HMACs under their own secret, never the JWT signing key
+    if not settings.RECOVERY_CODE_LOOKUP_SECRET:
+        raise RuntimeError("RECOVERY_CODE_LOOKUP_SECRET must be set; see README, \"Schema Migrations\"")
+
     # Create database tables for your main application
     Base.metadata.create_all(bind=engine)
+    # Bring tables that already existed up to the current schema (indexes etc.)
+    run_migrations(engine)
+
+    # Pick the bcrypt cost for this machine before anything is hashed
+    auth_service.configure_bcrypt_cost()
 
     # Create seed data only if not in a test environment
     if os.environ.get("TESTING") != "True":
         seed_data()
 
+    # Authorization checks read course membership from memory; see src/auth/membership_index.py
+    with SessionLocal() as session:
+        membership_index.load(session)
+        # Per-task submission counts, recomputed in case submissions changed outside the app; see src/tasks/counters.py
+        task_counters.rebuild(session)
+
+    # Staged upload files from a worker that died mid-request; see src/attachments/ingest.py
+    purge_stale_uploads(get_uploads_dir())
+    # Likewise partial "download all submissions" archives; see src/tasks/archives.py
+    purge_stale_archive_parts(get_uploads_dir())
+
     # Initialize the admin interface (creates the admin DB and initial user)
     await admin.initialize()
 
@@ -143,6 +176,12 @@ app = FastAPI(lifespan=lifespan)
 # Add middleware for session support (needed for challenge storage)
 app.add_middleware(SessionMiddleware, secret_key="a-very-secret-key-for-dev-change-it")
 
+# Per-request SQL query count/time, as X-DB-* headers in DEBUG and as log fields otherwise
+app.add_middleware(QueryStatsMiddleware)
+
+# Route-template latency histograms, status codes, in-flight and upload bytes for /v1/api/metrics
+app.add_middleware(MetricsMiddleware)
+
 
 @app.exception_handler(TaskNotFound)
 async def task_not_found_exception_handler(request: Request, exc: TaskNotFound):
@@ -194,6 +233,7 @@ app.include_router(attachments_router, prefix="/v1/api", tags=["attachments"])
 app.include_router(assets_router,prefix="/v1/api", tags=["assets"])
 app.include_router(teacher_attendance_router, prefix="/v1/api")
 app.include_router(geofence_router, prefix="/v1/api", tags=["geofence"])
+app.include_router(metrics_router, prefix="/v1/api", tags=["metrics"])
 
 app.mount("/admin", admin.app)
 
@@ -0,0 +1,57 @@
+import time
+
+from src.config import settings
+from src.metrics.registry import HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS, UPLOAD_BYTES
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, e.g. `/{course_id}/tasks/{task_id}`; raw paths would explode the label set."""
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path"):
+        return "unmatched"
+    return scope.get("root_path", "") + route.path
+
+
+class MetricsMiddleware:
+    """Records latency, status, in-flight count and upload size of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        upload_bytes = 0
+        is_upload = any(
+            name == b"content-type" and value.startswith(b"multipart/form-data") for name, value in scope["headers"]
+        )
+
+        async def counting_receive():
+            nonlocal upload_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                upload_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive if is_upload else receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.dec(method=method)
+            route = route_template(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+            if upload_bytes:
+                UPLOAD_BYTES.inc(upload_bytes, route=route)
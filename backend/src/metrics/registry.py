@@ -0,0 +1,180 @@
+"""
+A small Prometheus-compatible metrics registry whose hot path takes no locks.
+
+Every thread records into its own shard (a plain dict). Only the owning thread writes to
+a shard, so under the GIL an increment is never lost and never contended. The event
+loop thread serves all async requests from one shard, and each threadpool worker has
+its own. render() adds the shards together at scrape time. When a thread exits (pool
+threads come and go), its shard is folded into one shard of retired totals, so the
+number of shards stays bounded by the live threads. The registry is per process:
+with several uvicorn workers, each worker serves its own numbers.
+"""
+import math
+import threading
+import weakref
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The values of threads that have exited; always the first shard.
+_retired: dict = {}
+_shards: list[dict] = [_retired]
+# Taken when a thread's shard is created or retired, and while render() adds them up.
+# Re-entrant, in case a thread's shard is retired while that thread holds it.
+_shards_lock = threading.RLock()
+_local = threading.local()
+
+REGISTRY: list["Metric"] = []
+
+
+class _ShardOwner:
+    """Held only by a thread's local storage, so it is collected when the thread exits."""
+
+    def __init__(self, shard: dict):
+        self.shard = shard
+
+
+def _retire(shard: dict):
+    with _shards_lock:
+        for key, value in shard.items():
+            metric = key[0]
+            _retired[key] = metric._merge(_retired.get(key), value)
+        # By identity: list.remove() compares dicts by value, and may match `_retired`.
+        _shards[:] = [other for other in _shards if other is not shard]
+
+
+def _shard() -> dict:
+    owner = getattr(_local, "owner", None)
+    if owner is None:
+        owner = _local.owner = _ShardOwner({})
+        with _shards_lock:
+            _shards.append(owner.shard)
+        weakref.finalize(owner, _retire, owner.shard)
+    return owner.shard
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return (self, tuple(str(labels[name]) for name in self.labels))
+
+    def collect(self) -> dict[tuple, object]:
+        """This metric's values summed over all shards, keyed by label values."""
+        totals = {}
+        # Under the lock, so a shard being retired is counted exactly once.
+        with _shards_lock:
+            for shard in list(_shards):
+                for (metric, label_values), value in list(shard.items()):
+                    if metric is self:
+                        totals[label_values] = self._merge(totals.get(label_values), value)
+        return totals
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for label_values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = _shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = _shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = _shard()
+        key = self._key(labels)
+        # One count per bucket (non-cumulative) plus +Inf, then the sum and the count.
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(self.buckets) + 3)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def _merge(self, total, value):
+        value = list(value)
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for label_values, values in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# --- Application metrics ---
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being served.", ("method",))
+UPLOAD_BYTES = Counter("http_upload_bytes_total", "Bytes received in multipart (file upload) request bodies.", ("route",))
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the database pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+BCRYPT_VERIFY_DURATION = Histogram(
+    "bcrypt_verify_seconds", "Time spent verifying a bcrypt hash (passwords, recovery codes).",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5),
+)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from src.auth.dependencies import get_current_admin
+from src.auth.models import User
+from src.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(current_user: User = Depends(get_current_admin)):
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,132 @@
+"""
+Versioned, in-place upgrades of an existing database (e.g. a school.db from an older release).
+
+Base.metadata.create_all() only creates tables that are missing; it never adds an index
+or column to a table that already exists. Such changes are written here as numbered
+migrations. Each one runs once, in its own transaction, and is recorded in the
+`schema_migrations` table. Migrations must be idempotent (a fresh database already has
+everything create_all() built) and must never be renumbered or edited once released:
+append a new one instead.
+"""
+from datetime import datetime
+from pathlib import PurePath
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, select, insert, text, inspect
+
+from src.database import Base
+from src.attachments.models import Blob
+
+schema_migrations = Table(
+    "schema_migrations", Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied_at", DateTime),
+)
+
+
+def _execute_all(connection, statements):
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def add_hot_path_indexes(connection):
+    # Fails on the UNIQUE indexes if the database already holds duplicate submissions,
+    # check-ins or schedule slots; those rows have to be cleaned up by hand first.
+    _execute_all(connection, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_submissions_task_id_student_id ON submissions (task_id, student_id)",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_class_code_date ON attendance (class_code, date)",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_student_roll_number_date ON attendance (student_roll_number, date)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_teacher_attendance_teacher_roll_number_date ON teacher_attendance (teacher_roll_number, date)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_schedules_class_id_day_of_week_period ON schedules (class_id, day_of_week, period)",
+        "CREATE INDEX IF NOT EXISTS ix_courses_class_name ON courses (class_name)",
+        "CREATE INDEX IF NOT EXISTS ix_courses_homeroom_teacher_id ON courses (homeroom_teacher_id)",
+        "CREATE INDEX IF NOT EXISTS ix_course_announcements_course_id_created_at ON course_announcements (course_id, created_at)",
+    ])
+
+
+def _add_column(connection, table: str, column: str, ddl: str):
+    if column not in {existing["name"] for existing in inspect(connection).get_columns(table)}:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def add_users_claims_version(connection):
+    _add_column(connection, "users", "claims_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def add_recovery_code_lookup_key(connection):
+    # Existing codes keep a NULL lookup_key (only their bcrypt hash is known); the first
+    # successful check-in with one fills it in.
+    _add_column(connection, "recovery_codes", "lookup_key", "VARCHAR(16)")
+    _execute_all(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_recovery_codes_user_roll_number_lookup_key ON recovery_codes (user_roll_number, lookup_key)",
+    ])
+
+
+def add_pagination_indexes(connection):
+    # Keyset pages filter and order on (created_at, id); rosters on the course's students.
+    _execute_all(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_tasks_course_id_created_at_id ON tasks (course_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_school_announcements_created_at_id ON school_announcements (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_course_announcements_course_id_created_at_id ON course_announcements (course_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_student_course_association_course_id_student_roll_number "
+        "ON student_course_association (course_id, student_roll_number)",
+    ])
+
+
+ATTACHMENT_TABLES = (
+    "task_attachments", "submission_attachments", "school_announcement_attachments", "course_announcement_attachments",
+)
+
+
+def add_attachment_blobs(connection):
+    # Existing attachments keep their file_path (and file) and get no blob; only their name
+    # is filled in, which is what listings and downloads match on.
+    Blob.__table__.create(connection, checkfirst=True)
+    for table in ATTACHMENT_TABLES:
+        _add_column(connection, table, "file_name", "VARCHAR")
+        _add_column(connection, table, "blob_sha256", "VARCHAR(64) REFERENCES blobs (sha256)")
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_blob_sha256 ON {table} (blob_sha256)"))
+        legacy = connection.execute(text(f"SELECT id, file_path FROM {table} WHERE file_name IS NULL AND file_path IS NOT NULL"))
+        for attachment_id, file_path in legacy.all():
+            connection.execute(
+                text(f"UPDATE {table} SET file_name = :file_name WHERE id = :id"),
+                {"file_name": PurePath(file_path).name, "id": attachment_id},
+            )
+
+
+def drop_superseded_indexes(connection):
+    # (course_id, created_at) is a prefix of the pagination index, which serves the same queries.
+    _execute_all(connection, [
+        "DROP INDEX IF EXISTS ix_course_announcements_course_id_created_at",
+    ])
+
+
+# (version, name, migration), in the order they are applied.
+MIGRATIONS = [
+    (1, "hot path indexes", add_hot_path_indexes),
+    (2, "users.claims_version", add_users_claims_version),
+    (3, "recovery_codes.lookup_key", add_recovery_code_lookup_key),
+    (4, "pagination indexes", add_pagination_indexes),
+    (5, "attachment blobs", add_attachment_blobs),
+    (6, "drop superseded indexes", drop_superseded_indexes),
+]
+
+
+def applied_versions(engine) -> set[int]:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine) -> list[int]:
+    """Apply every migration the database has not seen yet; returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, migration in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as connection:
+            migration(connection)
+            connection.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.now()))
+        applied.append(version)
+    return applied
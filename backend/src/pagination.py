@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination for listing endpoints.
+
+A paginated listing is ordered on a unique key, newest first for feeds
+(`created_at, id`) and by roll number for rosters. A cursor is an opaque token holding
+the key of the last item the client has seen. The next page is therefore a range scan
+that starts after it: unlike OFFSET, it costs the same on page 100 as on page 1, and
+rows inserted meanwhile neither repeat nor skip items.
+
+Requests that pass neither `limit` nor `cursor` get the old unpaginated response while
+PAGINATION_LEGACY_UNPAGINATED is on (the default until the frontend migrates).
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import tuple_
+
+from src.config import settings
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+
+@dataclass
+class PageParams:
+    limit: int
+    cursor: dict | None
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor()
+    if not isinstance(position, dict):
+        raise InvalidCursor()
+    return position
+
+
+def page_params(
+    limit: int | None = Query(None, ge=1, description=f"Page size, at most {settings.PAGINATION_MAX_LIMIT}"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+) -> PageParams | None:
+    """Dependency: the requested page, or None for the legacy unpaginated response."""
+    if limit is None and cursor is None and settings.PAGINATION_LEGACY_UNPAGINATED:
+        return None
+    return PageParams(
+        limit=min(limit or settings.PAGINATION_DEFAULT_LIMIT, settings.PAGINATION_MAX_LIMIT),
+        cursor=decode_cursor(cursor) if cursor is not None else None,
+    )
+
+
+def feed_key(item) -> list:
+    """The cursor key of a row ordered by (created_at, id)."""
+    return [item.created_at.isoformat(), item.id]
+
+
+def parse_feed_key(key) -> tuple[datetime, str]:
+    try:
+        created_at, item_id = key
+        return datetime.fromisoformat(created_at), str(item_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor()
+
+
+def newest_first(statement, model, key=None):
+    """Order `statement` by (created_at, id) descending, starting after `key` if given."""
+    if key is not None:
+        statement = statement.filter(tuple_(model.created_at, model.id) < tuple_(*parse_feed_key(key)))
+    return statement.order_by(model.created_at.desc(), model.id.desc())
+
+
+def split_page(rows: list, limit: int) -> tuple[list, bool]:
+    """Callers fetch limit + 1 rows; returns the page and whether anything follows it."""
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,138 @@
+"""
+Per-request SQL instrumentation.
+
+Engine-level `before/after_cursor_execute` events record every statement of every
+engine (sync, async, replicas) into the QueryStats of the request that is running.
+QueryStatsMiddleware opens one QueryStats per HTTP request and reports it:
+
+- with `DEBUG=True`, as `X-DB-Query-Count`, `X-DB-Query-Time-Ms` and `X-DB-Slowest-Query-Ms` response headers;
+- with `SQL_STATS_LOGGING=True`, as one structured log record per request on the `taskwise.sql` logger.
+
+A statement repeated more than `N_PLUS_ONE_THRESHOLD` times in one request (the same
+SQL with different parameters, i.e. a lazy load per row) is logged as an N+1 warning,
+or raised as NPlusOneQueryError when `N_PLUS_ONE_RAISE=True` (the test suite's mode).
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.config import settings
+
+logger = logging.getLogger("taskwise.sql")
+
+
+class NPlusOneQueryError(AssertionError):
+    pass
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] += 1
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def most_repeated(self) -> tuple[str | None, int]:
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+    def n_plus_one(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements issued more than `threshold` times, most repeated first."""
+        return [(sql, times) for sql, times in self.statements.most_common() if times > threshold]
+
+    def as_log_fields(self) -> dict:
+        return {
+            "query_count": self.count,
+            "query_time_ms": round(self.total_seconds * 1000, 2),
+            "slowest_query_ms": round(self.slowest_seconds * 1000, 2),
+            "slowest_query": self.slowest_statement,
+        }
+
+    def as_headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-query-time-ms", f"{self.total_seconds * 1000:.2f}".encode()),
+            (b"x-db-slowest-query-ms", f"{self.slowest_seconds * 1000:.2f}".encode()),
+        ]
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+@contextmanager
+def track_queries():
+    """Collects the statements run inside the block, e.g. `with track_queries() as stats:`."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def check_n_plus_one(stats: QueryStats, where: str):
+    repeated = stats.n_plus_one(settings.N_PLUS_ONE_THRESHOLD)
+    if not repeated:
+        return
+    statement, times = repeated[0]
+    message = f"N+1 queries in {where}: statement ran {times} times (threshold {settings.N_PLUS_ONE_THRESHOLD}): {statement}"
+    if settings.N_PLUS_ONE_RAISE:
+        raise NPlusOneQueryError(message)
+    logger.warning(message, extra={"n_plus_one_count": times, "n_plus_one_statement": statement})
+
+
+class QueryStatsMiddleware:
+    """Tracks the SQL of each HTTP request; see the module docstring for how it is reported."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message["headers"] = [*message.get("headers", []), *stats.as_headers()]
+            await send(message)
+
+        with track_queries() as stats:
+            await self.app(scope, receive, send_with_headers)
+
+        where = f"{scope['method']} {scope['path']}"
+        if settings.SQL_STATS_LOGGING and stats.count:
+            logger.info(
+                "%s ran %d queries in %.2f ms", where, stats.count, stats.total_seconds * 1000,
+                extra={"method": scope["method"], "path": scope["path"], **stats.as_log_fields()},
+            )
+        check_n_plus_one(stats, where)
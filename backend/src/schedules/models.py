@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, Integer, Enum as SQLAlchemyEnum, Index
 from src.database import Base
 import enum
 
@@ -12,8 +12,12 @@ class DayOfWeek(str, enum.Enum):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    __table_args__ = (
+        # A class has one course per period.
+        Index("ix_schedules_class_id_day_of_week_period", "class_id", "day_of_week", "period", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     class_id = Column(String, index=True) # e.g., "10-A"
-    day_of_week = Column(SQLAlchemyEnum(DayOfWeek))
+    day_of_week = Column(SQLAlchemyEnum(DayOfWeek, native_enum=False))
     period = Column(Integer) # 1st period, 2nd period, etc.
     course_id = Column(String) # e.g., "MATH-10A"
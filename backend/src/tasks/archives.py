@@ -0,0 +1,182 @@
+"""
+"Download all submissions" for a task: one ZIP with a folder per student.
+
+An archive's contents are pinned by a fingerprint of every submitted file (its name in the
+archive, path, size and mtime), so any new, edited or deleted submission changes it.
+Archives whose files add up to at most SUBMISSION_ARCHIVE_STREAM_MAX_BYTES are streamed
+straight from the attachments. Larger ones are written once by a background worker to
+`<uploads>/archives/tasks/<task_id>/<fingerprint>.zip` and served from there, with Range
+requests, until the fingerprint changes. While one is being built the endpoint answers
+202 with its progress.
+
+Jobs (and their progress) live in the process that started them. The finished file is
+shared through the uploads directory, and a build writes to a temporary name before
+renaming it into place, so two workers building the same archive is wasted work only.
+Temporary files of a worker that died mid-build are deleted at startup. A build that
+failed is reported as failed for SUBMISSION_ARCHIVE_RETRY_SECONDS before the same
+contents are tried again.
+"""
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.config import settings
+from src.attachments.blobs import attachment_path
+from src.attachments.storage import attachment_io
+from src.attachments.zip_stream import stream_zip
+from src.metrics.registry import Counter
+
+logger = logging.getLogger("taskwise.archives")
+
+SUBMISSION_ARCHIVE_REQUESTS = Counter(
+    "submission_archive_requests_total", "'Download all submissions' requests by how they were served.", ("result",)
+)
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    path: Path
+    name: str
+    size: int
+    mtime_ns: int
+
+
+def _stat_entries(files: list[tuple[Path, str]]) -> list[ArchiveEntry]:
+    entries = []
+    for path, name in files:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append(ArchiveEntry(path, name, stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+async def archive_entries(submissions, uploads_dir: Path) -> list[ArchiveEntry]:
+    """
+    The files of `submissions` (attachments loaded) that exist on disk, as `<roll number>/<file name>`.
+    They are stat'd on the attachment pool, so a large course does not hold up the event loop.
+    """
+    files = [
+        (attachment_path(uploads_dir, attachment), f"{submission.student_id}/{attachment.name}")
+        for submission in sorted(submissions, key=lambda submission: submission.student_id)
+        for attachment in submission.attachments
+    ]
+    return await attachment_io.run("stat", _stat_entries, files)
+
+
+def fingerprint(entries: list[ArchiveEntry]) -> str:
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(f"{entry.name}\0{entry.path}\0{entry.size}\0{entry.mtime_ns}\n".encode())
+    return digest.hexdigest()[:32]
+
+
+def archive_dir(uploads_dir: Path, task_id: str) -> Path:
+    return uploads_dir / "archives" / "tasks" / task_id
+
+
+def purge_stale_archive_parts(uploads_dir: Path, max_age_seconds: float = 24 * 3600) -> int:
+    """Delete partial archives left behind by a worker that died mid-build; returns how many."""
+    archives_dir = uploads_dir / "archives" / "tasks"
+    if not archives_dir.is_dir():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    stale = [path for path in archives_dir.glob("*/*.part") if path.stat().st_mtime < cutoff]
+    for path in stale:
+        path.unlink(missing_ok=True)
+    return len(stale)
+
+
+@dataclass
+class ArchiveJob:
+    task_id: str
+    fingerprint: str
+    target: Path
+    files_total: int
+    bytes_total: int
+    files_done: int = 0
+    bytes_done: int = 0
+    state: str = "building"  # building, ready or failed (or not_started, in a status report)
+    failed_at: float | None = None  # time.monotonic() of the failure
+    future: Future | None = field(default=None, repr=False)
+
+    def retry_after(self) -> int:
+        """Seconds until a failed build of these contents may be started again."""
+        if self.failed_at is None:
+            return 0
+        return max(0, math.ceil(self.failed_at + settings.SUBMISSION_ARCHIVE_RETRY_SECONDS - time.monotonic()))
+
+    def progress(self) -> dict:
+        return {
+            "status": self.state,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "progress": round(self.bytes_done / self.bytes_total, 3) if self.bytes_total else 1.0,
+        }
+
+
+class ArchiveBuilder:
+    """Builds archives on a small thread pool; at most one job per task is kept."""
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="archive")
+        self._jobs: dict[str, ArchiveJob] = {}
+        self._lock = threading.Lock()
+
+    def job(self, task_id: str, fingerprint: str) -> ArchiveJob | None:
+        job = self._jobs.get(task_id)
+        return job if job is not None and job.fingerprint == fingerprint else None
+
+    def start(self, task_id: str, fingerprint: str, entries: list[ArchiveEntry], target: Path) -> ArchiveJob:
+        """
+        The job building `target`, started unless one for the same contents is already under
+        way or failed too recently to try again (check its state).
+        """
+        with self._lock:
+            job = self.job(task_id, fingerprint)
+            if job is not None and (job.state == "building" or job.state == "failed" and job.retry_after() > 0):
+                return job
+            job = ArchiveJob(task_id, fingerprint, target, files_total=len(entries), bytes_total=sum(entry.size for entry in entries))
+            self._jobs[task_id] = job
+            job.future = self._executor.submit(self._build, job, entries)
+            return job
+
+    def _build(self, job: ArchiveJob, entries: list[ArchiveEntry]):
+        job.target.parent.mkdir(parents=True, exist_ok=True)
+        partial = job.target.with_name(f"{job.target.name}.{uuid.uuid4().hex}.part")
+
+        def counted():
+            for entry in entries:
+                yield entry.path, entry.name
+                job.files_done += 1
+                job.bytes_done += entry.size
+
+        try:
+            with open(partial, "wb") as out:
+                for data in stream_zip(counted()):
+                    out.write(data)
+            os.replace(partial, job.target)
+        except Exception:
+            logger.exception("building the submissions archive of task %s failed", job.task_id)
+            partial.unlink(missing_ok=True)
+            job.failed_at = time.monotonic()
+            job.state = "failed"
+            raise
+        # Archives of earlier contents of this task are no longer served.
+        for stale in job.target.parent.glob("*.zip"):
+            if stale != job.target:
+                stale.unlink(missing_ok=True)
+        job.state = "ready"
+
+
+archive_builder = ArchiveBuilder(settings.SUBMISSION_ARCHIVE_WORKERS)
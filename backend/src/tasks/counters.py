@@ -0,0 +1,156 @@
+"""
+Per-task submission counts by status, so task listings can show "12 submitted / 3 late /
+20 pending / 10 approved" without loading every submission and the course roster.
+
+`task_submission_counts` has one row per task that has had a submission. Every service
+function that creates or deletes a submission, or changes its status, calls record() in the
+same transaction with the status before (None for a new submission) and after (None for a
+deleted one). Counts only move through `count = count + n` upserts, never read-modify-write,
+so changes to different submissions of one task do not overwrite each other. The service's
+UPDATE or DELETE of a submission only matches the status it was read with, and nothing is
+recorded unless it matched, so one change is not counted twice by two racing requests.
+
+Pending is not stored. It is the course's students (from the membership index) minus those
+whose submission is submitted, late or approved; a rejected submission is pending again.
+
+Changes that bypass the service layer, such as the admin panel's or the seed data, are not
+counted. rebuild() recomputes every row from `submissions`. It runs at startup and from
+
+    python -m src.tasks.counters [--check]
+
+and check() lists the tasks whose counts disagree with the submissions.
+"""
+import argparse
+import collections
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal, engine
+from src.auth.membership_index import membership_index
+from src.tasks.models import Submission, TaskStatus, TaskSubmissionCounts
+
+COUNT_COLUMNS = {
+    TaskStatus.SUBMITTED: "submitted",
+    TaskStatus.DELAYED: "delayed",
+    TaskStatus.APPROVED: "approved",
+    TaskStatus.PENDING: "rejected",
+}
+
+Transition = tuple[Optional[TaskStatus], Optional[TaskStatus]]
+
+
+def _insert(db: AsyncSession):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(TaskSubmissionCounts)
+
+
+async def record(db: AsyncSession, task_id: str, *transitions: Transition):
+    """Count submissions of `task_id` moving from one status to another, in the caller's transaction."""
+    deltas = collections.Counter()
+    for before, after in transitions:
+        if before is not None:
+            deltas[COUNT_COLUMNS[before]] -= 1
+        if after is not None:
+            deltas[COUNT_COLUMNS[after]] += 1
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    statement = _insert(db).values(task_id=task_id, **{column: deltas.get(column, 0) for column in COUNT_COLUMNS.values()})
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[TaskSubmissionCounts.task_id],
+        set_={column: getattr(TaskSubmissionCounts, column) + delta for column, delta in deltas.items()},
+    ))
+
+
+async def forget(db: AsyncSession, task_id: str):
+    """Drop the counts of a task that is being deleted."""
+    await db.execute(delete(TaskSubmissionCounts).where(TaskSubmissionCounts.task_id == task_id))
+
+
+async def counts_for(db: AsyncSession, tasks) -> dict[str, dict]:
+    """The counts of each of `tasks`, with pending worked out from its course's students; one query."""
+    if not tasks:
+        return {}
+    await membership_index.ensure_fresh(db)
+    result = await db.execute(select(TaskSubmissionCounts).where(TaskSubmissionCounts.task_id.in_([task.id for task in tasks])))
+    rows = {row.task_id: row for row in result.scalars()}
+    counts = {}
+    for task in tasks:
+        row = rows.get(task.id)
+        task_counts = {column: getattr(row, column) if row else 0 for column in COUNT_COLUMNS.values()}
+        handed_in = task_counts["submitted"] + task_counts["delayed"] + task_counts["approved"]
+        # A student who left the course keeps their submission but is no longer on the roster.
+        task_counts["pending"] = max(len(membership_index.course_students(task.course_id)) - handed_in, 0)
+        counts[task.id] = task_counts
+    return counts
+
+
+def _from_submissions(session: Session) -> dict[str, dict]:
+    expected = collections.defaultdict(lambda: dict.fromkeys(COUNT_COLUMNS.values(), 0))
+    for task_id, status, count in session.execute(
+        select(Submission.task_id, Submission.status, func.count()).group_by(Submission.task_id, Submission.status)
+    ):
+        expected[task_id][COUNT_COLUMNS[status]] = count
+    return dict(expected)
+
+
+def _stored(session: Session) -> dict[str, dict]:
+    columns = list(COUNT_COLUMNS.values())
+    result = session.execute(select(TaskSubmissionCounts.task_id, *(getattr(TaskSubmissionCounts, column) for column in columns)))
+    return {task_id: dict(zip(columns, counts)) for task_id, *counts in result}
+
+
+def _differences(expected: dict[str, dict], stored: dict[str, dict]) -> list[str]:
+    zero = dict.fromkeys(COUNT_COLUMNS.values(), 0)
+    return [
+        f"task {task_id!r}: submissions give {expected.get(task_id, zero)}, stored {stored.get(task_id, zero)}"
+        for task_id in sorted(expected.keys() | stored.keys())
+        if expected.get(task_id, zero) != stored.get(task_id, zero)
+    ]
+
+
+def check(session: Session) -> list[str]:
+    """Tasks whose stored counts differ from their submissions, one line each; empty when they agree."""
+    return _differences(_from_submissions(session), _stored(session))
+
+
+def rebuild(session: Session) -> list[str]:
+    """Recompute every task's counts from `submissions` and commit; returns what was wrong, as check() does."""
+    if session.get_bind().dialect.name == "postgresql":
+        # Submissions change together with their counts, so holding writers off until the
+        # commit keeps a concurrent submit from being counted twice or not at all.
+        session.execute(text("LOCK TABLE submissions IN SHARE MODE"))
+    stored = _stored(session)
+    # On SQLite the DELETE takes the write lock before submissions are read.
+    session.execute(delete(TaskSubmissionCounts))
+    expected = _from_submissions(session)
+    if expected:
+        session.execute(insert(TaskSubmissionCounts), [{"task_id": task_id, **counts} for task_id, counts in expected.items()])
+    session.commit()
+    return _differences(expected, stored)
+
+
+def main():
+    # Every mapper has to be known before the first query; the app gets them from src.main.
+    import src.announcements.models, src.attendance.models, src.schedules.models  # noqa: F401
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report tasks whose counts are wrong")
+    args = parser.parse_args()
+
+    # The table is created at startup; the job may run against a database the app has not started on since.
+    TaskSubmissionCounts.__table__.create(engine, checkfirst=True)
+    with SessionLocal() as session:
+        problems = check(session) if args.check else rebuild(session)
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} task(s) {'with wrong counts' if args.check else 'repaired'}.")
+    raise SystemExit(1 if args.check and problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, Integer, DateTime, Text, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, String, ForeignKey, Integer, BigInteger, DateTime, Text, Enum as SQLAlchemyEnum, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src.attachments.models import BlobAttachment
 import enum
 
 
@@ -22,6 +23,9 @@ class Grade(str, enum.Enum):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_course_id_created_at_id", "course_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=lambda: f"TSK-{uuid.uuid4().hex[:6].upper()}")
     title = Column(String, index=True)
     description = Column(Text)
@@ -36,34 +40,60 @@ class Task(Base):
     submissions = relationship("Submission", back_populates="task")
 
 
-class TaskAttachment(Base):
+class TaskSubmissionCounts(Base):
+    """A task's submissions by status, kept current by src/tasks/counters.py."""
+    __tablename__ = "task_submission_counts"
+    task_id = Column(String, ForeignKey("tasks.id"), primary_key=True)
+    submitted = Column(Integer, nullable=False, default=0)
+    delayed = Column(Integer, nullable=False, default=0)
+    approved = Column(Integer, nullable=False, default=0)
+    # Submissions sent back by the teacher (status PENDING) and not resubmitted yet.
+    rejected = Column(Integer, nullable=False, default=0)
+
+
+class TaskAttachment(BlobAttachment, Base):
     __tablename__ = "task_attachments"
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String, ForeignKey("tasks.id"))
-    file_path = Column(String)
     task = relationship("Task", back_populates="attachments")
 
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # One submission per student per task; also serves the per-task listings.
+        Index("ix_submissions_task_id_student_id", "task_id", "student_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String, ForeignKey("tasks.id"))
     student_id = Column(String, ForeignKey("users.roll_number"))
     submitted_at = Column(DateTime)
-    status = Column(SQLAlchemyEnum(TaskStatus), default=TaskStatus.SUBMITTED)
+    status = Column(SQLAlchemyEnum(TaskStatus, native_enum=False), default=TaskStatus.SUBMITTED)
     rejection_reason = Column(Text, nullable=True)
-    grade = Column(SQLAlchemyEnum(Grade), nullable=True)
+    grade = Column(SQLAlchemyEnum(Grade, native_enum=False), nullable=True)
     remarks = Column(Text, nullable=True)
 
     task = relationship("Task", back_populates="submissions")
     student = relationship("User", back_populates="submissions")
     attachments = relationship("SubmissionAttachment", back_populates="submission")
 
-class SubmissionAttachment(Base):
+class SubmissionAttachment(BlobAttachment, Base):
     __tablename__ = "submission_attachments"
     id = Column(Integer, primary_key=True, index=True)
     submission_id = Column(Integer, ForeignKey("submissions.id"))
-    file_path = Column(String)
     submission = relationship("Submission", back_populates="attachments")
 
+
+class SubmissionUpload(Base):
+    """A submission file being sent in chunks; see src/tasks/uploads.py."""
+    __tablename__ = "submission_uploads"
+    id = Column(String, primary_key=True, default=lambda: uuid.uuid4().hex)
+    task_id = Column(String, ForeignKey("tasks.id"), index=True)
+    student_id = Column(String, ForeignKey("users.roll_number"), index=True)
+    file_name = Column(String)
+    size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)
+
 #TODO: Implement post-deadline submission logic
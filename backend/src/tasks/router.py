@@ -1,33 +1,66 @@
-from fastapi import APIRouter, Depends, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Request, Response
 from typing import List, Optional, Union
 import json
-from sqlalchemy.orm import Session
-from src.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from src.database import get_async_db
 from src.auth.dependencies import get_current_user, get_current_teacher
 from src.dependencies import get_uploads_dir
+from src.attachments.ingest import StreamedForm, multipart_openapi, streamed_form
 from pathlib import Path
 from src.auth.models import User, UserRole
 from src.users import schemas
-from src.tasks import service, models
+from src.tasks import service, models, uploads, counters
 from src.tasks.models import Grade
-from src.tasks.schemas import TaskSubmission
+from src.tasks.schemas import TaskSubmission, BulkGrade, UploadCreate, UploadFinalize, UploadProgress
 from datetime import datetime
 from src.exceptions import CourseNotFound
 
 router = APIRouter()
 
-def format_task(task, current_user: User, db: Session):
+async def format_task(task, current_user: User, db: AsyncSession):
+    return (await format_tasks([task], current_user, db))[0]
+
+async def format_tasks(tasks, current_user: User, db: AsyncSession, with_submissions: bool = True) -> list[dict]:
+    """
+    format_task() for many tasks at once: a student's submissions come from one query, not one per task.
+    with_submissions=False leaves out a teacher's per-student table, for listings whose schema drops it.
+    A teacher also gets each task's submission counts, from the counter table (src/tasks/counters.py).
+    """
+    student_submissions, submission_counts = {}, {}
+    if current_user.role != UserRole.TEACHER and tasks:
+        result = await db.execute(
+            select(models.Submission)
+            .options(selectinload(models.Submission.attachments))
+            .filter(
+                models.Submission.task_id.in_([task.id for task in tasks]),
+                models.Submission.student_id == current_user.roll_number,
+            )
+        )
+        student_submissions = {submission.task_id: submission for submission in result.scalars()}
+    if current_user.role == UserRole.TEACHER:
+        submission_counts = await counters.counts_for(db, tasks)
+    return [
+        _format_task(task, current_user, student_submissions.get(task.id), with_submissions, submission_counts.get(task.id))
+        for task in tasks
+    ]
+
+def _format_task(task, current_user: User, submission, with_submissions: bool = True, submission_counts: dict | None = None) -> dict:
     task_details = {
         "task_id": task.id,
         "name": task.author.name,
         "time": task.created_at,
         "title": task.title,
         "description": task.description,
-        "attachements": [Path(att.file_path).name for att in task.attachments],
+        "attachements": [att.name for att in task.attachments],
         "deadline": task.deadline,
     }
 
     if current_user.role == UserRole.TEACHER:
+        task_details["submission_counts"] = submission_counts
+        if not with_submissions:
+            return task_details
         submissions_list = []
         # Create a dictionary for quick lookup of submissions
         submissions_by_student = {sub.student_id: sub for sub in task.submissions}
@@ -62,10 +95,9 @@ def format_task(task, current_user: User, db: Session):
         submission_attachments = []
         grade = None
         remarks = None
-        submission = db.query(models.Submission).filter_by(task_id=task.id, student_id=current_user.roll_number).first()
         if submission:
             status = submission.status.value
-            submission_attachments = [Path(att.file_path).name for att in submission.attachments]
+            submission_attachments = [att.name for att in submission.attachments]
             if submission.status == models.TaskStatus.PENDING and submission.rejection_reason:
                 rejection_reason = submission.rejection_reason
             if submission.status == models.TaskStatus.APPROVED:
@@ -83,16 +115,17 @@ def format_task(task, current_user: User, db: Session):
     
     return task_details
 
-@router.post("/{course_id}/tasks/{task_id}/upload")
+@router.post("/{course_id}/tasks/{task_id}/upload", openapi_extra=multipart_openapi(files_required=True))
 async def upload_task_submission(
     course_id: str,
     task_id: str,
-    files: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    submission, message = service.submit_task(db, task_id, current_user, files, uploads_dir)
+    files = form.files_for("files", required=True)
+    submission, message = await service.submit_task(db, task_id, current_user, files, uploads_dir)
     
     return {
         "message": message,
@@ -100,23 +133,94 @@ async def upload_task_submission(
         "new_status": submission.status.value
     }
 
-@router.put("/{course_id}/tasks/{task_id}/submission/edit")
-async def edit_task_submission(
+@router.post("/{course_id}/tasks/{task_id}/uploads", status_code=201, response_model=UploadProgress)
+async def create_submission_upload(
+    course_id: str,
+    task_id: str,
+    body: UploadCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
+):
+    """Start a resumable upload of one submission file; see src/tasks/uploads.py."""
+    upload = await uploads.create_upload(db, course_id, task_id, current_user, body.file_name, body.size, uploads_dir)
+    return uploads.progress(upload)
+
+@router.post("/{course_id}/tasks/{task_id}/uploads/finalize")
+async def finalize_submission_uploads(
+    course_id: str,
+    task_id: str,
+    body: UploadFinalize,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
+):
+    submission, message = await uploads.finalize_uploads(db, task_id, current_user, body.upload_ids, uploads_dir)
+    return {
+        "message": message,
+        "task_id": task_id,
+        "new_status": submission.status.value
+    }
+
+@router.get("/{course_id}/tasks/{task_id}/uploads/{upload_id}", response_model=UploadProgress)
+async def get_submission_upload(
     course_id: str,
     task_id: str,
-    attachments_to_keep: Optional[str] = Form("[]"),
-    files: Optional[List[UploadFile]] = File(None),
+    upload_id: str,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db)
+):
+    upload = await uploads.get_upload(db, task_id, upload_id, current_user)
+    response.headers["Upload-Offset"] = str(upload.received)
+    return uploads.progress(upload)
+
+@router.put("/{course_id}/tasks/{task_id}/uploads/{upload_id}", response_model=UploadProgress)
+async def put_submission_upload_chunk(
+    course_id: str,
+    task_id: str,
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
+):
+    """Append the request body, which must start at `Upload-Offset`, to the upload."""
+    upload = await uploads.write_chunk(db, task_id, upload_id, current_user, upload_offset, request, uploads_dir)
+    response.headers["Upload-Offset"] = str(upload.received)
+    return uploads.progress(upload)
+
+@router.delete("/{course_id}/tasks/{task_id}/uploads/{upload_id}")
+async def cancel_submission_upload(
+    course_id: str,
+    task_id: str,
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
     uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    attachments_to_keep_list = json.loads(attachments_to_keep)
-    submission = service.edit_task_submission(db, task_id, current_user, attachments_to_keep_list, files, uploads_dir)
+    await uploads.cancel_upload(db, task_id, upload_id, current_user, uploads_dir)
+    return {"message": "Upload cancelled.", "upload_id": upload_id}
+
+@router.put("/{course_id}/tasks/{task_id}/submission/edit", openapi_extra=multipart_openapi(optional=("attachments_to_keep",)))
+async def edit_task_submission(
+    course_id: str,
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
+):
+    attachments_to_keep_list = json.loads(form.get("attachments_to_keep", "[]"))
+    files = form.files_for("files")
+    submission = await service.edit_task_submission(db, task_id, current_user, attachments_to_keep_list, files, uploads_dir)
     
     return {
         "message": "Submission updated successfully.",
         "submission_id": submission.id,
-        "current_attachments": [Path(att.file_path).name for att in submission.attachments]
+        "current_attachments": [att.name for att in submission.attachments]
     }
 
 @router.delete("/{course_id}/tasks/{task_id}/submission/delete")
@@ -124,9 +228,10 @@ async def delete_task_submission(
     course_id: str,
     task_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    service.delete_task_submission(db, task_id, current_user)
+    await service.delete_task_submission(db, task_id, current_user, uploads_dir)
     return {"message": "Submission deleted successfully."}
 
 @router.delete("/{course_id}/tasks/{task_id}/submission/attachments/{file_name}")
@@ -135,9 +240,10 @@ async def delete_submission_attachment(
     task_id: str,
     file_name: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    message = service.delete_submission_attachment(db, task_id, current_user, file_name)
+    message = await service.delete_submission_attachment(db, task_id, current_user, file_name, uploads_dir)
     return {"message": message}
 
 @router.get("/{course_id}/tasks/{task_id}", response_model=Union[schemas.TeacherTask, schemas.Task])
@@ -145,62 +251,62 @@ async def get_task_details(
     course_id: str,
     task_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    task = service.get_task(db, task_id)
+    task = await service.get_task(db, task_id)
     if task.course_id != course_id:
         raise CourseNotFound(course_id=course_id)
-    return format_task(task, current_user, db)
+    return await format_task(task, current_user, db)
 
 @router.get("/{course_id}/tasks/{task_id}/submissions", response_model=List[TaskSubmission])
 async def get_task_submissions(
     course_id: str,
     task_id: str,
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return service.get_submissions_for_task(db, task_id)
+    return await service.get_submissions_for_task(db, task_id)
 
-@router.post("/{course_id}/tasks/create")
+@router.post("/{course_id}/tasks/create", openapi_extra=multipart_openapi(required=("title", "description", "deadline")))
 async def create_task(
     course_id: str,
-    title: str = Form(...),
-    description: str = Form(...),
-    deadline: str = Form(...),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    deadline_dt = datetime.fromisoformat(deadline)
-    task = service.create_task(db, course_id, title, description, deadline_dt, current_user, files, uploads_dir)
+    deadline_dt = datetime.fromisoformat(form.get("deadline"))
+    files = form.files_for("files")
+    task = await service.create_task(db, course_id, form.get("title"), form.get("description"), deadline_dt, current_user, files, uploads_dir)
     return {
         "message": "Task created successfully.",
         "task_id": task.id,
         "uploaded_files": [file.filename for file in files] if files else []
     }
 
-@router.put("/{course_id}/tasks/{task_id}/update")
+@router.put(
+    "/{course_id}/tasks/{task_id}/update",
+    openapi_extra=multipart_openapi(required=("title", "description", "deadline"), optional=("attachments_to_keep",)),
+)
 async def update_task(
     course_id: str,
     task_id: str,
-    title: str = Form(...),
-    description: str = Form(...),
-    deadline: str = Form(...),
-    attachments_to_keep: Optional[str] = Form("[]"),
-    files: Optional[List[UploadFile]] = File(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    uploads_dir: Path = Depends(get_uploads_dir)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+    form: StreamedForm = Depends(streamed_form)
 ):
-    deadline_dt = datetime.fromisoformat(deadline)
-    attachments_to_keep_list = json.loads(attachments_to_keep)
-    task = service.update_task(db, task_id, title, description, deadline_dt, attachments_to_keep_list, files, uploads_dir)
+    deadline_dt = datetime.fromisoformat(form.get("deadline"))
+    attachments_to_keep_list = json.loads(form.get("attachments_to_keep", "[]"))
+    files = form.files_for("files")
+    task = await service.update_task(
+        db, task_id, form.get("title"), form.get("description"), deadline_dt, attachments_to_keep_list, files, uploads_dir
+    )
     
     return {
         "message": "Task updated successfully.",
         "task_id": task.id,
-        "current_attachments": [Path(att.file_path).name for att in task.attachments]
+        "current_attachments": [att.name for att in task.attachments]
     }
 
 @router.delete("/{course_id}/tasks/{task_id}/delete")
@@ -208,9 +314,10 @@ async def delete_task(
     course_id: str,
     task_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    service.delete_task(db, task_id)
+    await service.delete_task(db, task_id, uploads_dir)
     return {"message": "Task deleted successfully.", "task_id": task_id}
 
 @router.put("/{course_id}/tasks/{task_id}/submissions/{student_roll_number}/approve")
@@ -221,9 +328,9 @@ async def approve_task_submission(
     grade: Grade = Form(...),
     remarks: Optional[str] = Form(None),
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    submission = service.approve_task_submission(db, task_id, student_roll_number, grade, remarks)
+    submission = await service.approve_task_submission(db, task_id, student_roll_number, grade, remarks)
     return {
         "message": "Submission approved successfully.",
         "student_roll_number": submission.student_id,
@@ -237,21 +344,69 @@ async def reject_task_submission(
     student_roll_number: str,
     reason: str = Form(...),
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    submission = service.reject_task_submission(db, task_id, student_roll_number, reason)
+    submission = await service.reject_task_submission(db, task_id, student_roll_number, reason)
     return {
         "message": "Submission rejected successfully.",
         "student_roll_number": submission.student_id,
         "new_status": "PENDING"
     }
 
+@router.put("/{course_id}/tasks/{task_id}/submissions/grades")
+async def grade_task_submissions(
+    course_id: str,
+    task_id: str,
+    body: BulkGrade,
+    current_user: User = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Approve and reject many submissions at once; every decision is validated before any is applied."""
+    results = await service.grade_submissions(db, course_id, task_id, body.decisions)
+    return {
+        "message": "Submissions graded successfully.",
+        "task_id": task_id,
+        "updated": sum(result["result"] != "not_found" for result in results),
+        "results": results
+    }
+
+@router.get("/{course_id}/tasks/{task_id}/submissions/archive")
+async def download_all_submissions(
+    course_id: str,
+    task_id: str,
+    current_user: User = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+):
+    """
+    Every submission for the task as one ZIP, one folder per student. A large archive is
+    built in the background: until it is ready this answers 202 with its progress.
+    """
+    task = await service.get_task(db, task_id)
+    if task.course_id != course_id:
+        raise CourseNotFound(course_id=course_id)
+    return await service.download_all_submissions(db, task_id, uploads_dir)
+
+@router.get("/{course_id}/tasks/{task_id}/submissions/archive/status")
+async def get_submissions_archive_status(
+    course_id: str,
+    task_id: str,
+    current_user: User = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir),
+):
+    task = await service.get_task(db, task_id)
+    if task.course_id != course_id:
+        raise CourseNotFound(course_id=course_id)
+    return await service.submissions_archive_status(db, task_id, uploads_dir)
+
 @router.get("/{course_id}/tasks/{task_id}/submissions/{student_roll_number}/download")
 async def download_submission(
     course_id: str,
     task_id: str,
     student_roll_number: str,
     current_user: User = Depends(get_current_teacher),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    uploads_dir: Path = Depends(get_uploads_dir)
 ):
-    return service.download_submission(db, task_id, student_roll_number)
+    return await service.download_submission(db, task_id, student_roll_number, uploads_dir)
@@ -1,5 +1,10 @@
-from pydantic import BaseModel
+from collections import Counter
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
 from src.users.schemas import User
+from src.tasks.models import Grade
 
 
 class TaskSubmission(BaseModel):
@@ -12,3 +17,51 @@ class TaskSubmission(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class UploadCreate(BaseModel):
+    file_name: str
+    size: int = Field(ge=0)
+
+
+class UploadProgress(BaseModel):
+    upload_id: str
+    file_name: str
+    size: int
+    offset: int
+    complete: bool
+    expires_at: datetime
+    chunk_size: int
+
+
+class UploadFinalize(BaseModel):
+    upload_ids: list[str]
+
+
+class GradeDecision(BaseModel):
+    """One student's result in a bulk grading: approve with a grade (and remarks), or reject with a reason."""
+    student_roll_number: str
+    action: Literal["approve", "reject"]
+    grade: Optional[Grade] = None
+    remarks: Optional[str] = None
+    reason: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_action_fields(self):
+        if self.action == "approve" and self.grade is None:
+            raise ValueError("an approval needs a grade")
+        if self.action == "reject" and not self.reason:
+            raise ValueError("a rejection needs a reason")
+        return self
+
+
+class BulkGrade(BaseModel):
+    decisions: list[GradeDecision] = Field(min_length=1)
+
+    @model_validator(mode="after")
+    def check_one_decision_per_student(self):
+        counts = Counter(decision.student_roll_number for decision in self.decisions)
+        duplicates = sorted(roll for roll, count in counts.items() if count > 1)
+        if duplicates:
+            raise ValueError(f"more than one decision for {', '.join(duplicates)}")
+        return self
@@ -1,30 +1,80 @@
-from sqlalchemy.orm import Session
-from fastapi import UploadFile, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
-import io
-import zipfile
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from src.tasks import models
 from src.tasks.models import Grade
-from src.auth.models import User
+from src.tasks.schemas import GradeDecision
+from src.auth.models import User, UserRole
+from src.courses.models import Course
 from typing import List, Optional
-import shutil
 from pathlib import Path
 from datetime import datetime
-from src.exceptions import TaskNotFound, SubmissionAlreadyExists
-
-from src.exceptions import TaskNotFound, SubmissionAlreadyExists, SubmissionAlreadyExists
-
-def get_task(db: Session, task_id: str):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+from src.exceptions import TaskNotFound, CourseNotFound, SubmissionAlreadyExists, SubmissionChanged
+from src.attachments import blobs
+from src.attachments.storage import Upload, attachment_io
+from src.tasks import counters
+from src.attachments.zip_stream import stream_zip
+from src.tasks.archives import (
+    SUBMISSION_ARCHIVE_REQUESTS, ArchiveJob, archive_builder, archive_dir, archive_entries, fingerprint,
+)
+from src.config import settings
+
+# Everything format_task() touches, loaded up front so no lazy IO happens on the async session.
+TASK_LOAD_OPTIONS = (
+    selectinload(models.Task.author),
+    selectinload(models.Task.attachments),
+    selectinload(models.Task.submissions).selectinload(models.Submission.attachments),
+    selectinload(models.Task.course).selectinload(Course.students),
+)
+
+# What format_tasks() needs without the per-student submission table: a student's view
+# (their own submission is fetched in bulk) and listings whose schema leaves the table out.
+TASK_SUMMARY_LOAD_OPTIONS = (
+    selectinload(models.Task.author),
+    selectinload(models.Task.attachments),
+)
+
+def task_load_options(user: User, with_submissions: bool = True):
+    return TASK_LOAD_OPTIONS if user.role == UserRole.TEACHER and with_submissions else TASK_SUMMARY_LOAD_OPTIONS
+
+SUBMISSION_LOAD_OPTIONS = (
+    selectinload(models.Submission.attachments),
+    selectinload(models.Submission.task),
+)
+
+async def get_task(db: AsyncSession, task_id: str):
+    result = await db.execute(
+        select(models.Task)
+        .options(*TASK_LOAD_OPTIONS)
+        .filter(models.Task.id == task_id)
+        .execution_options(populate_existing=True)
+    )
+    task = result.scalars().first()
     if not task:
         raise TaskNotFound(task_id=task_id)
     return task
 
-def get_submissions_for_task(db: Session, task_id: str):
-    task = get_task(db, task_id)
-    return task.submissions
+async def get_submission(db: AsyncSession, task_id: str, student_roll_number: str):
+    result = await db.execute(
+        select(models.Submission)
+        .options(*SUBMISSION_LOAD_OPTIONS)
+        .filter_by(task_id=task_id, student_id=student_roll_number)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+async def get_submissions_for_task(db: AsyncSession, task_id: str):
+    await get_task(db, task_id)
+    result = await db.execute(
+        select(models.Submission)
+        .options(selectinload(models.Submission.student))
+        .filter(models.Submission.task_id == task_id)
+    )
+    return result.scalars().all()
 
-def create_task(db: Session, course_id: str, title: str, description: str, deadline: datetime, author: User, files: Optional[List[UploadFile]], uploads_dir: Path):
+async def create_task(db: AsyncSession, course_id: str, title: str, description: str, deadline: datetime, author: User, files: Optional[List[Upload]], uploads_dir: Path):
     task = models.Task(
         course_id=course_id,
         title=title,
@@ -34,71 +84,55 @@ def create_task(db: Session, course_id: str, title: str, description: str, deadl
         created_at=datetime.now()
     )
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    await db.commit()
 
     if files:
-        task_attachments_dir = uploads_dir / "courses" / course_id / "tasks" / str(task.id) / "attachments"
-        task_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = task_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.TaskAttachment(task_id=task.id, file_path=str(file_path))
-            db.add(attachment)
-        db.commit()
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.TaskAttachment(task_id=task.id, file_name=file.filename, blob_sha256=sha256))
+        await db.commit()
 
-    return task
+    return await get_task(db, task.id)
 
-def update_task(db: Session, task_id: str, title: str, description: str, deadline: datetime, attachments_to_keep: List[str], files: Optional[List[UploadFile]], uploads_dir: Path):
-    task = get_task(db, task_id)
+async def update_task(db: AsyncSession, task_id: str, title: str, description: str, deadline: datetime, attachments_to_keep: List[str], files: Optional[List[Upload]], uploads_dir: Path):
+    task = await get_task(db, task_id)
 
     task.title = title
     task.description = description
     task.deadline = deadline
 
-    current_attachments = {attachment.file_path for attachment in task.attachments}
     attachments_to_keep_set = set(attachments_to_keep)
-    
-    for attachment in task.attachments:
-        if attachment.file_path not in attachments_to_keep_set:
-            db.delete(attachment)
-            Path(attachment.file_path).unlink(missing_ok=True)
 
+    # New files are stored before the removed ones are released, so re-uploading a file keeps its blob.
     if files:
-        task_attachments_dir = uploads_dir / "courses" / task.course_id / "tasks" / str(task.id) / "attachments"
-        task_attachments_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = task_attachments_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.TaskAttachment(task_id=task.id, file_path=str(file_path))
-            db.add(attachment)
-    
-    db.commit()
-    db.refresh(task)
-    return task
-
-def delete_task(db: Session, task_id: str):
-    task = get_task(db, task_id)
-    for attachment in task.attachments:
-        Path(attachment.file_path).unlink(missing_ok=True)
-        db.delete(attachment)
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.TaskAttachment(task_id=task.id, file_name=file.filename, blob_sha256=sha256))
+
+    removed = [attachment for attachment in task.attachments if attachment.name not in attachments_to_keep_set]
+    released = await blobs.release(db, uploads_dir, removed)
+
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
+    return await get_task(db, task_id)
+
+async def delete_task(db: AsyncSession, task_id: str, uploads_dir: Path):
+    task = await get_task(db, task_id)
+    released = await blobs.release(db, uploads_dir, [
+        *task.attachments,
+        *(attachment for submission in task.submissions for attachment in submission.attachments),
+    ])
     # Also delete submissions if any
     for submission in task.submissions:
-        Path(submission.file_path).unlink(missing_ok=True)
-        db.delete(submission)
-    db.delete(task)
-    db.commit()
+        await db.delete(submission)
+    await counters.forget(db, task_id)
+    await db.delete(task)
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
     return True
 
-def submit_task(db: Session, task_id: str, student: User, files: List[UploadFile], uploads_dir: Path):
-    task = get_task(db, task_id)
+async def submit_task(db: AsyncSession, task_id: str, student: User, files: List[Upload], uploads_dir: Path):
+    task = await get_task(db, task_id)
 
-    submission_dir = uploads_dir / "courses" / task.course_id / "tasks" / task_id / "submissions" / str(student.roll_number)
-    submission_dir.mkdir(parents=True, exist_ok=True)
-
-    existing_submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student.roll_number).first()
+    existing_submission = await get_submission(db, task_id, student.roll_number)
 
     # Determine submission status
     current_time = datetime.now()
@@ -109,15 +143,9 @@ def submit_task(db: Session, task_id: str, student: User, files: List[UploadFile
     if existing_submission:
         if existing_submission.status == models.TaskStatus.SUBMITTED or existing_submission.status == models.TaskStatus.APPROVED:
             raise SubmissionAlreadyExists(task_id=task_id)
-        
-        # Clear old attachments
-        for attachment in existing_submission.attachments:
-            db.delete(attachment)
-            Path(attachment.file_path).unlink(missing_ok=True)
-
-        existing_submission.submitted_at = current_time
-        existing_submission.status = status
-        existing_submission.rejection_reason = None
+
+        replaced = list(existing_submission.attachments)
+        await _change_status(db, existing_submission, status, submitted_at=current_time, rejection_reason=None)
         submission = existing_submission
 
     else:
@@ -128,130 +156,234 @@ def submit_task(db: Session, task_id: str, student: User, files: List[UploadFile
             status=status
         )
         db.add(submission)
-    
-    db.commit()
-    db.refresh(submission)
-
-    for file in files:
-        file_path = submission_dir / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        attachment = models.SubmissionAttachment(submission_id=submission.id, file_path=str(file_path))
-        db.add(attachment)
-    
-    db.commit()
-    db.refresh(submission)
-
-    return submission, "Files uploaded successfully."
-
-def edit_task_submission(db: Session, task_id: str, student: User, attachments_to_keep: List[str], files: Optional[List[UploadFile]], uploads_dir: Path):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student.roll_number).first()
+        await counters.record(db, task_id, (None, status))
+        replaced = []
+
+    await db.commit()
+
+    # A resubmission after a rejection often contains the same files: store the new
+    # attachments before releasing the old ones so unchanged content is not rewritten.
+    for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+        db.add(models.SubmissionAttachment(submission_id=submission.id, file_name=file.filename, blob_sha256=sha256))
+    released = await blobs.release(db, uploads_dir, replaced)
+
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
+
+    return await get_submission(db, task_id, student.roll_number), "Files uploaded successfully."
+
+async def edit_task_submission(db: AsyncSession, task_id: str, student: User, attachments_to_keep: List[str], files: Optional[List[Upload]], uploads_dir: Path):
+    submission = await get_submission(db, task_id, student.roll_number)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
 
+    if files:
+        for file, sha256 in zip(files, await blobs.store(db, uploads_dir, files)):
+            db.add(models.SubmissionAttachment(submission_id=submission.id, file_name=file.filename, blob_sha256=sha256))
+
     # Delete attachments that are not in attachments_to_keep
-    for attachment in submission.attachments:
-        if Path(attachment.file_path).name not in attachments_to_keep:
-            db.delete(attachment)
-            Path(attachment.file_path).unlink(missing_ok=True)
+    removed = [attachment for attachment in submission.attachments if attachment.name not in attachments_to_keep]
+    released = await blobs.release(db, uploads_dir, removed)
 
-    if files:
-        submission_dir = uploads_dir / "courses" / submission.task.course_id / "tasks" / task_id / "submissions" / str(student.roll_number)
-        submission_dir.mkdir(parents=True, exist_ok=True)
-        for file in files:
-            file_path = submission_dir / file.filename
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            attachment = models.SubmissionAttachment(submission_id=submission.id, file_path=str(file_path))
-            db.add(attachment)
-    
     submission.submitted_at = datetime.now()
-    db.commit()
-    db.refresh(submission)
-    return submission
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
+    return await get_submission(db, task_id, student.roll_number)
+
+async def _change_status(db: AsyncSession, submission: models.Submission, status: Optional[models.TaskStatus], **values):
+    """
+    Move `submission` to `status`, setting `values` too, or delete it when `status` is None, and
+    count the transition. The statement only matches the status the submission was read with, so
+    if another request changed it in the meantime nothing is counted twice: that is a 409.
+    """
+    before = submission.status
+    condition = (models.Submission.id == submission.id, models.Submission.status == before)
+    if status is None:
+        result = await db.execute(delete(models.Submission).where(*condition))
+    else:
+        result = await db.execute(update(models.Submission).where(*condition).values(status=status, **values))
+    if result.rowcount != 1:
+        raise SubmissionChanged(task_id=submission.task_id)
+    await counters.record(db, submission.task_id, (before, status))
 
-def delete_task_submission(db: Session, task_id: str, student: User):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student.roll_number).first()
+async def delete_task_submission(db: AsyncSession, task_id: str, student: User, uploads_dir: Path):
+    submission = await get_submission(db, task_id, student.roll_number)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
 
-    for attachment in submission.attachments:
-        db.delete(attachment)
-        Path(attachment.file_path).unlink(missing_ok=True)
-    
-    db.delete(submission)
-    db.commit()
+    released = await blobs.release(db, uploads_dir, submission.attachments)
+
+    await _change_status(db, submission, None)
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
     return True
 
-def approve_task_submission(db: Session, task_id: str, student_roll_number: str, grade: Grade, remarks: Optional[str]):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student_roll_number).first()
+async def approve_task_submission(db: AsyncSession, task_id: str, student_roll_number: str, grade: Grade, remarks: Optional[str]):
+    submission = await get_submission(db, task_id, student_roll_number)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
-    
-    submission.status = models.TaskStatus.APPROVED
-    submission.grade = grade
-    submission.remarks = remarks
-    db.commit()
-    db.refresh(submission)
+
+    await _change_status(db, submission, models.TaskStatus.APPROVED, grade=grade, remarks=remarks)
+    await db.commit()
     return submission
 
-def reject_task_submission(db: Session, task_id: str, student_roll_number: str, reason: str):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student_roll_number).first()
+async def reject_task_submission(db: AsyncSession, task_id: str, student_roll_number: str, reason: str):
+    submission = await get_submission(db, task_id, student_roll_number)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
-    
-    submission.status = models.TaskStatus.PENDING
-    submission.rejection_reason = reason
-    db.commit()
-    db.refresh(submission)
+
+    await _change_status(db, submission, models.TaskStatus.PENDING, rejection_reason=reason)
+    await db.commit()
     return submission
 
-def download_submission(db: Session, task_id: str, student_roll_number: str):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student_roll_number).first()
+async def grade_submissions(db: AsyncSession, course_id: str, task_id: str, decisions: List[GradeDecision]) -> list[dict]:
+    """
+    Approve and reject many of a task's submissions in one transaction, the same way
+    approve_task_submission() and reject_task_submission() do one at a time: one query
+    finds (and on PostgreSQL locks) the submissions, one executemany UPDATE applies every
+    decision, one upsert moves the task's status counts, one commit. Students without a
+    submission are reported as "not_found" and left out. Like _change_status(), each UPDATE
+    only matches the status that was read, and the batch is refused with a 409 if one did not.
+    """
+    task = await db.get(models.Task, task_id)
+    if task is None:
+        raise TaskNotFound(task_id=task_id)
+    if task.course_id != course_id:
+        raise CourseNotFound(course_id=course_id)
+
+    result = await db.execute(
+        select(models.Submission.student_id, models.Submission.id, models.Submission.status)
+        .filter(models.Submission.task_id == task_id, models.Submission.student_id.in_([d.student_roll_number for d in decisions]))
+        .with_for_update()
+    )
+    submissions = {student_id: (submission_id, status) for student_id, submission_id, status in result.all()}
+
+    changes, results, transitions = [], [], []
+    for decision in decisions:
+        if decision.student_roll_number not in submissions:
+            results.append({"student_roll_number": decision.student_roll_number, "result": "not_found", "new_status": None})
+            continue
+        submission_id, previous_status = submissions[decision.student_roll_number]
+        if decision.action == "approve":
+            changes.append({"submission_id": submission_id, "before": previous_status, "status": models.TaskStatus.APPROVED, "grade": decision.grade, "remarks": decision.remarks})
+            outcome = "approved"
+        else:
+            changes.append({"submission_id": submission_id, "before": previous_status, "status": models.TaskStatus.PENDING, "rejection_reason": decision.reason})
+            outcome = "rejected"
+        results.append({"student_roll_number": decision.student_roll_number, "result": outcome, "new_status": changes[-1]["status"].value})
+        transitions.append((previous_status, changes[-1]["status"]))
+
+    # Approvals and rejections set different columns: (at most) two executemany batches.
+    submissions_table = models.Submission.__table__
+    matched = 0
+    for columns in (("grade", "remarks"), ("rejection_reason",)):
+        batch = [change for change in changes if columns[0] in change]
+        if batch:
+            result = await db.execute(
+                update(submissions_table)
+                .where(submissions_table.c.id == bindparam("submission_id"), submissions_table.c.status == bindparam("before"))
+                .values(status=bindparam("status"), **{column: bindparam(column) for column in columns}),
+                batch,
+            )
+            matched += result.rowcount
+    # asyncpg does not report the rows an executemany matched; there the lock above holds them.
+    if db.get_bind().dialect.supports_sane_multi_rowcount and matched != len(changes):
+        await db.rollback()
+        raise SubmissionChanged(task_id=task_id)
+    if changes:
+        await counters.record(db, task_id, *transitions)
+        await db.commit()
+    return results
+
+async def download_submission(db: AsyncSession, task_id: str, student_roll_number: str, uploads_dir: Path):
+    submission = await get_submission(db, task_id, student_roll_number)
     if not submission or not submission.attachments:
         raise HTTPException(status_code=404, detail="Submission not found or is empty.")
 
     if len(submission.attachments) == 1:
         attachment = submission.attachments[0]
-        return FileResponse(attachment.file_path, filename=Path(attachment.file_path).name)
-
-    zip_io = io.BytesIO()
-    with zipfile.ZipFile(zip_io, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for attachment in submission.attachments:
-            file_path = Path(attachment.file_path)
-            if file_path.is_file():
-                zipf.write(file_path, file_path.name)
-    
-    zip_io.seek(0)
-    return StreamingResponse(zip_io, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename=submission_{student_roll_number}_{task_id}.zip"})
-
-def download_own_submission(db: Session, task_id: str, student: User):
-    return download_submission(db, task_id, student.roll_number)
-
-def delete_submission_attachment(db: Session, task_id: str, student: User, file_name: str):
-    submission = db.query(models.Submission).filter_by(task_id=task_id, student_id=student.roll_number).first()
+        return FileResponse(blobs.attachment_path(uploads_dir, attachment), filename=attachment.name)
+
+    files = [(blobs.attachment_path(uploads_dir, attachment), attachment.name) for attachment in submission.attachments]
+    return StreamingResponse(stream_zip(files), media_type="application/zip", headers={"Content-Disposition": f"attachment; filename=submission_{student_roll_number}_{task_id}.zip"})
+
+async def _plan_submissions_archive(db: AsyncSession, task_id: str, uploads_dir: Path):
+    result = await db.execute(
+        select(models.Submission)
+        .options(selectinload(models.Submission.attachments))
+        .filter(models.Submission.task_id == task_id)
+    )
+    entries = await archive_entries(result.scalars().all(), uploads_dir)
+    if not entries:
+        raise HTTPException(status_code=404, detail="No submitted files for this task.")
+    key = fingerprint(entries)
+    target = archive_dir(uploads_dir, task_id) / f"{key}.zip"
+    return entries, key, target, await attachment_io.run("stat", target.is_file)
+
+async def download_all_submissions(db: AsyncSession, task_id: str, uploads_dir: Path):
+    entries, key, target, built = await _plan_submissions_archive(db, task_id, uploads_dir)
+    filename = f"submissions_{task_id}.zip"
+
+    if sum(entry.size for entry in entries) <= settings.SUBMISSION_ARCHIVE_STREAM_MAX_BYTES:
+        SUBMISSION_ARCHIVE_REQUESTS.inc(result="streamed")
+        return StreamingResponse(
+            stream_zip((entry.path, entry.name) for entry in entries),
+            media_type="application/zip",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+    if built:
+        SUBMISSION_ARCHIVE_REQUESTS.inc(result="cached")
+        return FileResponse(target, media_type="application/zip", filename=filename)
+
+    job = archive_builder.start(task_id, key, entries, target)
+    if job.state == "failed":
+        SUBMISSION_ARCHIVE_REQUESTS.inc(result="failed")
+        return JSONResponse(status_code=503, content=job.progress(), headers={"Retry-After": str(max(job.retry_after(), 1))})
+    SUBMISSION_ARCHIVE_REQUESTS.inc(result="building")
+    return JSONResponse(status_code=202, content=job.progress(), headers={"Retry-After": "2"})
+
+async def submissions_archive_status(db: AsyncSession, task_id: str, uploads_dir: Path) -> dict:
+    entries, key, target, built = await _plan_submissions_archive(db, task_id, uploads_dir)
+    job = archive_builder.job(task_id, key)
+    if job is not None and not built:
+        return job.progress()
+
+    streamed = sum(entry.size for entry in entries) <= settings.SUBMISSION_ARCHIVE_STREAM_MAX_BYTES
+    job = ArchiveJob(task_id, key, target, files_total=len(entries), bytes_total=sum(entry.size for entry in entries))
+    if streamed or built:
+        job.state, job.files_done, job.bytes_done = "ready", job.files_total, job.bytes_total
+    else:
+        job.state = "not_started"
+    return job.progress()
+
+async def download_own_submission(db: AsyncSession, task_id: str, student: User, uploads_dir: Path):
+    return await download_submission(db, task_id, student.roll_number, uploads_dir)
+
+async def delete_submission_attachment(db: AsyncSession, task_id: str, student: User, file_name: str, uploads_dir: Path):
+    submission = await get_submission(db, task_id, student.roll_number)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found.")
 
     attachment_to_delete = None
     for attachment in submission.attachments:
-        if Path(attachment.file_path).name == file_name:
+        if attachment.name == file_name:
             attachment_to_delete = attachment
             break
 
     if not attachment_to_delete:
         raise HTTPException(status_code=404, detail=f"File '{file_name}' not found in submission.")
 
-    # Delete the file from disk and the DB record
-    Path(attachment_to_delete.file_path).unlink(missing_ok=True)
-    db.delete(attachment_to_delete)
-
     # If that was the last file, delete the submission itself
-    if len(submission.attachments) == 0:
-        db.delete(submission)
+    last_file = len(submission.attachments) == 1
+    # Delete the DB record, and the file once that is committed
+    released = await blobs.release(db, uploads_dir, [attachment_to_delete])
+
+    if last_file:
+        await _change_status(db, submission, None)
         message = "The last file was removed, and the submission has been deleted."
     else:
         message = f"File '{file_name}' has been deleted from the submission."
 
-    db.commit()
+    await db.commit()
+    await blobs.discard(db, uploads_dir, released)
     return message
@@ -0,0 +1,262 @@
+"""
+Resumable submission uploads: a large file is sent in chunks, and a dropped connection costs one chunk.
+
+    POST   /{course_id}/tasks/{task_id}/uploads              {"file_name", "size"} -> an upload
+    PUT    /{course_id}/tasks/{task_id}/uploads/{upload_id}  the bytes at the `Upload-Offset` header
+    GET    /{course_id}/tasks/{task_id}/uploads/{upload_id}  how far it got
+    DELETE /{course_id}/tasks/{task_id}/uploads/{upload_id}  give up
+    POST   /{course_id}/tasks/{task_id}/uploads/finalize     {"upload_ids": [...]} -> the submission
+
+Each chunk must start where the upload stands (`received`), so a client that lost the answer
+to a PUT asks (GET, or the 409 it gets) and carries on from there. A chunk is at most
+RESUMABLE_UPLOAD_CHUNK_BYTES and is read whole before anything is written: a chunk cut off
+mid-way is simply sent again. The offset moves with a conditional UPDATE (`WHERE received =
+offset`) in the same transaction as the write, so two copies of one chunk cannot both land.
+
+The bytes are appended to `<uploads>/.resumable/<upload_id>.part` on the attachment pool.
+Finalizing hashes the complete files and hands them to submit_task() like a multipart
+upload, which moves them into the blob store (src/attachments/blobs.py).
+
+Staging is bounded. A student has at most RESUMABLE_UPLOAD_MAX_PER_USER unfinished uploads,
+all unfinished uploads together may declare at most RESUMABLE_UPLOAD_MAX_STAGED_BYTES (a 503
+with Retry-After beyond that), and an upload that receives no chunk for
+RESUMABLE_UPLOAD_EXPIRY_SECONDS expires. Expired uploads are deleted, row and file, whenever
+a new upload is created.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import User
+from src.config import settings
+from src.exceptions import CourseNotFound, SubmissionAlreadyExists, TaskNotFound
+from src.attachments.ingest import IncomingFile, UploadTooLarge, safe_filename
+from src.attachments.storage import attachment_io
+from src.metrics.registry import Counter
+from src.tasks import models, service
+
+STAGING_DIR_NAME = ".resumable"
+
+RESUMABLE_UPLOAD_CHUNKS = Counter(
+    "resumable_upload_chunks_total", "Chunks sent to resumable submission uploads, by outcome.", ("result",)
+)
+
+
+class UploadNotFound(HTTPException):
+    def __init__(self, upload_id: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"message": "Upload not found or expired", "upload_id": upload_id},
+        )
+
+
+class UploadOffsetMismatch(HTTPException):
+    def __init__(self, upload_id: str, offset: int):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "The chunk does not start where the upload stands", "upload_id": upload_id, "offset": offset},
+            headers={"Upload-Offset": str(offset)},
+        )
+
+
+class UploadIncomplete(HTTPException):
+    def __init__(self, upload_id: str, offset: int, size: int):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is not complete", "upload_id": upload_id, "offset": offset, "size": size},
+        )
+
+
+class TooManyUploads(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.RESUMABLE_UPLOAD_MAX_PER_USER} unfinished uploads; finish or cancel one first.",
+        )
+
+
+class StagingFull(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many uploads in progress, please try again later",
+            headers={"Retry-After": "60"},
+        )
+
+
+def staged_path(uploads_dir: Path, upload_id: str) -> Path:
+    return uploads_dir / STAGING_DIR_NAME / f"{upload_id}.part"
+
+
+def progress(upload: models.SubmissionUpload) -> dict:
+    return {
+        "upload_id": upload.id,
+        "file_name": upload.file_name,
+        "size": upload.size,
+        "offset": upload.received,
+        "complete": upload.received == upload.size,
+        "expires_at": upload.expires_at,
+        "chunk_size": settings.RESUMABLE_UPLOAD_CHUNK_BYTES,
+    }
+
+
+def _expiry() -> datetime:
+    return datetime.now() + timedelta(seconds=settings.RESUMABLE_UPLOAD_EXPIRY_SECONDS)
+
+
+def _write_at(path: Path, offset: int, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb" if offset == 0 else "r+b") as out:
+        out.seek(offset)
+        out.write(data)
+        # Bytes past the chunk were written by an attempt whose offset never committed.
+        out.truncate()
+
+
+def _hash_file(path: Path) -> tuple[str, int]:
+    digest, size = hashlib.sha256(), 0
+    with path.open("rb") as source:
+        while chunk := source.read(attachment_io.chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def purge_expired_uploads(db: AsyncSession, uploads_dir: Path) -> int:
+    """Delete uploads that got no chunk within the expiry, and their staged files; returns how many."""
+    expired = (await db.execute(
+        delete(models.SubmissionUpload).where(models.SubmissionUpload.expires_at < datetime.now()).returning(models.SubmissionUpload.id)
+    )).scalars().all()
+    await db.commit()
+    await attachment_io.unlink(*(staged_path(uploads_dir, upload_id) for upload_id in expired))
+    return len(expired)
+
+
+async def create_upload(db: AsyncSession, course_id: str, task_id: str, student: User, file_name: str, size: int, uploads_dir: Path):
+    file_name = safe_filename(file_name)
+    if size > settings.UPLOAD_MAX_FILE_BYTES:
+        raise UploadTooLarge(f"File '{file_name}' is larger than {settings.UPLOAD_MAX_FILE_BYTES} bytes.")
+    task = await db.get(models.Task, task_id)
+    if task is None:
+        raise TaskNotFound(task_id=task_id)
+    if task.course_id != course_id:
+        raise CourseNotFound(course_id=course_id)
+    # Refuse now rather than after the student has sent hundreds of megabytes.
+    submission = await service.get_submission(db, task_id, student.roll_number)
+    if submission and submission.status in (models.TaskStatus.SUBMITTED, models.TaskStatus.APPROVED):
+        raise SubmissionAlreadyExists(task_id=task_id)
+
+    await purge_expired_uploads(db, uploads_dir)
+    mine = await db.scalar(select(func.count(models.SubmissionUpload.id)).where(models.SubmissionUpload.student_id == student.roll_number))
+    if mine >= settings.RESUMABLE_UPLOAD_MAX_PER_USER:
+        raise TooManyUploads()
+    staged = await db.scalar(select(func.coalesce(func.sum(models.SubmissionUpload.size), 0)))
+    if staged + size > settings.RESUMABLE_UPLOAD_MAX_STAGED_BYTES:
+        raise StagingFull()
+
+    now = datetime.now()
+    upload = models.SubmissionUpload(
+        task_id=task_id, student_id=student.roll_number, file_name=file_name, size=size, received=0, created_at=now, expires_at=_expiry(),
+    )
+    db.add(upload)
+    await db.commit()
+    return upload
+
+
+async def get_upload(db: AsyncSession, task_id: str, upload_id: str, student: User) -> models.SubmissionUpload:
+    upload = await db.scalar(
+        select(models.SubmissionUpload)
+        .filter_by(id=upload_id, task_id=task_id, student_id=student.roll_number)
+        .execution_options(populate_existing=True)
+    )
+    if upload is None or upload.expires_at < datetime.now():
+        raise UploadNotFound(upload_id)
+    return upload
+
+
+async def _read_chunk(request: Request, limit: int) -> bytes:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise UploadTooLarge(f"Chunk is larger than {limit} bytes.")
+    chunk = bytearray()
+    async for data in request.stream():
+        chunk += data
+        if len(chunk) > limit:
+            raise UploadTooLarge(f"Chunk is larger than {limit} bytes.")
+    return bytes(chunk)
+
+
+async def write_chunk(db: AsyncSession, task_id: str, upload_id: str, student: User, offset: int, request: Request, uploads_dir: Path):
+    upload = await get_upload(db, task_id, upload_id, student)
+    if offset != upload.received:
+        RESUMABLE_UPLOAD_CHUNKS.inc(result="offset_mismatch")
+        raise UploadOffsetMismatch(upload_id, upload.received)
+    data = await _read_chunk(request, min(settings.RESUMABLE_UPLOAD_CHUNK_BYTES, upload.size - offset))
+    if not data:
+        return upload
+
+    claimed = await db.execute(
+        update(models.SubmissionUpload)
+        .where(models.SubmissionUpload.id == upload_id, models.SubmissionUpload.received == offset)
+        .values(received=offset + len(data), expires_at=_expiry())
+    )
+    if claimed.rowcount == 0:
+        # Another copy of this chunk got there first.
+        await db.rollback()
+        RESUMABLE_UPLOAD_CHUNKS.inc(result="offset_mismatch")
+        raise UploadOffsetMismatch(upload_id, (await get_upload(db, task_id, upload_id, student)).received)
+    try:
+        await attachment_io.run("write", _write_at, staged_path(uploads_dir, upload_id), offset, data)
+    except BaseException:
+        await db.rollback()
+        raise
+    await db.commit()
+    RESUMABLE_UPLOAD_CHUNKS.inc(result="written")
+    return await get_upload(db, task_id, upload_id, student)
+
+
+async def cancel_upload(db: AsyncSession, task_id: str, upload_id: str, student: User, uploads_dir: Path):
+    upload = await get_upload(db, task_id, upload_id, student)
+    await db.delete(upload)
+    await db.commit()
+    await attachment_io.unlink(staged_path(uploads_dir, upload_id))
+
+
+async def finalize_uploads(db: AsyncSession, task_id: str, student: User, upload_ids: list[str], uploads_dir: Path):
+    """Submit the completed uploads `upload_ids` as the student's submission, through submit_task()."""
+    if not upload_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No uploads to finalize.")
+    found = (await db.execute(
+        select(models.SubmissionUpload).where(
+            models.SubmissionUpload.id.in_(upload_ids),
+            models.SubmissionUpload.task_id == task_id,
+            models.SubmissionUpload.student_id == student.roll_number,
+            models.SubmissionUpload.expires_at >= datetime.now(),
+        )
+    )).scalars().all()
+    uploads = {upload.id: upload for upload in found}
+    for upload_id in upload_ids:
+        if upload_id not in uploads:
+            raise UploadNotFound(upload_id)
+        if uploads[upload_id].received != uploads[upload_id].size:
+            raise UploadIncomplete(upload_id, uploads[upload_id].received, uploads[upload_id].size)
+
+    files = []
+    for upload_id in dict.fromkeys(upload_ids):
+        upload = uploads[upload_id]
+        file = IncomingFile("files", upload.file_name, None, staged_path(uploads_dir, upload_id))
+        if upload.size == 0:
+            await attachment_io.run("write", _write_at, file.staged_path, 0, b"")
+        file.sha256, file.size = await attachment_io.run("hash", _hash_file, file.staged_path)
+        files.append(file)
+
+    submission, message = await service.submit_task(db, task_id, student, files, uploads_dir)
+    await db.execute(delete(models.SubmissionUpload).where(models.SubmissionUpload.id.in_(uploads)))
+    await db.commit()
+    # Files whose content was already stored were not moved into the blob store.
+    await attachment_io.unlink(*(file.staged_path for file in files))
+    return submission, message
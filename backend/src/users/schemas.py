@@ -48,6 +48,14 @@ class Announcement(BaseModel):
     attachements: list[str]
 
 
+class SubmissionCounts(BaseModel):
+    submitted: int
+    delayed: int
+    approved: int
+    rejected: int
+    pending: int
+
+
 class Task(BaseModel):
     task_id: str
     name: str
@@ -61,6 +69,12 @@ class Task(BaseModel):
     rejection_reason: Optional[str] = None
     grade: Optional[Grade] = None
     remarks: Optional[str] = None
+    submission_counts: Optional[SubmissionCounts] = None
+
+
+class AnnouncementPage(BaseModel):
+    announcements: list[Announcement]
+    next_cursor: Optional[str]
 
 
 class CourseDashboard(BaseModel):
@@ -68,6 +82,10 @@ class CourseDashboard(BaseModel):
     tasks: list[Task]
 
 
+class CourseDashboardPage(CourseDashboard):
+    next_cursor: Optional[str]
+
+
 class Student(BaseModel):
     name: str
     roll_number: str
@@ -78,6 +96,10 @@ class StudentList(BaseModel):
     students: list[Student]
 
 
+class StudentPage(StudentList):
+    next_cursor: Optional[str]
+
+
 class ClassInfo(BaseModel):
     class_name: str
     course_name: str
@@ -109,6 +131,7 @@ class TeacherTask(BaseModel):
     description: str
     attachements: list[str]
     deadline: datetime
+    submission_counts: Optional[SubmissionCounts] = None
     submissions: list[TaskSubmissionDetail]
 
 
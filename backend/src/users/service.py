@@ -1,21 +1,28 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import HTTPException
 from src.auth.models import User, UserRole
-from src.courses.models import Course
-from src.tasks.models import Submission, TaskStatus, Grade
+from src.courses.models import Course, student_course_association, teacher_course_association
+from src.courses.service import get_roster_page
+from src.pagination import PageParams
+from src.tasks.models import Task, Submission, TaskStatus, Grade
 from src.attendance.models import Attendance, AttendanceStatusEnum
 from src.schedules.models import Schedule, DayOfWeek
 from datetime import date, timedelta
 import calendar
 
-def get_user_schedule(db: Session, user: User):
+async def get_user_schedule(db: AsyncSession, user: User):
     today_name = calendar.day_name[date.today().weekday()].upper()
     
     if user.role == UserRole.STUDENT:
         if not user.classroom:
             return {"morning_subs": [], "aftnoon_subs": []}
         
-        schedule_entries = db.query(Schedule).filter_by(class_id=user.classroom, day_of_week=today_name).order_by(Schedule.period).all()
+        result = await db.execute(
+            select(Schedule).filter_by(class_id=user.classroom, day_of_week=today_name).order_by(Schedule.period)
+        )
+        schedule_entries = result.scalars().all()
         
         morning_subs = [s.course_id for s in schedule_entries if s.period <= 3]
         aftnoon_subs = [s.course_id for s in schedule_entries if s.period > 3]
@@ -23,14 +30,21 @@ def get_user_schedule(db: Session, user: User):
         return {"morning_subs": morning_subs, "aftnoon_subs": aftnoon_subs}
 
     elif user.role == UserRole.TEACHER:
-        teacher_courses = {course.id for course in user.teacher_courses}
+        result = await db.execute(
+            select(teacher_course_association.c.course_id)
+            .filter(teacher_course_association.c.teacher_roll_number == user.roll_number)
+        )
+        teacher_courses = set(result.scalars().all())
         if not teacher_courses:
             return {"morning_subs": [], "aftnoon_subs": []}
 
-        schedule_entries = db.query(Schedule).filter(
-            Schedule.day_of_week == today_name,
-            Schedule.course_id.in_(teacher_courses)
-        ).order_by(Schedule.period).all()
+        result = await db.execute(
+            select(Schedule).filter(
+                Schedule.day_of_week == today_name,
+                Schedule.course_id.in_(teacher_courses)
+            ).order_by(Schedule.period)
+        )
+        schedule_entries = result.scalars().all()
 
         # Create a full day schedule with breaks
         total_periods = 6
@@ -45,14 +59,27 @@ def get_user_schedule(db: Session, user: User):
 
     return {"morning_subs": [], "aftnoon_subs": []}
 
-def get_user_courses(db: Session, user: User):
+async def _get_courses_for_user(db: AsyncSession, association, roll_number_column, roll_number: str):
+    result = await db.execute(
+        select(Course)
+        .join(association, association.c.course_id == Course.id)
+        .filter(roll_number_column == roll_number)
+        .options(selectinload(Course.teachers), selectinload(Course.students))
+    )
+    return result.scalars().all()
+
+async def get_user_courses(db: AsyncSession, user: User):
     if user.role == UserRole.STUDENT:
-        return user.student_courses
+        return await _get_courses_for_user(
+            db, student_course_association, student_course_association.c.student_roll_number, user.roll_number
+        )
     elif user.role == UserRole.TEACHER:
-        return user.teacher_courses
+        return await _get_courses_for_user(
+            db, teacher_course_association, teacher_course_association.c.teacher_roll_number, user.roll_number
+        )
     return []
 
-def get_attendance_records(db: Session, user: User):
+async def get_attendance_records(db: AsyncSession, user: User):
     if user.role != UserRole.STUDENT:
         return {
             "total_days": 0,
@@ -61,7 +88,8 @@ def get_attendance_records(db: Session, user: User):
             "leave_days": []
         }
 
-    attendance_records = db.query(Attendance).filter(Attendance.student_roll_number == user.roll_number).all()
+    result = await db.execute(select(Attendance).filter(Attendance.student_roll_number == user.roll_number))
+    attendance_records = result.scalars().all()
 
     days_present = len([rec for rec in attendance_records if rec.status == AttendanceStatusEnum.PRESENT])
     days_absent = len([rec for rec in attendance_records if rec.status == AttendanceStatusEnum.ABSENT])
@@ -83,11 +111,13 @@ def get_attendance_records(db: Session, user: User):
         "leave_days": leave_days
     }
 
-def get_teacher_classes(db: Session, user: User):
+async def get_teacher_classes(db: AsyncSession, user: User):
     if user.role != UserRole.TEACHER:
         return []
-    
-    courses = user.teacher_courses
+
+    courses = await _get_courses_for_user(
+        db, teacher_course_association, teacher_course_association.c.teacher_roll_number, user.roll_number
+    )
     
     return [
         {
@@ -100,20 +130,26 @@ def get_teacher_classes(db: Session, user: User):
         } for course in courses
     ]
 
-def get_student_profile(db: Session, student_roll_number: str):
-    student = db.query(User).filter(User.roll_number == student_roll_number, User.role == UserRole.STUDENT).first()
+async def get_student_profile(db: AsyncSession, student_roll_number: str):
+    result = await db.execute(select(User).filter(User.roll_number == student_roll_number, User.role == UserRole.STUDENT))
+    student = result.scalars().first()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
     # Calculate total tasks for the student's class
-    courses = db.query(Course).filter(Course.class_name == student.classroom).all()
-    tasks_total = sum(len(course.tasks) for course in courses)
+    result = await db.execute(
+        select(func.count(Task.id)).join(Course, Task.course_id == Course.id).filter(Course.class_name == student.classroom)
+    )
+    tasks_total = result.scalar_one()
 
     # Calculate completed tasks for the student
-    submissions = db.query(Submission).filter(
-        Submission.student_id == student.roll_number,
-        Submission.status == TaskStatus.APPROVED
-    ).all()
+    result = await db.execute(
+        select(Submission).filter(
+            Submission.student_id == student.roll_number,
+            Submission.status == TaskStatus.APPROVED
+        )
+    )
+    submissions = result.scalars().all()
     tasks_completed = len(submissions)
 
     # Calculate grades
@@ -139,13 +175,15 @@ def get_student_profile(db: Session, student_roll_number: str):
     else:
         overall_grade = Grade.D
 
+    attendance = await get_attendance_records(db, student)
+
     return {
         "profile_picture_url": f"{student.roll_number}.png",
         "name": student.name,
         "roll_number": student.roll_number,
         "classroom": student.classroom,
         "progress": {
-            "attendance_percentage": int(get_attendance_records(db, student)['attendance_percentage']),
+            "attendance_percentage": int(attendance['attendance_percentage']),
             "tasks_completed": tasks_completed,
             "tasks_total": tasks_total
         },
@@ -166,19 +204,29 @@ def get_student_profile(db: Session, student_roll_number: str):
         "home_address": student.home_address
     }
 
-def get_students_in_classroom(db: Session, class_id: str, current_user: User):
-    course = db.query(Course).filter(Course.class_name == class_id).first()
+async def get_students_in_classroom(db: AsyncSession, class_id: str, current_user: User, page: PageParams | None = None):
+    options = [selectinload(Course.students)] if page is None else []
+    result = await db.execute(select(Course).options(*options).filter(Course.class_name == class_id))
+    course = result.scalars().first()
     if not course:
         raise HTTPException(status_code=404, detail="Class not found")
 
     if course.homeroom_teacher_id != current_user.roll_number:
         raise HTTPException(status_code=403, detail="You are not the homeroom teacher of this class")
 
+    next_cursor = None
+    if page is None:
+        roster = course.students
+    else:
+        roster, next_cursor = await get_roster_page(db, course.id, page)
+
     students = []
-    for student in course.students:
+    for student in roster:
         students.append({
             "name": student.name,
             "roll_number": student.roll_number,
             "profile_picture_url": f"{student.roll_number}.png"
         })
-    return students
+    if page is None:
+        return students
+    return students, next_cursor
@@ -0,0 +1,73 @@
+import asyncio
+import io
+import threading
+import time
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from src.attachments.storage import AttachmentIO
+
+
+class SlowFile(io.BytesIO):
+    """A spooled upload on a slow disk: every read blocks its thread."""
+
+    def read(self, size=-1):
+        time.sleep(0.02)
+        return super().read(size)
+
+
+def test_saves_write_every_chunk_and_create_directories(tmp_path: Path):
+    attachment_io = AttachmentIO(max_workers=2, chunk_size=1000)
+    uploads = [UploadFile(io.BytesIO(bytes([i]) * 2500), filename=f"part{i}.bin") for i in range(3)]
+
+    async def save_all():
+        return await asyncio.gather(*(attachment_io.save(upload, tmp_path / "new" / "dir" / upload.filename) for upload in uploads))
+
+    paths = asyncio.run(save_all())
+
+    assert [path.name for path in paths] == ["part0.bin", "part1.bin", "part2.bin"]
+    assert [path.read_bytes() for path in paths] == [bytes([i]) * 2500 for i in range(3)]
+
+
+def test_writes_run_off_the_event_loop(tmp_path: Path):
+    attachment_io = AttachmentIO(max_workers=1, chunk_size=100)
+    writer_threads = []
+    original_copy = attachment_io._copy
+
+    def copy(source, destination):
+        writer_threads.append(threading.current_thread())
+        return original_copy(source, destination)
+
+    attachment_io._copy = copy
+
+    async def upload_while_ticking():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await attachment_io.save(UploadFile(SlowFile(b"x" * 1000), filename="scan.pdf"), tmp_path / "scan.pdf")
+        ticker.cancel()
+        return ticks
+
+    # Eleven 20 ms reads: a loop blocked by them would not tick at all.
+    assert asyncio.run(upload_while_ticking()) > 10
+    assert writer_threads and writer_threads[0] is not threading.main_thread()
+    assert (tmp_path / "scan.pdf").read_bytes() == b"x" * 1000
+
+
+def test_unlink_ignores_missing_files(tmp_path: Path):
+    attachment_io = AttachmentIO(max_workers=1, chunk_size=100)
+    kept, removed = tmp_path / "kept.txt", tmp_path / "removed.txt"
+    kept.write_text("keep")
+    removed.write_text("remove")
+
+    asyncio.run(attachment_io.unlink(str(removed), tmp_path / "never-existed.txt"))
+    asyncio.run(attachment_io.unlink())
+
+    assert kept.exists() and not removed.exists()
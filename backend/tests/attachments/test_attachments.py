@@ -1,10 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
 from src.main import app
-from src.database import get_db
+from src.database import get_db, get_async_db
 from src.auth.dependencies import get_current_user
 from src.auth.models import User
-from tests.conftest import TestingSessionLocal, test_student, test_teacher
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal, test_student, test_teacher
 
 from src.dependencies import get_uploads_dir
 from pathlib import Path
@@ -19,6 +19,10 @@ def client_factory(db_session):
             finally:
                 db.close()
 
+        async def override_get_async_db():
+            async with TestingAsyncSessionLocal() as db:
+                yield db
+
         def override_get_current_user():
             return user
         
@@ -26,6 +30,7 @@ def client_factory(db_session):
             return uploads_dir
 
         app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
         app.dependency_overrides[get_current_user] = override_get_current_user
         app.dependency_overrides[get_uploads_dir] = override_get_uploads_dir
         return TestClient(app)
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import io
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.attachments import blobs
+from src.attachments.models import Blob
+from src.courses.models import Course
+from src.database import configure_sqlite_engine, create_async_db_engine, to_async_url
+from src.dependencies import get_uploads_dir
+from src.tasks.models import Task, TaskAttachment
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingAsyncSessionLocal
+
+WORKSHEET = b"%PDF worksheet " * 1000
+
+
+def stored_files(uploads_dir: Path) -> list[Path]:
+    return [path for path in (uploads_dir / blobs.BLOB_DIR_NAME).rglob("*") if path.is_file()]
+
+
+def test_shared_worksheet_is_stored_once_and_deleted_with_its_last_reference(client: TestClient, db_session, test_teacher, tmp_path: Path):
+    db_session.add_all([Course(id="MAT-10-A", name="Maths", class_name="10-A"), Course(id="MAT-10-B", name="Maths", class_name="10-B")])
+    db_session.commit()
+    app.dependency_overrides[get_current_user] = lambda: test_teacher
+    app.dependency_overrides[get_uploads_dir] = lambda: tmp_path
+    deadline = (datetime.now() + timedelta(days=1)).isoformat()
+    try:
+        task_ids = {}
+        for course_id, file_name in (("MAT-10-A", "worksheet.pdf"), ("MAT-10-B", "worksheet-b.pdf")):
+            response = client.post(
+                f"/v1/api/{course_id}/tasks/create",
+                data={"title": "Fractions", "description": "", "deadline": deadline},
+                files=[("files", (file_name, WORKSHEET))],
+            )
+            assert response.status_code == 200, response.text
+            task_ids[course_id] = response.json()["task_id"]
+
+        [blob] = db_session.scalars(select(Blob)).all()
+        assert (blob.sha256, blob.size, blob.ref_count) == (hashlib.sha256(WORKSHEET).hexdigest(), len(WORKSHEET), 2)
+        assert stored_files(tmp_path) == [blobs.blob_path(tmp_path, blob.sha256)]
+
+        # Each task serves the content under its own file name.
+        response = client.get(f"/v1/api/courses/MAT-10-B/tasks/{task_ids['MAT-10-B']}/attachments/worksheet-b.pdf")
+        assert response.status_code == 200
+        assert response.content == WORKSHEET
+        assert response.headers["content-type"] == "application/pdf"
+        assert 'filename="worksheet-b.pdf"' in response.headers["content-disposition"]
+
+        assert client.delete(f"/v1/api/MAT-10-A/tasks/{task_ids['MAT-10-A']}/delete").status_code == 200
+        db_session.expire_all()
+        assert db_session.scalars(select(Blob.ref_count)).all() == [1]
+        assert len(stored_files(tmp_path)) == 1
+
+        assert client.delete(f"/v1/api/MAT-10-B/tasks/{task_ids['MAT-10-B']}/delete").status_code == 200
+        assert db_session.scalars(select(Blob)).all() == []
+        assert stored_files(tmp_path) == []
+    finally:
+        del app.dependency_overrides[get_uploads_dir]
+
+
+def test_store_writes_new_content_only_and_release_frees_legacy_files(db_session, test_teacher, tmp_path: Path):
+    db_session.add(Course(id="MAT-10-A", name="Maths", class_name="10-A"))
+    db_session.add(Task(id="TSK-1", title="Fractions", description="", course_id="MAT-10-A", author_id=test_teacher.roll_number, created_at=datetime.now()))
+    db_session.commit()
+    legacy_file = tmp_path / "courses" / "MAT-10-A" / "tasks" / "TSK-1" / "attachments" / "old.pdf"
+    legacy_file.parent.mkdir(parents=True)
+    legacy_file.write_bytes(b"old")
+
+    async def scenario():
+        async with TestingAsyncSessionLocal() as db:
+            uploads = [UploadFile(io.BytesIO(content), filename=name) for name, content in (("a.pdf", b"A"), ("copy.pdf", b"A"), ("b.pdf", b"B"))]
+            hashes = await blobs.store(db, tmp_path, uploads)
+            await db.commit()
+            written = {path: path.stat().st_mtime_ns for path in stored_files(tmp_path)}
+
+            # Storing "A" again only takes another reference.
+            assert await blobs.store(db, tmp_path, [UploadFile(io.BytesIO(b"A"), filename="again.pdf")]) == hashes[:1]
+            await db.commit()
+            assert {path: path.stat().st_mtime_ns for path in stored_files(tmp_path)} == written
+
+            counts = dict((await db.execute(select(Blob.sha256, Blob.ref_count))).all())
+            assert counts == {hashlib.sha256(b"A").hexdigest(): 3, hashlib.sha256(b"B").hexdigest(): 1}
+
+            attachments = [TaskAttachment(task_id="TSK-1", file_name="b.pdf", blob_sha256=hashes[2]), TaskAttachment(task_id="TSK-1", file_path=str(legacy_file))]
+            db.add_all(attachments)
+            await db.commit()
+            released = await blobs.release(db, tmp_path, attachments)
+            await db.commit()
+            # Files go only once the release has committed.
+            assert legacy_file.exists() and len(stored_files(tmp_path)) == 2
+            await blobs.discard(db, tmp_path, released)
+            return hashes, dict((await db.execute(select(Blob.sha256, Blob.ref_count))).all())
+
+    hashes, counts = asyncio.run(scenario())
+
+    assert hashes[0] == hashes[1] == hashlib.sha256(b"A").hexdigest()
+    assert counts == {hashes[0]: 3}
+    assert stored_files(tmp_path) == [blobs.blob_path(tmp_path, hashes[0])]
+    assert not legacy_file.exists()
+
+
+@pytest.fixture()
+def attached(db_session, test_teacher, tmp_path: Path):
+    """An async session with foreign keys enforced, and a task attachment stored in it."""
+    db_session.add(Course(id="MAT-10-A", name="Maths", class_name="10-A"))
+    db_session.add(Task(id="TSK-1", title="Fractions", description="", course_id="MAT-10-A", author_id=test_teacher.roll_number, created_at=datetime.now()))
+    db_session.commit()
+    engine = create_async_db_engine(to_async_url(SQLALCHEMY_DATABASE_URL))
+    if engine.dialect.name == "sqlite":  # PostgreSQL always enforces them
+        configure_sqlite_engine(engine, {"foreign_keys": "ON"})
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def attach():
+        async with session_factory() as db:
+            [sha256] = await blobs.store(db, tmp_path, [UploadFile(io.BytesIO(WORKSHEET), filename="worksheet.pdf")])
+            db.add(TaskAttachment(task_id="TSK-1", file_name="worksheet.pdf", blob_sha256=sha256))
+            await db.commit()
+
+    asyncio.run(attach())
+    yield session_factory
+    asyncio.run(engine.dispose())
+
+
+def blob_rows(db_session) -> list[tuple[str, int]]:
+    db_session.expire_all()
+    return db_session.execute(select(Blob.sha256, Blob.ref_count)).all()
+
+
+def test_release_deletes_attachments_before_their_blob(attached, db_session, tmp_path: Path):
+    async def scenario():
+        async with attached() as db:
+            attachments = (await db.scalars(select(TaskAttachment))).all()
+            released = await blobs.release(db, tmp_path, attachments)
+            await db.commit()
+            assert len(stored_files(tmp_path)) == 1
+            await blobs.discard(db, tmp_path, released)
+
+    asyncio.run(scenario())
+
+    assert db_session.scalars(select(TaskAttachment)).all() == []
+    assert blob_rows(db_session) == []
+    assert stored_files(tmp_path) == []
+
+
+def test_rolled_back_release_keeps_the_file(attached, db_session, tmp_path: Path):
+    async def scenario():
+        async with attached() as db:
+            await blobs.release(db, tmp_path, (await db.scalars(select(TaskAttachment))).all())
+            await db.rollback()
+
+    asyncio.run(scenario())
+
+    assert len(db_session.scalars(select(TaskAttachment)).all()) == 1
+    assert blob_rows(db_session) == [(hashlib.sha256(WORKSHEET).hexdigest(), 1)]
+    assert [path.read_bytes() for path in stored_files(tmp_path)] == [WORKSHEET]
+
+
+def test_discard_keeps_content_stored_again_after_the_release(attached, db_session, tmp_path: Path):
+    async def scenario():
+        async with attached() as db:
+            released = await blobs.release(db, tmp_path, (await db.scalars(select(TaskAttachment))).all())
+            await db.commit()
+            # Another request uploads the same worksheet before this one deletes the file.
+            await blobs.store(db, tmp_path, [UploadFile(io.BytesIO(WORKSHEET), filename="again.pdf")])
+            await db.commit()
+            await blobs.discard(db, tmp_path, released)
+
+    asyncio.run(scenario())
+
+    assert blob_rows(db_session) == [(hashlib.sha256(WORKSHEET).hexdigest(), 1)]
+    assert [path.read_bytes() for path in stored_files(tmp_path)] == [WORKSHEET]
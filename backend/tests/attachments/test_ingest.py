@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.courses.models import Course
+from src.dependencies import get_uploads_dir
+from src.attachments.blobs import blob_path
+from src.attachments.ingest import STAGING_DIR_NAME, UploadLimits, ingest_multipart
+
+BOUNDARY = "----taskwise-test"
+LIMITS = UploadLimits(max_request_bytes=10_000_000, max_file_bytes=1_000_000, max_files=3, max_field_bytes=100)
+
+
+def multipart(*parts: tuple[str, str | None, bytes]) -> bytes:
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def request_for(body: bytes, chunk_size: int = 4096, content_length: int | None = None, content_type: str | None = None):
+    """A Request whose body arrives in chunks; `pulled` counts the chunks the app asked for."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    pulled = []
+
+    async def receive():
+        pulled.append(1)
+        index = len(pulled) - 1
+        return {"type": "http.request", "body": chunks[index], "more_body": index < len(chunks) - 1}
+
+    headers = [(b"content-type", (content_type or f"multipart/form-data; boundary={BOUNDARY}").encode())]
+    headers.append((b"content-length", str(len(body) if content_length is None else content_length).encode()))
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive), pulled, len(chunks)
+
+
+def ingest(request, tmp_path: Path, limits: UploadLimits = LIMITS):
+    return asyncio.run(ingest_multipart(request, tmp_path / STAGING_DIR_NAME, limits))
+
+
+def test_files_are_staged_with_hash_and_fields_parsed(tmp_path: Path):
+    scan = bytes(range(256)) * 2000
+    request, _, _ = request_for(multipart(("title", None, "Lab report".encode()), ("files", "../../scan.pdf", scan), ("files", "", b"")))
+
+    form = ingest(request, tmp_path)
+
+    assert form.get("title") == "Lab report"
+    [incoming] = form.files_for("files")
+    assert incoming.filename == "scan.pdf"
+    assert incoming.size == len(scan)
+    assert incoming.sha256 == hashlib.sha256(scan).hexdigest()
+    assert incoming.staged_path.parent == tmp_path / STAGING_DIR_NAME
+    assert incoming.staged_path.read_bytes() == scan
+
+
+def test_oversized_file_is_refused_before_the_body_is_read(tmp_path: Path):
+    request, pulled, total = request_for(multipart(("files", "big.pdf", b"x" * 3_000_000)))
+
+    with pytest.raises(HTTPException) as refused:
+        ingest(request, tmp_path)
+
+    assert refused.value.status_code == 413
+    assert len(pulled) < total / 2
+    assert list((tmp_path / STAGING_DIR_NAME).iterdir()) == []
+
+
+def test_request_limits(tmp_path: Path):
+    # A declared Content-Length over the limit is refused without reading anything.
+    request, pulled, _ = request_for(b"", content_length=LIMITS.max_request_bytes + 1)
+    with pytest.raises(HTTPException) as refused:
+        ingest(request, tmp_path)
+    assert refused.value.status_code == 413 and pulled == []
+
+    too_many = multipart(*(("files", f"f{i}.txt", b"x") for i in range(LIMITS.max_files + 1)))
+    with pytest.raises(HTTPException) as refused:
+        ingest(request_for(too_many)[0], tmp_path)
+    assert refused.value.status_code == 413
+
+    with pytest.raises(HTTPException) as refused:
+        ingest(request_for(multipart(("description", None, b"x" * 101)))[0], tmp_path)
+    assert refused.value.status_code == 413
+
+
+def test_urlencoded_fields_and_missing_fields(tmp_path: Path):
+    request, _, _ = request_for(b"attachments_to_keep=%5B%22a.txt%22%5D", content_type="application/x-www-form-urlencoded")
+    form = ingest(request, tmp_path)
+
+    assert form.get("attachments_to_keep") == '["a.txt"]'
+    assert form.files_for("files") == []
+    with pytest.raises(HTTPException) as missing:
+        form.get("title")
+    assert missing.value.status_code == 422
+
+
+def test_create_task_moves_staged_files_into_place(client: TestClient, db_session, test_teacher, tmp_path: Path):
+    db_session.add(Course(id="MAT-10-A", name="Maths", class_name="10-A"))
+    db_session.commit()
+    app.dependency_overrides[get_current_user] = lambda: test_teacher
+    app.dependency_overrides[get_uploads_dir] = lambda: tmp_path
+    try:
+        response = client.post(
+            "/v1/api/MAT-10-A/tasks/create",
+            data={"title": "Essay", "description": "", "deadline": (datetime.now() + timedelta(days=1)).isoformat()},
+            files=[("files", ("brief.pdf", b"%PDF brief")), ("files", ("rubric.txt", b"rubric"))],
+        )
+    finally:
+        del app.dependency_overrides[get_uploads_dir]
+
+    assert response.status_code == 200, response.text
+    for content in (b"%PDF brief", b"rubric"):
+        assert blob_path(tmp_path, hashlib.sha256(content).hexdigest()).read_bytes() == content
+    assert list((tmp_path / STAGING_DIR_NAME).iterdir()) == []
@@ -0,0 +1,43 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+
+from src.attachments.zip_stream import stream_zip
+
+
+def test_archive_round_trips_and_skips_missing_files(tmp_path: Path):
+    notes = tmp_path / "notes.txt"
+    notes.write_bytes(b"line of text\n" * 10_000)
+    scan = tmp_path / "scan.JPG"
+    scan.write_bytes(os.urandom(100_000))
+
+    archive = b"".join(stream_zip([(notes, "notes.txt"), (tmp_path / "gone.pdf", "gone.pdf"), (scan, "scan.JPG")], chunk_size=4096))
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["notes.txt", "scan.JPG"]
+        assert zf.read("notes.txt") == notes.read_bytes()
+        assert zf.read("scan.JPG") == scan.read_bytes()
+        assert zf.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+        # Already-compressed formats are stored, not deflated a second time.
+        assert zf.getinfo("scan.JPG").compress_type == zipfile.ZIP_STORED
+
+
+def test_output_is_produced_chunk_by_chunk(tmp_path: Path):
+    big = tmp_path / "big.pdf"
+    big.write_bytes(os.urandom(2_000_000))
+
+    chunks = stream_zip([(big, "big.pdf")], chunk_size=64 * 1024)
+    first = next(chunks)
+    rest = list(chunks)
+
+    # The archive starts before the file has been read, and no piece is much larger than a chunk.
+    assert len(first) < 100 * 1024
+    assert max(len(chunk) for chunk in rest) < 100 * 1024
+    assert len(first) + sum(map(len, rest)) > 2_000_000
+
+
+def test_empty_archive_is_valid(tmp_path: Path):
+    with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([])))) as zf:
+        assert zf.namelist() == []
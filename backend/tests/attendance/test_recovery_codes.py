@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src.auth.models import User
+from src.auth.password_pool import password_pool
+from src.auth.service import get_password_hash
+from src.attendance.models import RecoveryCode
+from src.attendance.service_teacher import create_recovery_code, find_recovery_code, recovery_code_lookup_key
+from src.config import settings
+from src.main import app, lifespan
+
+
+@pytest.fixture()
+def bcrypt_checks(monkeypatch):
+    checks = []
+    verify_sync = password_pool.verify_sync
+
+    def counting_verify(plain_password, hashed_password):
+        checks.append(hashed_password)
+        return verify_sync(plain_password, hashed_password)
+
+    monkeypatch.setattr(password_pool, "verify_sync", counting_verify)
+    return checks
+
+
+def test_lookup_runs_one_bcrypt_check(db_session, test_teacher: User, bcrypt_checks):
+    db_session.add_all(create_recovery_code(test_teacher, f"CODE-{i}") for i in range(5))
+    db_session.commit()
+
+    found = find_recovery_code(db_session, test_teacher, "CODE-3")
+    assert found is not None
+    assert bcrypt_checks == [found.code_hash]
+
+    bcrypt_checks.clear()
+    assert find_recovery_code(db_session, test_teacher, "WRONG") is None
+    assert bcrypt_checks == []
+
+
+def test_lookup_ignores_used_codes_and_other_teachers(db_session, test_teacher: User, test_student: User):
+    used = create_recovery_code(test_teacher, "CODE-1")
+    used.is_used = True
+    db_session.add_all([used, create_recovery_code(test_student, "CODE-2")])
+    db_session.commit()
+
+    assert find_recovery_code(db_session, test_teacher, "CODE-1") is None
+    assert find_recovery_code(db_session, test_teacher, "CODE-2") is None
+
+
+def test_legacy_code_is_found_and_keyed(db_session, test_teacher: User, bcrypt_checks):
+    # Registered before lookup keys existed.
+    db_session.add_all(
+        RecoveryCode(user_roll_number=test_teacher.roll_number, code_hash=get_password_hash(f"OLD-{i}")) for i in range(2)
+    )
+    db_session.commit()
+
+    found = find_recovery_code(db_session, test_teacher, "OLD-1")
+    assert found is not None
+    db_session.commit()
+
+    bcrypt_checks.clear()
+    assert find_recovery_code(db_session, test_teacher, "OLD-1") is found
+    assert bcrypt_checks == [found.code_hash]
+
+
+def test_lookup_keys_do_not_depend_on_the_jwt_secret(test_teacher: User, monkeypatch):
+    key = recovery_code_lookup_key(test_teacher.roll_number, "CODE-1")
+    monkeypatch.setattr(settings, "JWT_SECRET", "rotated")
+    assert recovery_code_lookup_key(test_teacher.roll_number, "CODE-1") == key
+
+
+def test_app_refuses_to_start_without_a_lookup_secret(monkeypatch):
+    monkeypatch.setattr(settings, "RECOVERY_CODE_LOOKUP_SECRET", None)
+
+    async def start():
+        async with lifespan(app):
+            pass
+
+    with pytest.raises(RuntimeError, match="RECOVERY_CODE_LOOKUP_SECRET"):
+        asyncio.run(start())
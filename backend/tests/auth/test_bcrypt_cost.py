@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.auth import service as auth_service
+from src.auth.models import User, UserRole
+
+
+@pytest.fixture()
+def bcrypt_cost():
+    original = auth_service.pwd_context.to_dict()
+    yield auth_service.set_bcrypt_cost
+    auth_service.pwd_context.load(original)
+
+
+def test_calibration_picks_highest_cost_within_target(monkeypatch):
+    # Pretend cost 10 takes 60 ms and each level doubles it.
+    monkeypatch.setattr(auth_service, "time_bcrypt_verify", lambda cost, repeat=3: 0.06 * 2 ** (cost - 10))
+
+    assert auth_service.calibrate_bcrypt_cost(0.25, 10, 14) == 12
+    assert auth_service.calibrate_bcrypt_cost(0.25, 10, 11) == 11
+    # A slow machine still gets the floor.
+    assert auth_service.calibrate_bcrypt_cost(0.01, 10, 14) == 10
+
+
+def test_login_rehashes_below_current_cost(client: TestClient, db_session, bcrypt_cost):
+    bcrypt_cost(4)
+    db_session.add(User(roll_number="old", password=auth_service.get_password_hash("password"), role=UserRole.STUDENT, name="Old"))
+    db_session.commit()
+    first = client.post("/v1/api/login", data={"username": "old", "password": "password"}).json()
+
+    bcrypt_cost(5)
+    assert client.post("/v1/api/login", data={"username": "old", "password": "password"}).status_code == 200
+
+    user = db_session.get(User, "old")
+    db_session.refresh(user)
+    assert user.password.startswith("$2b$05$")
+    assert not auth_service.needs_rehash(user.password)
+    # Same password, so sessions from before the rehash keep working.
+    assert client.post("/v1/api/refresh", json={"refresh_token": first["refresh_token"]}).status_code == 200
+
+
+def test_costlier_hashes_are_not_downgraded(bcrypt_cost):
+    bcrypt_cost(5)
+    stronger = auth_service.get_password_hash("password")
+    bcrypt_cost(4)
+    assert not auth_service.needs_rehash(stronger)
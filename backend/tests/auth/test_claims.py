@@ -0,0 +1,128 @@
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from src.main import app
+from src.config import settings
+from src.auth.dependencies import get_current_user
+from src.auth.identity_cache import identity_cache
+from src.auth.models import User
+from src.courses.models import Course
+
+
+@pytest.fixture()
+def homeroom_course(db_session, test_student: User, test_teacher: User):
+    course = Course(id="TEST-101", name="Test Course", class_name="10-A", homeroom_teacher_id=test_teacher.roll_number)
+    course.students.append(db_session.merge(test_student))
+    course.teachers.append(db_session.merge(test_teacher))
+    db_session.add(course)
+    db_session.commit()
+    return course
+
+
+@pytest.fixture()
+def login(client: TestClient):
+    app.dependency_overrides.pop(get_current_user)
+
+    def login_as(roll_number: str) -> str:
+        response = client.post("/v1/api/login", data={"username": roll_number, "password": "password"})
+        assert response.status_code == 200
+        return response.json()["access_token"]
+
+    yield login_as
+    app.dependency_overrides.clear()
+
+
+def decode(token: str) -> dict:
+    return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
+
+
+def test_login_embeds_versioned_claims(client: TestClient, homeroom_course, login):
+    teacher_claims = decode(login("teacher"))
+    student_claims = decode(login("student"))
+
+    assert teacher_claims["ver"] == 1
+    assert teacher_claims["homeroom_courses"] == ["TEST-101"]
+    assert teacher_claims["homeroom_classes"] == ["10-A"]
+    assert teacher_claims["courses"] == ["TEST-101"]
+    assert student_claims["courses"] == ["TEST-101"]
+    assert student_claims["cv"] == teacher_claims["cv"] == 1  # both joined the course after being created
+
+
+def test_homeroom_checks_use_token_claims(client: TestClient, homeroom_course, login, db_session):
+    student = db_session.get(User, "student")
+    student.email = student.phone_personal = student.phone_mother = student.phone_father = student.home_address = "-"
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {login('teacher')}"}
+
+    assert client.get("/v1/api/students/student", headers=headers).status_code == 200
+    assert client.get("/v1/api/students/stranger", headers=headers).status_code == 403
+
+
+def test_enrollment_change_forces_token_reissue(client: TestClient, homeroom_course, login, db_session, test_student: User):
+    old_token = login("student")
+
+    course = db_session.get(Course, "TEST-101")
+    course.students.remove(db_session.get(User, test_student.roll_number))
+    db_session.commit()
+
+    response = client.get("/v1/api/me/courses", headers={"Authorization": f"Bearer {old_token}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Your courses have changed, please sign in again"
+
+    new_token = login("student")
+    assert decode(new_token)["courses"] == []
+    assert client.get("/v1/api/me/courses", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
+
+
+def test_token_newer_than_the_cached_user_rereads_it(client: TestClient, homeroom_course, login, db_session, test_student: User):
+    old_token = login("student")
+    identity_cache.put(db_session.get(User, test_student.roll_number))
+    stale = identity_cache.get("student")
+
+    course = db_session.get(Course, "TEST-101")
+    course.students.remove(db_session.get(User, test_student.roll_number))
+    db_session.commit()
+    # Another worker never saw the change: it still caches the row the old token matched.
+    identity_cache.put(stale)
+
+    new_token = login("student")
+    assert decode(new_token)["cv"] == stale.claims_version + 1
+    assert client.get("/v1/api/me/courses", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
+    assert identity_cache.get("student").claims_version == stale.claims_version + 1
+    assert client.get("/v1/api/me/courses", headers={"Authorization": f"Bearer {old_token}"}).status_code == 401
+
+
+def test_bumped_users_leave_the_identity_cache_when_the_bump_commits(homeroom_course, db_session, test_student: User):
+    identity_cache.put(db_session.get(User, test_student.roll_number))
+    stale = identity_cache.get("student")
+
+    def remove_student_and_recache():
+        db_session.get(Course, "TEST-101").students.remove(db_session.get(User, test_student.roll_number))
+        db_session.flush()
+        # A concurrent request caches the row between the flush and the commit.
+        identity_cache.put(stale)
+
+    remove_student_and_recache()
+    db_session.rollback()
+    assert identity_cache.get("student").claims_version == stale.claims_version
+
+    remove_student_and_recache()
+    db_session.commit()
+    assert identity_cache.get("student") is None
+
+
+def test_homeroom_change_bumps_both_teachers(client: TestClient, homeroom_course, db_session, test_teacher: User):
+    other = User(roll_number="teacher2", password="", role=test_teacher.role, name="Other Teacher")
+    db_session.add(other)
+    db_session.commit()
+    before = {u.roll_number: u.claims_version for u in db_session.query(User).all()}
+
+    course = db_session.get(Course, "TEST-101")
+    course.homeroom_teacher_id = "teacher2"
+    db_session.commit()
+
+    after = {u.roll_number: u.claims_version for u in db_session.query(User).all()}
+    assert after["teacher"] == before["teacher"] + 1
+    assert after["teacher2"] == before["teacher2"] + 1
+    assert after["student"] == before["student"]
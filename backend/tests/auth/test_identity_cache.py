@@ -0,0 +1,66 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from src.main import app
+from src.config import settings
+from src.auth.dependencies import get_current_user
+from src.auth.identity_cache import IdentityCache, identity_cache
+from src.auth.models import User, UserRole
+from src.auth.service import create_access_token
+
+
+@pytest.fixture()
+def authenticated_client(client: TestClient, test_student: User, monkeypatch):
+    """The test client with the real get_current_user and query-count headers."""
+    app.dependency_overrides.pop(get_current_user)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    token = create_access_token({"sub": test_student.roll_number, "role": test_student.role.value})
+    client.headers["Authorization"] = f"Bearer {token}"
+    yield client
+    app.dependency_overrides.clear()
+
+
+def test_cache_hit_skips_user_query(authenticated_client: TestClient):
+    hits, misses = identity_cache.hits, identity_cache.misses
+    first = authenticated_client.get("/v1/api/me/courses")
+    second = authenticated_client.get("/v1/api/me/courses")
+
+    assert first.status_code == second.status_code == 200
+    assert identity_cache.stats() == {"size": 1, "hits": hits + 1, "misses": misses + 1}
+    assert int(second.headers["x-db-query-count"]) == int(first.headers["x-db-query-count"]) - 1
+
+
+def test_profile_update_invalidates_cached_user(authenticated_client: TestClient, test_student: User, db_session):
+    authenticated_client.get("/v1/api/me/courses")
+    assert identity_cache.get(test_student.roll_number) is not None
+
+    test_student.classroom = "10-B"
+    db_session.commit()
+
+    assert identity_cache.get(test_student.roll_number) is None
+
+
+def test_bulk_user_update_clears_cache(authenticated_client: TestClient, test_student: User, db_session):
+    authenticated_client.get("/v1/api/me/courses")
+
+    db_session.execute(update(User).where(User.roll_number == test_student.roll_number).values(role=UserRole.TEACHER))
+    db_session.commit()
+
+    assert identity_cache.get(test_student.roll_number) is None
+
+
+def test_entries_expire_and_are_bounded():
+    cache = IdentityCache(ttl_seconds=0.05, max_size=2)
+    for roll_number in ("a", "b", "c"):
+        cache.put(User(roll_number=roll_number, role=UserRole.STUDENT, name=roll_number))
+
+    assert cache.get("a") is None  # evicted, least recently used
+    snapshot = cache.get("b")
+    assert snapshot.name == "b" and snapshot.password is None
+
+    time.sleep(0.06)
+    assert cache.get("c") is None
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 2}
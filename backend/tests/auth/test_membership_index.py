@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, insert, update
+
+from src.auth import membership_index as membership_index_module
+from src.auth.membership_index import membership_index
+from src.auth.models import User, UserRole
+from src.courses.models import Course, student_course_association
+from tests.conftest import TestingAsyncSessionLocal
+
+
+@pytest.fixture()
+def course(db_session, test_student: User, test_teacher: User):
+    course = Course(id="MAT-10-A", name="Maths", class_name="10-A", homeroom_teacher_id=test_teacher.roll_number)
+    course.students.append(test_student)
+    course.teachers.append(test_teacher)
+    db_session.add(course)
+    db_session.commit()
+    membership_index.load(db_session)
+    return course
+
+
+def test_loaded_index_answers_membership(course, test_student: User, test_teacher: User):
+    assert membership_index.student_courses("student") == {"MAT-10-A"}
+    assert membership_index.course_students("MAT-10-A") == {"student"}
+    assert membership_index.is_teacher_of("MAT-10-A", "teacher")
+    assert not membership_index.is_teacher_of("MAT-10-A", "student")
+    assert membership_index.is_homeroom_teacher("teacher")
+    assert membership_index.homeroom_classes("teacher") == {"10-A"}
+    assert membership_index.is_homeroom_teacher_of_student("teacher", "student")
+    assert not membership_index.is_homeroom_teacher_of_student("student", "teacher")
+
+
+def test_orm_changes_apply_on_commit(db_session, course, test_student: User, test_teacher: User):
+    other = User(roll_number="student2", name="Other", role=UserRole.STUDENT)
+    course.students.append(other)
+    course.students.remove(test_student)
+    course.homeroom_teacher_id = None
+    db_session.add(Course(id="SCI-10-A", name="Science", class_name="10-A", homeroom_teacher_id="teacher"))
+    db_session.flush()
+    # Nothing is visible before the commit.
+    assert membership_index.course_students("MAT-10-A") == {"student"}
+
+    db_session.commit()
+
+    assert membership_index.is_fresh
+    assert membership_index.course_students("MAT-10-A") == {"student2"}
+    assert membership_index.student_courses("student") == set()
+    assert membership_index.homeroom_courses("teacher") == {"SCI-10-A"}
+    assert membership_index.check_consistency(db_session) == []
+
+    db_session.delete(course)
+    db_session.commit()
+    assert membership_index.student_courses("student2") == set()
+    assert membership_index.check_consistency(db_session) == []
+
+
+def test_rolled_back_changes_are_discarded(db_session, course, test_student: User):
+    course.students.remove(test_student)
+    db_session.flush()
+    db_session.rollback()
+
+    assert membership_index.is_student_of("MAT-10-A", "student")
+    assert membership_index.check_consistency(db_session) == []
+
+
+def test_bulk_statements_mark_the_index_stale(db_session, course):
+    db_session.execute(update(Course).where(Course.id == "MAT-10-A").values(homeroom_teacher_id=None))
+    db_session.commit()
+    assert not membership_index.is_fresh
+
+    membership_index.load(db_session)
+    assert not membership_index.is_homeroom_teacher("teacher")
+
+
+def test_consistency_check_reports_changes_made_behind_its_back(db_session, course):
+    # A raw connection bypasses the session events, like another worker or a SQL console would.
+    with db_session.get_bind().begin() as connection:
+        connection.execute(delete(student_course_association))
+        connection.execute(insert(student_course_association).values(course_id="MAT-10-A", student_roll_number="teacher"))
+
+    problems = membership_index.check_consistency(db_session)
+    assert "course_students['MAT-10-A']: database has {'teacher'}, index has {'student'}" in problems
+    assert any(problem.startswith("student_courses['student']") for problem in problems)
+
+    membership_index.load(db_session)
+    assert membership_index.check_consistency(db_session) == []
+
+
+def test_concurrent_requests_share_one_rebuild(course, monkeypatch):
+    loads = []
+    load = membership_index.load
+    monkeypatch.setattr(membership_index, "load", lambda session: (loads.append(session), load(session)))
+    membership_index.invalidate()
+
+    async def requests():
+        sessions = [TestingAsyncSessionLocal() for _ in range(10)]
+        await asyncio.gather(*(membership_index.ensure_fresh(db) for db in sessions))
+        for db in sessions:
+            await db.close()
+
+    asyncio.run(requests())
+
+    assert len(loads) == 1
+    assert membership_index.is_fresh
+
+
+def test_rebuild_reads_the_primary_when_the_request_reads_a_replica(course, monkeypatch):
+    primary_sessions = []
+
+    class Primary:
+        async def __aenter__(self):
+            primary_sessions.append(TestingAsyncSessionLocal())
+            return primary_sessions[-1]
+
+        async def __aexit__(self, *exc):
+            await primary_sessions[-1].close()
+
+    monkeypatch.setattr(membership_index_module, "reads_from_replica", lambda db: True)
+    monkeypatch.setattr(membership_index_module, "AsyncSessionLocal", Primary)
+    membership_index.invalidate()
+
+    async def request():
+        async with TestingAsyncSessionLocal() as replica:
+            await membership_index.ensure_fresh(replica)
+
+    asyncio.run(request())
+
+    assert len(primary_sessions) == 1
+    assert membership_index.is_fresh
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.auth import router as auth_router
+from src.auth.password_pool import PasswordPool, PasswordPoolBusy, BCRYPT_QUEUE_DEPTH
+from src.auth.service import get_password_hash
+
+
+@pytest.fixture()
+def pool():
+    pool = PasswordPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+    yield pool, release
+    release.set()
+
+
+def test_pool_verifies_off_the_event_loop(pool):
+    pool, _ = pool
+    hashed = get_password_hash("secret")
+
+    async def verify_both():
+        return await asyncio.gather(pool.verify("secret", hashed), pool.verify("wrong", hashed))
+
+    assert asyncio.run(verify_both()) == [True, False]
+    assert pool.pending == 0
+
+
+def test_pool_rejects_work_beyond_its_queue(pool):
+    pool, release = pool
+    running = pool.submit(release.wait)
+    queued = pool.submit(release.wait)
+
+    assert pool.pending == 2
+    assert sum(BCRYPT_QUEUE_DEPTH.collect().values()) >= 1
+    with pytest.raises(PasswordPoolBusy):
+        pool.submit(release.wait)
+
+    release.set()
+    running.result(timeout=5)
+    queued.result(timeout=5)
+    assert pool.pending == 0
+
+
+def test_cancelled_waiters_give_their_slot_back(pool):
+    pool, release = pool
+    running = pool.submit(release.wait)
+
+    async def give_up_while_queued():
+        waiter = asyncio.ensure_future(asyncio.wrap_future(pool.submit(release.wait)))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    for _ in range(5):
+        asyncio.run(give_up_while_queued())
+        assert pool.pending == 1
+
+    release.set()
+    running.result(timeout=5)
+    assert pool.pending == 0
+
+
+def test_login_answers_503_when_pool_is_saturated(client: TestClient, test_student, pool, monkeypatch):
+    pool, release = pool
+    monkeypatch.setattr(auth_router, "password_pool", pool)
+    pool.submit(release.wait)
+    pool.submit(release.wait)
+
+    response = client.post("/v1/api/login", data={"username": "student", "password": "password"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
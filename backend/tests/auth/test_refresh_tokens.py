@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from src.auth import refresh_tokens
+from src.auth.dependencies import get_current_user
+from src.auth.models import RefreshToken
+from src.auth.password_pool import password_pool
+from src.auth.service import get_password_hash
+
+
+def login(client: TestClient) -> dict:
+    response = client.post("/v1/api/login", data={"username": "student", "password": "password"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client: TestClient, token: str):
+    return client.post("/v1/api/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_without_bcrypt(client: TestClient, db_session, monkeypatch):
+    first = login(client)
+
+    async def no_bcrypt(*args):
+        raise AssertionError("/refresh must not check a password")
+    monkeypatch.setattr(password_pool, "verify", no_bcrypt)
+
+    response = refresh(client, first["refresh_token"])
+    assert response.status_code == 200
+    second = response.json()
+    assert second["user"]["roll_number"] == "student"
+    assert second["access_token"]
+    assert second["refresh_token"] != first["refresh_token"]
+
+    # The new access token works on its own.
+    del client.app.dependency_overrides[get_current_user]
+    me = client.get("/v1/api/me/courses", headers={"Authorization": f"Bearer {second['access_token']}"})
+    assert me.status_code == 200
+
+    rows = db_session.query(RefreshToken).all()
+    assert len(rows) == 2
+    assert len({row.family_id for row in rows}) == 1
+    assert first["refresh_token"] not in {row.token_hash for row in rows}
+
+
+def test_reusing_a_rotated_token_revokes_the_family(client: TestClient, db_session, monkeypatch):
+    first = login(client)
+    second = refresh(client, first["refresh_token"]).json()
+
+    monkeypatch.setattr(refresh_tokens.settings, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", 0.0)
+    assert refresh(client, first["refresh_token"]).status_code == 401
+    # The legitimate holder is logged out too.
+    assert refresh(client, second["refresh_token"]).status_code == 401
+    assert all(row.revoked_at is not None for row in db_session.query(RefreshToken).all())
+
+
+def test_concurrent_rotation_within_grace_period(client: TestClient):
+    first = login(client)
+    one = refresh(client, first["refresh_token"])
+    other = refresh(client, first["refresh_token"])
+
+    assert one.status_code == other.status_code == 200
+    assert refresh(client, one.json()["refresh_token"]).status_code == 200
+    assert refresh(client, other.json()["refresh_token"]).status_code == 200
+
+
+def test_logout_revokes_refresh_token(client: TestClient):
+    tokens = login(client)
+    assert client.post("/v1/api/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+
+
+def test_expired_or_unknown_refresh_token(client: TestClient, db_session):
+    assert refresh(client, "not-a-token").status_code == 401
+
+    tokens = login(client)
+    row = db_session.query(RefreshToken).one()
+    row.expires_at -= timedelta(days=365)
+    db_session.commit()
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+
+
+def test_password_change_retires_refresh_tokens(client: TestClient, db_session, test_student):
+    tokens = login(client)
+    test_student.password = get_password_hash("new password")
+    db_session.commit()
+
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
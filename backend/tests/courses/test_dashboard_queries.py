@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.announcements.models import CourseAnnouncement, CourseAnnouncementAttachment
+from src.courses.models import Course
+from src.tasks.models import Task, TaskAttachment, Submission, SubmissionAttachment, TaskStatus, Grade
+from src.query_stats import track_queries
+
+NOW = datetime(2024, 9, 2, 9, 0)
+
+
+def build_course(db_session, test_student: User, test_teacher: User, tasks: int) -> Course:
+    classmates = [User(roll_number=f"classmate{i}", name=f"Classmate {i}", role=UserRole.STUDENT) for i in range(3)]
+    course = Course(id="MAT-10-A", name="Maths", class_name="10-A", homeroom_teacher_id=test_teacher.roll_number)
+    course.students.extend([test_student, *classmates])
+    course.teachers.append(test_teacher)
+    db_session.add(course)
+    for i in range(2):
+        announcement = CourseAnnouncement(
+            id=f"ANC-{i}", title=f"Notice {i}", description="", created_at=NOW, course_id=course.id, author_id=test_teacher.roll_number,
+        )
+        announcement.attachments.append(CourseAnnouncementAttachment(file_path=f"uploads/notice{i}.pdf"))
+        db_session.add(announcement)
+    for i in range(tasks):
+        task = Task(
+            id=f"TSK-{i:02d}", title=f"Task {i}", description="", course_id=course.id, author_id=test_teacher.roll_number,
+            created_at=NOW, deadline=NOW + timedelta(days=i),
+        )
+        task.attachments.append(TaskAttachment(file_path=f"uploads/task{i}.pdf"))
+        db_session.add(task)
+        # The student's own submissions cycle through every status; a classmate submitted everything.
+        status = [None, TaskStatus.SUBMITTED, TaskStatus.APPROVED, TaskStatus.PENDING][i % 4]
+        if status is not None:
+            submission = Submission(
+                task_id=task.id, student_id=test_student.roll_number, submitted_at=NOW, status=status,
+                grade=Grade.A if status == TaskStatus.APPROVED else None, remarks="Good" if status == TaskStatus.APPROVED else None,
+                rejection_reason="Redo" if status == TaskStatus.PENDING else None,
+            )
+            submission.attachments.append(SubmissionAttachment(file_path=f"uploads/answer{i}.pdf"))
+            db_session.add(submission)
+        db_session.add(Submission(task_id=task.id, student_id="classmate0", submitted_at=NOW, status=TaskStatus.SUBMITTED))
+    db_session.commit()
+    return course
+
+
+def dashboard_queries(client: TestClient, user: User) -> tuple[int, dict]:
+    app.dependency_overrides[get_current_user] = lambda: user
+    with track_queries() as stats:
+        response = client.get("/v1/api/me/MAT-10-A/dashboard")
+    assert response.status_code == 200
+    return stats.count, response.json()
+
+
+@pytest.mark.parametrize("role", ["student", "teacher"])
+def test_dashboard_query_count_does_not_grow_with_tasks(client: TestClient, db_session, test_student, test_teacher, role):
+    user = test_student if role == "student" else test_teacher
+    build_course(db_session, test_student, test_teacher, tasks=2)
+    few, _ = dashboard_queries(client, user)
+
+    db_session.add_all(
+        Task(id=f"TSK-{i:02d}", title=f"Task {i}", description="", course_id="MAT-10-A", author_id="teacher", created_at=NOW, deadline=NOW)
+        for i in range(2, 30)
+    )
+    db_session.commit()
+    many, large = dashboard_queries(client, user)
+
+    assert len(large["tasks"]) == 30
+    assert many == few
+
+
+def test_student_dashboard_shows_own_submissions(client: TestClient, db_session, test_student, test_teacher):
+    build_course(db_session, test_student, test_teacher, tasks=4)
+    _, dashboard = dashboard_queries(client, test_student)
+
+    by_id = {task["task_id"]: task for task in dashboard["tasks"]}
+    assert by_id["TSK-00"]["status"] == "PENDING" and by_id["TSK-00"]["submission_attachments"] == []
+    assert by_id["TSK-01"]["status"] == "SUBMITTED" and by_id["TSK-01"]["submission_attachments"] == ["answer1.pdf"]
+    assert by_id["TSK-02"]["grade"] == "A" and by_id["TSK-02"]["remarks"] == "Good"
+    assert by_id["TSK-03"]["rejection_reason"] == "Redo"
+    assert all("submissions" not in task for task in dashboard["tasks"])
+
+
+def test_teacher_task_details_list_every_student(client: TestClient, db_session, test_student, test_teacher):
+    build_course(db_session, test_student, test_teacher, tasks=2)
+
+    _, dashboard = dashboard_queries(client, test_teacher)
+    assert all(task["status"] is None for task in dashboard["tasks"])
+
+    response = client.get("/v1/api/MAT-10-A/tasks/TSK-01")
+    submissions = {row["student_roll_number"]: row["status"] for row in response.json()["submissions"]}
+    assert submissions == {"student": "SUBMITTED", "classmate0": "SUBMITTED", "classmate1": "PENDING", "classmate2": "PENDING"}
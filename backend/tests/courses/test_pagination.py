@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.config import settings
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.announcements.models import CourseAnnouncement, SchoolAnnouncement
+from src.courses.models import Course
+from src.tasks.models import Task
+
+NOW = datetime(2024, 9, 2, 9, 0)
+
+
+@pytest.fixture()
+def course(db_session, test_student: User, test_teacher: User) -> Course:
+    course = Course(id="MAT-10-A", name="Maths", class_name="10-A", homeroom_teacher_id=test_teacher.roll_number)
+    course.students.extend([test_student, *(User(roll_number=f"s{i:02d}", name=f"Student {i}", role=UserRole.STUDENT) for i in range(6))])
+    course.teachers.append(test_teacher)
+    db_session.add(course)
+    # Several rows share a timestamp, so the id has to break ties.
+    for i in range(7):
+        db_session.add(Task(
+            id=f"TSK-{i:02d}", title=f"Task {i}", description="", course_id=course.id, author_id=test_teacher.roll_number,
+            created_at=NOW - timedelta(days=i // 3), deadline=NOW,
+        ))
+    for i in range(3):
+        db_session.add(CourseAnnouncement(
+            id=f"ANC-{i}", title=f"Notice {i}", description="", course_id=course.id, author_id=test_teacher.roll_number,
+            created_at=NOW,
+        ))
+    for i in range(5):
+        db_session.add(SchoolAnnouncement(
+            id=f"SCH-{i}", title=f"School {i}", description="", author_id=test_teacher.roll_number, created_at=NOW - timedelta(days=i % 2),
+        ))
+    db_session.commit()
+    return course
+
+
+def as_user(user: User):
+    app.dependency_overrides[get_current_user] = lambda: user
+
+
+def walk(client: TestClient, url: str, limit: int) -> list[dict]:
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_unpaginated_requests_keep_the_legacy_shape(client: TestClient, course, test_teacher):
+    as_user(test_teacher)
+
+    dashboard = client.get("/v1/api/me/MAT-10-A/dashboard").json()
+    assert set(dashboard) == {"announcements", "tasks"}
+    assert len(dashboard["tasks"]) == 7 and len(dashboard["announcements"]) == 3
+
+    school = client.get("/v1/api/me/school-announcements").json()
+    assert isinstance(school, list) and len(school) == 5
+
+    assert client.get("/v1/api/10-A/students").json().keys() == {"students"}
+
+
+def test_dashboard_pages_cover_every_item_once(client: TestClient, course, test_student):
+    as_user(test_student)
+    pages = walk(client, "/v1/api/me/MAT-10-A/dashboard", limit=2)
+
+    tasks = [task["task_id"] for page in pages for task in page["tasks"]]
+    announcements = [ann["announcement_id"] for page in pages for ann in page["announcements"]]
+    assert len(pages) == 4
+    assert tasks == ["TSK-02", "TSK-01", "TSK-00", "TSK-05", "TSK-04", "TSK-03", "TSK-06"]
+    assert sorted(announcements) == ["ANC-0", "ANC-1", "ANC-2"] and len(announcements) == 3
+    # Announcements ran out on the second page; later pages only carry tasks.
+    assert pages[2]["announcements"] == [] and pages[3]["announcements"] == []
+
+
+def test_school_announcements_pages(client: TestClient, course, test_student):
+    as_user(test_student)
+    pages = walk(client, "/v1/api/me/school-announcements", limit=2)
+
+    ids = [ann["announcement_id"] for page in pages for ann in page["announcements"]]
+    assert ids == ["SCH-4", "SCH-2", "SCH-0", "SCH-3", "SCH-1"]
+
+
+def test_roster_pages_by_roll_number(client: TestClient, course, test_teacher):
+    as_user(test_teacher)
+    pages = walk(client, "/v1/api/10-A/students", limit=3)
+
+    roll_numbers = [student["roll_number"] for page in pages for student in page["students"]]
+    assert roll_numbers == ["s00", "s01", "s02", "s03", "s04", "s05", "student"]
+    assert [len(page["students"]) for page in pages] == [3, 3, 1]
+
+
+def test_limit_is_capped(client: TestClient, course, test_student, monkeypatch):
+    monkeypatch.setattr(settings, "PAGINATION_MAX_LIMIT", 4)
+    as_user(test_student)
+
+    page = client.get("/v1/api/me/MAT-10-A/dashboard", params={"limit": 1000}).json()
+    assert len(page["tasks"]) == 4 and page["next_cursor"] is not None
+    assert client.get("/v1/api/me/MAT-10-A/dashboard", params={"limit": 0}).status_code == 422
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WzFd", "eyJ0YXNrcyI6WzFdfQ"])
+def test_invalid_cursor_is_rejected(client: TestClient, course, test_student, cursor):
+    as_user(test_student)
+    response = client.get("/v1/api/me/MAT-10-A/dashboard", params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from fastapi import Request
+from jose import jwt
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import settings
+from src.database import configure_sqlite_engine, sqlite_pragmas, engine_options, to_async_url, SessionRouter
+
+
+@pytest.mark.sqlite_only
+def test_sqlite_production_profile_applied_on_connect(tmp_path):
+    engine = configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'profile.db'}"))
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == sqlite_pragmas()["busy_timeout"]
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == sqlite_pragmas()["cache_size"]
+        assert conn.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+    engine.dispose()
+
+
+@pytest.mark.sqlite_only
+def test_sqlite_production_profile_applied_to_async_engine(tmp_path):
+    engine = configure_sqlite_engine(create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}"))
+
+    async def read_pragmas():
+        async with engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        await engine.dispose()
+        return journal_mode, busy_timeout
+
+    assert asyncio.run(read_pragmas()) == ("wal", sqlite_pragmas()["busy_timeout"])
+
+
+def test_async_url_derived_from_database_url():
+    assert to_async_url("sqlite:///./school.db") == "sqlite+aiosqlite:///./school.db"
+    assert to_async_url("postgresql+psycopg2://u:secret@db/taskwise") == "postgresql+asyncpg://u:secret@db/taskwise"
+    assert to_async_url("postgresql+psycopg://u:secret@db/taskwise") == "postgresql+psycopg://u:secret@db/taskwise"
+
+
+def test_postgres_engine_options_set_pre_ping_and_statement_timeout():
+    sync_options = engine_options("postgresql+psycopg://u:p@db/taskwise")
+    assert sync_options["pool_pre_ping"] is True
+    assert sync_options["pool_size"] == settings.DB_POOL_SIZE
+    assert sync_options["connect_args"] == {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+
+    async_options = engine_options("postgresql+asyncpg://u:p@db/taskwise", is_async=True)
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+
+
+def make_request(method: str, roll_number: str, issued: int = 0) -> Request:
+    token = jwt.encode({"sub": roll_number, "iat": issued}, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
+    return Request({
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1234),
+    })
+
+
+def test_session_router_sends_reads_to_replica_and_sticks_after_write(tmp_path):
+    primary = sessionmaker(bind=configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'primary.db'}")))
+    replica = sessionmaker(bind=configure_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'replica.db'}")))
+    for factory in (primary, replica):
+        with factory() as db:
+            db.execute(text("CREATE TABLE submissions (id INTEGER PRIMARY KEY)"))
+            db.commit()
+    router = SessionRouter(primary, [replica], sticky_seconds=60)
+
+    # A mutating request (e.g. submit_task) writes to the primary; the replica has not caught up.
+    assert router.for_request(make_request("POST", "s001")) is primary
+    with primary() as db:
+        db.execute(text("INSERT INTO submissions (id) VALUES (1)"))
+        db.commit()
+
+    def count(factory):
+        with factory() as db:
+            return db.execute(text("SELECT count(*) FROM submissions")).scalar()
+
+    # The writer reads its own submission from the primary, everyone else reads the replica.
+    assert count(router.for_request(make_request("GET", "s001"))) == 1
+    assert count(router.for_request(make_request("GET", "s002"))) == 0
+
+    router.sticky_seconds = 0
+    assert router.for_request(make_request("GET", "s001")) is replica
+
+
+def test_session_router_without_replicas_uses_primary():
+    router = SessionRouter("primary")
+    assert router.for_request(make_request("GET", "s001")) == "primary"
+    assert router.for_request(make_request("DELETE", "s001")) == "primary"
+
+
+def test_session_router_stickiness_survives_a_token_refresh():
+    router = SessionRouter("primary", ["replica"], sticky_seconds=60)
+
+    router.for_request(make_request("POST", "s001", issued=1))
+    # /refresh handed the client a new access token for the same user.
+    assert make_request("GET", "s001", issued=2).headers["authorization"] != make_request("GET", "s001", issued=1).headers["authorization"]
+    assert router.for_request(make_request("GET", "s001", issued=2)) == "primary"
+    assert router.for_request(make_request("GET", "s002")) == "replica"
@@ -0,0 +1,159 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, select, text
+
+from src.database import Base
+from src.migrations import MIGRATIONS, applied_versions, run_migrations
+from src.announcements.models import CourseAnnouncement, SchoolAnnouncement
+from src.attendance.models import Attendance, TeacherAttendance, RecoveryCode
+from src.auth.models import User
+from src.courses.models import Course, student_course_association
+from src.pagination import newest_first
+from src.schedules.models import Schedule, DayOfWeek
+from src.tasks.models import Submission, Task
+
+TODAY = date(2024, 9, 2)
+AFTER = ["2024-09-02T09:00:00", "TSK-1"]
+ROSTER = student_course_association.c
+
+HOT_QUERIES = [
+    (select(Submission).filter_by(task_id="TSK-1", student_id="student1"), "ix_submissions_task_id_student_id"),
+    (select(Submission).filter(Submission.task_id == "TSK-1"), "ix_submissions_task_id_student_id"),
+    (select(Attendance).filter_by(class_code="10-A", date=TODAY), "ix_attendance_class_code_date"),
+    (select(Attendance).filter(Attendance.student_roll_number == "student1"), "ix_attendance_student_roll_number_date"),
+    (select(TeacherAttendance).filter_by(teacher_roll_number="teacher1", date=TODAY), "ix_teacher_attendance_teacher_roll_number_date"),
+    (
+        select(TeacherAttendance).filter(
+            TeacherAttendance.teacher_roll_number == "teacher1",
+            TeacherAttendance.date >= date(2024, 9, 1),
+            TeacherAttendance.date < date(2024, 10, 1),
+        ),
+        "ix_teacher_attendance_teacher_roll_number_date",
+    ),
+    (
+        select(Schedule).filter_by(class_id="10-A", day_of_week=DayOfWeek.MONDAY).order_by(Schedule.period),
+        "ix_schedules_class_id_day_of_week_period",
+    ),
+    (
+        select(RecoveryCode).filter_by(user_roll_number="teacher1", lookup_key="0123456789abcdef", is_used=False),
+        "ix_recovery_codes_user_roll_number_lookup_key",
+    ),
+    (select(Course).filter(Course.class_name == "10-A"), "ix_courses_class_name"),
+    (select(Course.id).filter(Course.homeroom_teacher_id == "teacher1"), "ix_courses_homeroom_teacher_id"),
+    (
+        select(CourseAnnouncement).filter(CourseAnnouncement.course_id == "MAT-10-A").order_by(CourseAnnouncement.created_at),
+        "ix_course_announcements_course_id_created_at_id",
+    ),
+    (
+        newest_first(select(Task).filter(Task.course_id == "MAT-10-A"), Task, AFTER).limit(51),
+        "ix_tasks_course_id_created_at_id",
+    ),
+    (
+        newest_first(select(CourseAnnouncement).filter(CourseAnnouncement.course_id == "MAT-10-A"), CourseAnnouncement, AFTER).limit(51),
+        "ix_course_announcements_course_id_created_at_id",
+    ),
+    (newest_first(select(SchoolAnnouncement), SchoolAnnouncement, AFTER).limit(51), "ix_school_announcements_created_at_id"),
+    (
+        select(User)
+        .join(student_course_association, ROSTER.student_roll_number == User.roll_number)
+        .filter(ROSTER.course_id == "MAT-10-A", ROSTER.student_roll_number > "student1")
+        .order_by(ROSTER.student_roll_number)
+        .limit(51),
+        "ix_student_course_association_course_id_student_roll_number",
+    ),
+]
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indexes.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def query_plan(engine, statement) -> list[str]:
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.mark.sqlite_only
+@pytest.mark.parametrize("statement, index_name", HOT_QUERIES)
+def test_hot_query_uses_index(engine, statement, index_name):
+    plan = query_plan(engine, statement)
+
+    assert any(f"INDEX {index_name}" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_migrations_add_indexes_to_existing_database(engine):
+    # A school.db created before the indexes existed.
+    with engine.begin() as conn:
+        for _, index_name in HOT_QUERIES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+    assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+
+    inspector = inspect(engine)
+    existing = {index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+    assert {index_name for _, index_name in HOT_QUERIES} <= existing
+    assert applied_versions(engine) == {version for version, _, _ in MIGRATIONS}
+    assert run_migrations(engine) == []
+
+
+def test_migrations_drop_superseded_indexes(engine):
+    # A database that already has the (course_id, created_at) index from the first migration.
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_course_announcements_course_id_created_at ON course_announcements (course_id, created_at)"))
+
+    run_migrations(engine)
+
+    names = {index["name"] for index in inspect(engine).get_indexes("course_announcements")}
+    assert "ix_course_announcements_course_id_created_at" not in names
+    assert "ix_course_announcements_course_id_created_at_id" in names
+
+
+def test_migrations_on_fresh_database_only_record_versions(engine):
+    assert run_migrations(engine) == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+
+
+def test_migrations_add_claims_version_to_existing_users(engine):
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN claims_version"))
+        conn.execute(text("INSERT INTO users (roll_number, name) VALUES ('old', 'Old User')"))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT claims_version FROM users WHERE roll_number = 'old'")).scalar() == 0
+
+
+def test_migrations_add_recovery_code_lookup_key(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_recovery_codes_user_roll_number_lookup_key"))
+        conn.execute(text("ALTER TABLE recovery_codes DROP COLUMN lookup_key"))
+        conn.execute(text("INSERT INTO recovery_codes (user_roll_number, code_hash, is_used) VALUES ('teacher1', 'hash', 0)"))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT lookup_key FROM recovery_codes")).scalar() is None
+
+
+def test_migrations_name_legacy_attachments(engine):
+    # task_attachments as it was before the blob store: only a path per attachment.
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE task_attachments"))
+        conn.execute(text("CREATE TABLE task_attachments (id INTEGER PRIMARY KEY, task_id VARCHAR, file_path VARCHAR)"))
+        conn.execute(text("INSERT INTO task_attachments (task_id, file_path) VALUES ('TSK-1', 'uploads/courses/C/tasks/TSK-1/attachments/brief.pdf')"))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT file_name, blob_sha256 FROM task_attachments")).one()
+    assert tuple(row) == ("brief.pdf", None)
+    assert "ix_task_attachments_blob_sha256" in {index["name"] for index in inspect(engine).get_indexes("task_attachments")}
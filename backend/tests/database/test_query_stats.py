@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.config import settings
+from src.courses.models import Course
+from src.tasks.models import Task
+from src.query_stats import NPlusOneQueryError, QueryStatsMiddleware, check_n_plus_one, track_queries
+
+
+@pytest.fixture()
+def course_with_tasks(db_session, test_student, test_teacher):
+    course = Course(id="TEST-101", name="Test Course", class_name="10-A", homeroom_teacher_id=test_teacher.roll_number)
+    course.students.append(db_session.merge(test_student))
+    db_session.add(course)
+    db_session.add_all([
+        Task(
+            id=f"TSK-0{i}", title=f"Task {i}", description="", course_id=course.id, author_id=test_teacher.roll_number,
+            created_at=datetime.now(), deadline=datetime.now() + timedelta(days=1),
+        )
+        for i in range(5)
+    ])
+    db_session.commit()
+    return course
+
+
+def test_track_queries_counts_statements(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    with track_queries() as stats:
+        with engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :i"), {"i": i})
+            conn.execute(text("SELECT 2 + 2"))
+
+    assert stats.count == 4
+    assert stats.total_seconds >= stats.slowest_seconds > 0
+    assert stats.most_repeated() == ("SELECT ?", 3)
+    engine.dispose()
+
+
+def test_query_stats_headers_in_debug_mode(client: TestClient, course_with_tasks, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+    response = client.get(f"/v1/api/me/{course_with_tasks.id}/dashboard")
+
+    assert response.status_code == 200
+    assert int(response.headers["x-db-query-count"]) > 0
+    assert float(response.headers["x-db-query-time-ms"]) >= float(response.headers["x-db-slowest-query-ms"])
+
+
+def test_query_stats_logged_without_headers_in_production(client: TestClient, course_with_tasks, caplog):
+    with caplog.at_level(logging.INFO, logger="taskwise.sql"):
+        response = client.get(f"/v1/api/me/{course_with_tasks.id}/dashboard")
+
+    assert "x-db-query-count" not in response.headers
+    record = next(r for r in caplog.records if r.name == "taskwise.sql")
+    assert record.path == f"/v1/api/me/{course_with_tasks.id}/dashboard"
+    assert record.query_count > 0
+    assert record.slowest_query
+
+
+def test_repeated_statements_fail_in_test_mode(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'n_plus_one.db'}")
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/tasks")
+    def one_query_per_task():
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT :task_id"), {"task_id": i}).scalar() for i in range(5)]
+
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 2)
+    with pytest.raises(NPlusOneQueryError, match="ran 5 times"):
+        TestClient(app).get("/tasks")
+    engine.dispose()
+
+
+def test_repeated_statements_only_logged_outside_test_mode(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_RAISE", False)
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 2)
+    with track_queries() as stats:
+        for _ in range(3):
+            stats.record("SELECT * FROM submissions WHERE task_id = ?", 0.001)
+
+    check_n_plus_one(stats, "GET /test")
+    assert "N+1 queries in GET /test" in caplog.text
@@ -0,0 +1,41 @@
+from datetime import date
+
+from sqlalchemy import func, select
+
+from src.database import create_db_engine
+from src.tasks.models import Submission
+from benchmarks.loadtest.generator import SchoolSize, generate_school, school_days
+from benchmarks.loadtest.runner import percentile
+from benchmarks.loadtest.scenarios import School, SCENARIOS
+
+
+def test_generated_school_scales_with_parameters(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'school.db'}")
+    size = SchoolSize(classes=3, students_per_class=4, subjects=2, tasks_per_course=3, submission_rate=1.0, attendance_years=0.1)
+
+    counts = generate_school(engine, size)
+
+    assert counts["users"] == 2 + size.teachers + 12
+    assert counts["courses"] == 6
+    assert counts["tasks"] == 18
+    assert counts["submissions"] == 6 * 2 * 4  # every closed task, every student
+    assert counts["attendance"] == 12 * len(school_days(size.attendance_years, date.today()))
+
+    school = School.load(engine)
+    assert sorted(school.students) == ["1-A", "1-B", "1-C"]
+    with engine.connect() as conn:
+        open_submissions = conn.execute(
+            select(func.count()).select_from(Submission).where(Submission.task_id.in_(school.open_task.values()))
+        ).scalar()
+    assert open_submissions == 0
+    assert len(SCENARIOS["dashboard_storm"](school)) == 12
+    assert len(SCENARIOS["homeroom_attendance"](school)) == 3
+    engine.dispose()
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 50) == 0.0
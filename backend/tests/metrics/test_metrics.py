@@ -0,0 +1,101 @@
+import gc
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.metrics import registry
+from src.metrics.registry import Counter, Histogram, REGISTRY
+
+
+@pytest.fixture()
+def test_admin(db_session):
+    admin = User(roll_number="admin", password="", role=UserRole.ADMIN, name="Test Admin")
+    db_session.add(admin)
+    db_session.commit()
+    return admin
+
+
+@pytest.fixture()
+def scratch_metrics():
+    registered = list(REGISTRY)
+    yield
+    REGISTRY[:] = registered
+
+
+def test_counter_sums_increments_from_all_threads(scratch_metrics):
+    counter = Counter("test_events_total", "Test events.", ("kind",))
+
+    def work():
+        for _ in range(10_000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.collect() == {("a",): 80_000}
+    assert 'test_events_total{kind="a"} 80000.0' in counter.render()
+
+
+def test_shards_of_exited_threads_are_folded_into_the_retired_totals(scratch_metrics):
+    counter = Counter("test_jobs_total", "Test jobs.")
+    histogram = Histogram("test_job_seconds", "Test job time.", buckets=(1.0,))
+    shards_before = len(registry._shards)
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(20):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(registry._shards) == shards_before
+    assert counter.collect() == {(): 20}
+    assert histogram.collect() == {(): [20, 0, 10.0, 20]}
+
+
+def test_histogram_renders_cumulative_buckets(scratch_metrics):
+    histogram = Histogram("test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route="/{course_id}")
+
+    assert histogram.render()[2:] == [
+        'test_latency_seconds_bucket{route="/{course_id}",le="0.1"} 2',
+        'test_latency_seconds_bucket{route="/{course_id}",le="1.0"} 3',
+        'test_latency_seconds_bucket{route="/{course_id}",le="+Inf"} 4',
+        'test_latency_seconds_sum{route="/{course_id}"} 3.65',
+        'test_latency_seconds_count{route="/{course_id}"} 4',
+    ]
+
+
+def test_metrics_endpoint_is_admin_only(client: TestClient):
+    response = client.get("/v1/api/metrics")
+    assert response.status_code == 403
+
+
+def test_metrics_endpoint_reports_routes_by_template(client: TestClient, test_admin: User):
+    client.post("/v1/api/login", data={"username": "student", "password": "password"})
+    client.get("/v1/api/TEST-101/tasks/TSK-01")
+    client.post("/v1/api/TEST-101/tasks/TSK-01/upload", files=[("files", ("essay.txt", b"x" * 1000, "text/plain"))])
+
+    app.dependency_overrides[get_current_user] = lambda: test_admin
+    response = client.get("/v1/api/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/{course_id}/tasks/{task_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/{course_id}/tasks/{task_id}",le="+Inf"}' in body
+    assert 'http_upload_bytes_total{route="/{course_id}/tasks/{task_id}/upload"}' in body
+    assert 'http_requests_in_progress{method="GET"} 1.0' in body
+    assert "db_pool_checkout_wait_seconds_count" in body
+    assert "bcrypt_verify_seconds_count" in body
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.courses.models import Course
+from src.tasks.models import Grade, Submission, Task, TaskStatus
+from src.config import settings
+
+URL = "/v1/api/ENG-10-A/tasks/TSK-ESSAY/submissions/grades"
+
+
+@pytest.fixture
+def essays(client: TestClient, db_session, test_teacher):
+    db_session.add(Course(id="ENG-10-A", name="English", class_name="10-A"))
+    db_session.add(Task(id="TSK-ESSAY", title="Essay", course_id="ENG-10-A", created_at=datetime.now(), deadline=datetime.now() + timedelta(days=1)))
+    for i in range(40):
+        db_session.add(User(roll_number=f"s{i:02d}", name=f"Student {i}", role=UserRole.STUDENT))
+        db_session.add(Submission(task_id="TSK-ESSAY", student_id=f"s{i:02d}", submitted_at=datetime.now(), status=TaskStatus.SUBMITTED))
+    db_session.commit()
+    app.dependency_overrides[get_current_user] = lambda: test_teacher
+
+
+def submissions(db_session) -> dict:
+    db_session.expire_all()
+    return {s.student_id: s for s in db_session.scalars(select(Submission).filter_by(task_id="TSK-ESSAY"))}
+
+
+def test_grades_a_whole_class_in_one_transaction(client: TestClient, db_session, essays, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)  # query count headers
+    decisions = [{"student_roll_number": f"s{i:02d}", "action": "approve", "grade": "A", "remarks": f"Well argued {i}"} for i in range(39)]
+    decisions += [
+        {"student_roll_number": "s39", "action": "reject", "reason": "Over the word limit"},
+        {"student_roll_number": "absent", "action": "approve", "grade": "B"},
+    ]
+
+    response = client.put(URL, json={"decisions": decisions})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["updated"] == 40
+    assert body["results"][0] == {"student_roll_number": "s00", "result": "approved", "new_status": "APPROVED"}
+    assert body["results"][-2:] == [
+        {"student_roll_number": "s39", "result": "rejected", "new_status": "PENDING"},
+        {"student_roll_number": "absent", "result": "not_found", "new_status": None},
+    ]
+    # The teacher, the task, the submissions, one executemany each for approvals and rejections,
+    # and the task's status counts.
+    assert int(response.headers["x-db-query-count"]) == 6
+
+    graded = submissions(db_session)
+    assert (graded["s07"].status, graded["s07"].grade, graded["s07"].remarks) == (TaskStatus.APPROVED, Grade.A, "Well argued 7")
+    assert (graded["s39"].status, graded["s39"].rejection_reason) == (TaskStatus.PENDING, "Over the word limit")
+
+
+@pytest.mark.parametrize("decisions", [
+    [{"student_roll_number": "s00", "action": "approve", "grade": "A"}, {"student_roll_number": "s01", "action": "approve"}],
+    [{"student_roll_number": "s00", "action": "reject"}],
+    [{"student_roll_number": "s00", "action": "approve", "grade": "A"}, {"student_roll_number": "s00", "action": "reject", "reason": "No"}],
+    [],
+])
+def test_invalid_batches_change_nothing(client: TestClient, db_session, essays, decisions):
+    response = client.put(URL, json={"decisions": decisions})
+
+    assert response.status_code == 422
+    assert {submission.status for submission in submissions(db_session).values()} == {TaskStatus.SUBMITTED}
+
+
+def test_task_must_belong_to_the_course(client: TestClient, db_session, essays):
+    response = client.put("/v1/api/ENG-10-B/tasks/TSK-ESSAY/submissions/grades", json={"decisions": [
+        {"student_roll_number": "s00", "action": "approve", "grade": "A"},
+    ]})
+    assert response.status_code == 404
@@ -0,0 +1,99 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.config import settings
+from src.courses.models import Course
+from src.dependencies import get_uploads_dir
+from src.attachments.blobs import blob_path
+from src.tasks.models import Submission, SubmissionUpload, Task
+from src.tasks.uploads import STAGING_DIR_NAME
+
+VIDEO = os.urandom(250_000)
+
+
+@pytest.fixture
+def task(client: TestClient, db_session, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "RESUMABLE_UPLOAD_CHUNK_BYTES", 100_000)
+    db_session.add(Course(id="SCI-10-A", name="Science", class_name="10-A"))
+    db_session.add(Task(id="TSK-VID", title="Lab video", course_id="SCI-10-A", created_at=datetime.now(), deadline=datetime.now() + timedelta(days=1)))
+    db_session.commit()
+    app.dependency_overrides[get_uploads_dir] = lambda: tmp_path
+    yield "/v1/api/SCI-10-A/tasks/TSK-VID/uploads"
+    del app.dependency_overrides[get_uploads_dir]
+
+
+def put_chunk(client: TestClient, url: str, offset: int, data: bytes):
+    return client.put(url, content=data, headers={"Upload-Offset": str(offset), "Content-Type": "application/octet-stream"})
+
+
+def test_chunks_resume_after_a_lost_response_and_finalize_into_a_submission(client: TestClient, db_session, task, tmp_path: Path):
+    created = client.post(task, json={"file_name": "experiment.mp4", "size": len(VIDEO)})
+    assert created.status_code == 201, created.text
+    upload = created.json()
+    assert (upload["offset"], upload["complete"], upload["chunk_size"]) == (0, False, 100_000)
+    url = f"{task}/{upload['upload_id']}"
+
+    assert put_chunk(client, url, 0, VIDEO[:100_000]).json()["offset"] == 100_000
+    # The client never saw that answer and sends the chunk again: it learns where to carry on.
+    retry = put_chunk(client, url, 0, VIDEO[:100_000])
+    assert retry.status_code == 409
+    assert retry.headers["Upload-Offset"] == "100000"
+    assert client.get(url).json()["offset"] == 100_000
+
+    assert put_chunk(client, url, 100_000, VIDEO[100_000:200_000]).json()["offset"] == 200_000
+    finalize = client.post(f"{task}/finalize", json={"upload_ids": [upload["upload_id"]]})
+    assert finalize.status_code == 409
+    assert finalize.json()["detail"]["offset"] == 200_000
+
+    last = put_chunk(client, url, 200_000, VIDEO[200_000:])
+    assert last.json()["complete"] is True
+    finalize = client.post(f"{task}/finalize", json={"upload_ids": [upload["upload_id"]]})
+    assert finalize.status_code == 200, finalize.text
+    assert finalize.json()["new_status"] == "SUBMITTED"
+
+    submission = db_session.scalars(select(Submission).filter_by(task_id="TSK-VID")).one()
+    [attachment] = submission.attachments
+    assert attachment.file_name == "experiment.mp4"
+    assert blob_path(tmp_path, attachment.blob_sha256).read_bytes() == VIDEO
+    assert attachment.blob_sha256 == hashlib.sha256(VIDEO).hexdigest()
+    assert db_session.scalars(select(SubmissionUpload)).all() == []
+    assert list((tmp_path / STAGING_DIR_NAME).iterdir()) == []
+
+
+def test_chunk_limits_and_ownership(client: TestClient, db_session, task, test_teacher):
+    assert client.post(task, json={"file_name": "huge.mp4", "size": settings.UPLOAD_MAX_FILE_BYTES + 1}).status_code == 413
+    upload = client.post(task, json={"file_name": "notes.pdf", "size": 150_000}).json()
+    url = f"{task}/{upload['upload_id']}"
+
+    assert put_chunk(client, url, 0, b"x" * 100_001).status_code == 413  # over the chunk size
+    assert put_chunk(client, url, 0, b"x" * 100_000).status_code == 200
+    assert put_chunk(client, url, 100_000, b"x" * 50_001).status_code == 413  # past the declared size
+
+    app.dependency_overrides[get_current_user] = lambda: test_teacher
+    assert client.get(url).status_code == 404
+    assert client.post(f"{task}/finalize", json={"upload_ids": [upload["upload_id"]]}).status_code == 404
+
+
+def test_expired_uploads_are_purged_and_staging_is_bounded(client: TestClient, db_session, task, tmp_path: Path, monkeypatch):
+    stale = client.post(task, json={"file_name": "draft.pdf", "size": 10}).json()
+    put_chunk(client, f"{task}/{stale['upload_id']}", 0, b"0123456789")
+    db_session.query(SubmissionUpload).update({"expires_at": datetime.now() - timedelta(seconds=1)})
+    db_session.commit()
+    assert client.get(f"{task}/{stale['upload_id']}").status_code == 404
+
+    monkeypatch.setattr(settings, "RESUMABLE_UPLOAD_MAX_STAGED_BYTES", 1_000)
+    assert client.post(task, json={"file_name": "a.pdf", "size": 600}).status_code == 201
+    assert [upload.file_name for upload in db_session.scalars(select(SubmissionUpload))] == ["a.pdf"]
+    assert list((tmp_path / STAGING_DIR_NAME).iterdir()) == []
+
+    full = client.post(task, json={"file_name": "b.pdf", "size": 600})
+    assert full.status_code == 503
+    assert full.headers["Retry-After"] == "60"
@@ -0,0 +1,162 @@
+import io
+import os
+import threading
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.config import settings
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.courses.models import Course
+from src.dependencies import get_uploads_dir
+from src.tasks import archives
+from src.tasks.archives import archive_builder, purge_stale_archive_parts
+from src.tasks.models import Task, Submission, SubmissionAttachment
+
+NOW = datetime(2024, 9, 2, 9, 0)
+ARCHIVE = "/v1/api/MAT-10-A/tasks/TSK-1/submissions/archive"
+
+
+@pytest.fixture()
+def submissions(client: TestClient, db_session, test_student: User, test_teacher: User, tmp_path: Path):
+    classmate = User(roll_number="classmate", name="Classmate", role=UserRole.STUDENT)
+    course = Course(id="MAT-10-A", name="Maths", class_name="10-A")
+    course.students.extend([test_student, classmate])
+    course.teachers.append(test_teacher)
+    db_session.add(course)
+    db_session.add(Task(id="TSK-1", title="Essay", description="", course_id=course.id, author_id=test_teacher.roll_number, created_at=NOW, deadline=NOW))
+    files = {}
+    for student, names in ((test_student, ["essay.txt", "scan.png"]), (classmate, ["essay.txt"])):
+        submission = Submission(task_id="TSK-1", student_id=student.roll_number, submitted_at=NOW)
+        for name in names:
+            path = tmp_path / "submissions" / student.roll_number / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(f"{student.roll_number}:{name}\n".encode() * 1000)
+            submission.attachments.append(SubmissionAttachment(file_path=str(path)))
+            files[f"{student.roll_number}/{name}"] = path
+        db_session.add(submission)
+    db_session.commit()
+
+    app.dependency_overrides[get_current_user] = lambda: test_teacher
+    app.dependency_overrides[get_uploads_dir] = lambda: tmp_path
+    yield files
+    del app.dependency_overrides[get_uploads_dir]
+
+
+def archive_contents(content: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def wait_for_build():
+    for job in list(archive_builder._jobs.values()):
+        job.future.result(timeout=30)
+
+
+def test_small_archive_is_streamed_with_a_folder_per_student(client: TestClient, submissions):
+    response = client.get(ARCHIVE)
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == "attachment; filename=submissions_TSK-1.zip"
+    assert archive_contents(response.content) == {name: path.read_bytes() for name, path in submissions.items()}
+
+
+def test_large_archive_is_built_in_background_and_cached(client: TestClient, submissions, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(settings, "SUBMISSION_ARCHIVE_STREAM_MAX_BYTES", 0)
+
+    assert client.get(f"{ARCHIVE}/status").json()["status"] == "not_started"
+    started = client.get(ARCHIVE)
+    assert started.status_code == 202
+    assert started.json()["files_total"] == 3
+    wait_for_build()
+
+    status = client.get(f"{ARCHIVE}/status").json()
+    assert status["status"] == "ready" and status["progress"] == 1.0
+    response = client.get(ARCHIVE)
+    assert response.status_code == 200
+    assert archive_contents(response.content) == {name: path.read_bytes() for name, path in submissions.items()}
+
+    partial = client.get(ARCHIVE, headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.content == response.content[:10]
+
+    # A changed submission makes a new archive, which replaces the old one.
+    submissions["student/essay.txt"].write_bytes(b"second draft")
+    assert client.get(ARCHIVE).status_code == 202
+    wait_for_build()
+    rebuilt = client.get(ARCHIVE)
+    assert archive_contents(rebuilt.content)["student/essay.txt"] == b"second draft"
+    assert len(list((tmp_path / "archives" / "tasks" / "TSK-1").iterdir())) == 1
+
+
+def test_failed_build_is_reported_until_the_retry_window_passes(client: TestClient, submissions, monkeypatch):
+    monkeypatch.setattr(settings, "SUBMISSION_ARCHIVE_STREAM_MAX_BYTES", 0)
+    monkeypatch.setattr(archive_builder, "_jobs", {})
+    builds = []
+
+    def broken_zip(files):
+        builds.append(1)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archives, "stream_zip", broken_zip)
+    assert client.get(ARCHIVE).status_code == 202
+    with pytest.raises(OSError):
+        wait_for_build()
+
+    for _ in range(3):
+        response = client.get(ARCHIVE)
+        assert response.status_code == 503
+        assert response.json()["status"] == "failed"
+        assert int(response.headers["retry-after"]) >= 1
+    assert client.get(f"{ARCHIVE}/status").json()["status"] == "failed"
+    assert len(builds) == 1
+
+    monkeypatch.setattr(settings, "SUBMISSION_ARCHIVE_RETRY_SECONDS", 0)
+    monkeypatch.setattr(archives, "stream_zip", lambda files: iter([b""]))
+    assert client.get(ARCHIVE).status_code == 202
+    wait_for_build()
+
+
+def test_startup_purges_partial_archives_of_dead_builds(tmp_path: Path):
+    task_dir = tmp_path / "archives" / "tasks" / "TSK-1"
+    task_dir.mkdir(parents=True)
+    stale = task_dir / "abc.zip.1.part"
+    in_progress = task_dir / "abc.zip.2.part"
+    finished = task_dir / "abc.zip"
+    for path in (stale, in_progress, finished):
+        path.write_bytes(b"zip")
+    day_ago = time.time() - 25 * 3600
+    os.utime(stale, (day_ago, day_ago))
+    os.utime(finished, (day_ago, day_ago))
+
+    assert purge_stale_archive_parts(tmp_path) == 1
+    assert sorted(task_dir.iterdir()) == [finished, in_progress]
+    assert purge_stale_archive_parts(tmp_path / "elsewhere") == 0
+
+
+def test_attachment_files_are_statted_off_the_event_loop(client: TestClient, submissions, monkeypatch):
+    stat_threads = []
+    stat_entries = archives._stat_entries
+
+    def recording_stat_entries(files):
+        stat_threads.append(threading.current_thread().name)
+        return stat_entries(files)
+
+    monkeypatch.setattr(archives, "_stat_entries", recording_stat_entries)
+    assert client.get(f"{ARCHIVE}/status").status_code == 200
+    assert client.get(ARCHIVE).status_code == 200
+
+    assert len(stat_threads) == 2
+    assert all(name.startswith("attachment-io") for name in stat_threads)
+
+
+def test_archive_requires_a_teacher_and_the_right_course(client: TestClient, submissions, test_student):
+    assert client.get("/v1/api/SCI-10-A/tasks/TSK-1/submissions/archive").status_code == 404
+    app.dependency_overrides[get_current_user] = lambda: test_student
+    assert client.get(ARCHIVE).status_code == 403
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+from src.main import app
+from src.auth.dependencies import get_current_user
+from src.auth.models import User, UserRole
+from src.courses.models import Course
+from src.dependencies import get_uploads_dir
+from src.tasks import counters, service
+from src.tasks.models import Grade, Submission, Task, TaskStatus, TaskSubmissionCounts
+from tests.conftest import TestingAsyncSessionLocal
+
+TASK = "/v1/api/BIO-10-A/tasks/TSK-CELL"
+
+
+@pytest.fixture
+def students(client: TestClient, db_session, test_teacher, tmp_path: Path):
+    course = Course(id="BIO-10-A", name="Biology", class_name="10-A")
+    course.teachers.append(test_teacher)
+    students = [User(roll_number=f"b{i}", name=f"Student {i}", role=UserRole.STUDENT) for i in range(5)]
+    course.students.extend(students)
+    db_session.add(course)
+    db_session.add(Task(
+        id="TSK-CELL", title="Cell diagram", description="Label the organelles", course_id="BIO-10-A", author_id=test_teacher.roll_number,
+        created_at=datetime.now(), deadline=datetime.now() + timedelta(days=1),
+    ))
+    db_session.commit()
+    app.dependency_overrides[get_uploads_dir] = lambda: tmp_path
+    yield students
+    del app.dependency_overrides[get_uploads_dir]
+
+
+def act_as(user: User):
+    app.dependency_overrides[get_current_user] = lambda: user
+
+
+def submit(client: TestClient, student: User):
+    act_as(student)
+    response = client.post(f"{TASK}/upload", files=[("files", (f"{student.roll_number}.png", student.roll_number.encode()))])
+    assert response.status_code == 200, response.text
+
+
+def listed_counts(client: TestClient, teacher: User) -> dict:
+    act_as(teacher)
+    response = client.get("/v1/api/me/BIO-10-A/dashboard")
+    assert response.status_code == 200, response.text
+    [task] = response.json()["tasks"]
+    return task["submission_counts"]
+
+
+def test_counts_follow_every_status_change(client: TestClient, db_session, students, test_teacher):
+    for student in students[:4]:
+        submit(client, student)
+    assert listed_counts(client, test_teacher) == {"submitted": 4, "delayed": 0, "approved": 0, "rejected": 0, "pending": 1}
+
+    assert client.put(f"{TASK}/submissions/b0/approve", data={"grade": "A"}).status_code == 200
+    assert client.put(f"{TASK}/submissions/b1/reject", data={"reason": "Unlabelled"}).status_code == 200
+    assert client.put(f"{TASK}/submissions/grades", json={"decisions": [
+        {"student_roll_number": "b0", "action": "approve", "grade": "S"},  # already approved: no change
+        {"student_roll_number": "b2", "action": "approve", "grade": "B"},
+    ]}).status_code == 200
+    assert listed_counts(client, test_teacher) == {"submitted": 1, "delayed": 0, "approved": 2, "rejected": 1, "pending": 2}
+
+    # b1 resubmits after the deadline, b3 withdraws, b4 never submits.
+    db_session.query(Task).update({"deadline": datetime.now() - timedelta(minutes=1)})
+    db_session.commit()
+    submit(client, students[1])
+    act_as(students[3])
+    assert client.delete(f"{TASK}/submission/delete").status_code == 200
+
+    counts = {"submitted": 0, "delayed": 1, "approved": 2, "rejected": 0, "pending": 2}
+    assert listed_counts(client, test_teacher) == counts
+    assert client.get(TASK).json()["submission_counts"] == counts
+    assert counters.check(db_session) == []
+
+    assert client.delete(f"{TASK}/delete").status_code == 200
+    assert db_session.scalars(select(TaskSubmissionCounts)).all() == []
+
+
+def test_rebuild_repairs_counts_from_the_submissions(client: TestClient, db_session, students, test_teacher):
+    submit(client, students[0])
+    # Changes that bypass the services, as the admin panel's do.
+    db_session.add(Submission(task_id="TSK-CELL", student_id="b1", submitted_at=datetime.now(), status=TaskStatus.DELAYED))
+    db_session.query(Submission).filter_by(student_id="b0").update({"status": TaskStatus.APPROVED})
+    db_session.commit()
+
+    problems = counters.check(db_session)
+    assert len(problems) == 1 and "'TSK-CELL'" in problems[0]
+
+    assert counters.rebuild(db_session) == problems
+    assert counters.check(db_session) == []
+    assert listed_counts(client, test_teacher) == {"submitted": 0, "delayed": 1, "approved": 1, "rejected": 0, "pending": 3}
+
+
+def test_status_change_that_lost_a_race_is_refused_not_counted(client: TestClient, db_session, students, test_teacher, monkeypatch):
+    submit(client, students[0])
+    read_submission = service.get_submission
+
+    async def read_then_lose_the_race(db, task_id, student_roll_number):
+        submission = await read_submission(db, task_id, student_roll_number)
+        # Another teacher approves it after this request has read its status.
+        async with TestingAsyncSessionLocal() as other:
+            monkeypatch.setattr(service, "get_submission", read_submission)
+            await service.approve_task_submission(other, task_id, student_roll_number, Grade.A, None)
+        return submission
+
+    monkeypatch.setattr(service, "get_submission", read_then_lose_the_race)
+    act_as(test_teacher)
+    assert client.put(f"{TASK}/submissions/b0/reject", data={"reason": "Unlabelled"}).status_code == 409
+
+    db_session.expire_all()
+    assert db_session.scalars(select(Submission.status)).all() == [TaskStatus.APPROVED]
+    assert counters.check(db_session) == []
+    assert listed_counts(client, test_teacher)["approved"] == 1
+
+
+# On PostgreSQL the batch's SELECT ... FOR UPDATE makes the racing UPDATE wait for it instead.
+@pytest.mark.sqlite_only
+def test_grading_batch_that_lost_a_race_is_refused(client: TestClient, db_session, students, test_teacher):
+    for student in students[:2]:
+        submit(client, student)
+
+    raced = []
+
+    def reject_after_read(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT submissions.student_id") and not raced:
+            # b1 is rejected by another request between the batch's read and its UPDATE.
+            raced.append(True)
+            db_session.query(Submission).filter_by(student_id="b1").update({"status": TaskStatus.PENDING})
+            db_session.commit()
+
+    event.listen(Engine, "after_cursor_execute", reject_after_read)
+    act_as(test_teacher)
+    try:
+        response = client.put(f"{TASK}/submissions/grades", json={"decisions": [
+            {"student_roll_number": "b0", "action": "approve", "grade": "A"},
+            {"student_roll_number": "b1", "action": "approve", "grade": "B"},
+        ]})
+    finally:
+        event.remove(Engine, "after_cursor_execute", reject_after_read)
+
+    assert response.status_code == 409
+    db_session.expire_all()
+    assert dict(db_session.execute(select(Submission.student_id, Submission.status)).all()) == {"b0": TaskStatus.SUBMITTED, "b1": TaskStatus.PENDING}
+    assert db_session.scalars(select(TaskSubmissionCounts.approved)).all() == [0]
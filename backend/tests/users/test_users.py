@@ -8,7 +8,7 @@ from datetime import date
 from src.main import app
 from src.auth.dependencies import get_current_user
 
-def test_get_user_courses(client: TestClient, test_student: User, db_session):
+def test_get_user_courses(client: TestClient, test_student: User, test_teacher: User, db_session):
     # Create a course
     course = Course(
         id="TEST-101",